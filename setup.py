@@ -14,6 +14,11 @@ setup(
         "requests==2.32.5",
         "backoff==2.2.1",
     ],
+    extras_require={
+        "arrow": ["pyarrow"],
+        "async": ["aiohttp"],
+        "zstd": ["zstandard"],
+    },
     entry_points="""
         [console_scripts]
         tap-appsflyer=tap_appsflyer:main
@@ -1,18 +1,72 @@
+import argparse
 import json
 import sys
 
 import singer
 
-from tap_appsflyer.client import Client
-from tap_appsflyer.discover import discover
-from tap_appsflyer.sync import sync
-
 LOGGER = singer.get_logger()
 
 REQUIRED_CONFIG_KEYS = ["app_id", "api_token"]
 
 
+def parse_extra_args() -> argparse.Namespace:
+    """Parse the arguments of the plan/shard/merge modes, leaving the standard
+    Singer arguments to `singer.utils.parse_args`."""
+    parser = argparse.ArgumentParser(add_help=False)
+    parser.add_argument("--plan", help="Write the shard plan to this file and exit")
+    parser.add_argument("--shard", help="Sync the shards of this plan file")
+    parser.add_argument("--shard-index", type=int, default=0)
+    parser.add_argument("--shard-count", type=int, default=1)
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="Keep polling the selected streams, writing the state to --state",
+    )
+    parser.add_argument(
+        "--merge-states",
+        nargs="+",
+        help="Merge the partial states of shard runs into the --state",
+    )
+    extra_args, remaining_args = parser.parse_known_args()
+    sys.argv[1:] = remaining_args
+    return extra_args
+
+
+def load_last_state(path: str) -> dict:
+    """The last state of a file holding either a state, the state lines
+    output by a target, or the output of a shard run."""
+    from tap_appsflyer.output import open_messages
+
+    with open_messages(path) as state_file:
+        lines = [line for line in state_file.read().splitlines() if line.strip()]
+    try:
+        state = json.loads("\n".join(lines))
+    except ValueError:
+        state = None
+    if isinstance(state, dict) and "type" not in state:
+        return state
+
+    # Singer output, which may end with RECORD or BATCH messages when the
+    # run was stopped by its deadline
+    for line in reversed(lines):
+        try:
+            message = json.loads(line)
+        except ValueError:
+            continue
+        if not isinstance(message, dict):
+            continue
+        if message.get("type") == "STATE":
+            return message["value"]
+        if "type" not in message:
+            return message
+    raise ValueError(f"No state found in {path}")
+
+
+# The client, discover and sync modules are imported on their own code
+# paths, keeping the startup of the process small.
 def do_discover():
+    from tap_appsflyer.discover import discover
+
     LOGGER.info("Starting discover")
     catalog = discover()
     json.dump(catalog.to_dict(), sys.stdout, indent=2)
@@ -21,21 +75,61 @@ def do_discover():
 
 @singer.utils.handle_top_exception(LOGGER)
 def main():
+    extra_args = parse_extra_args()
     parsed_args = singer.utils.parse_args(REQUIRED_CONFIG_KEYS)
     state = {}
     if parsed_args.state:
         state = parsed_args.state
 
-    with Client(parsed_args.config) as client:
-        if parsed_args.discover:
-            do_discover()
-        elif parsed_args.catalog:
-            sync(
-                client=client,
-                config=parsed_args.config,
-                catalog=parsed_args.catalog,
-                state=state,
-            )
+    if extra_args.merge_states:
+        from tap_appsflyer.planner import merge_states
+
+        partial_states = [load_last_state(path) for path in extra_args.merge_states]
+        json.dump(merge_states(state, partial_states), sys.stdout)
+    elif parsed_args.discover:
+        do_discover()
+    elif parsed_args.catalog:
+        from tap_appsflyer.client import Client
+        from tap_appsflyer.output import configure_stdout
+        from tap_appsflyer.planner import build_plan, select_shards
+        from tap_appsflyer.sync import sync, sync_shards
+
+        with Client(parsed_args.config) as client, configure_stdout(parsed_args.config):
+            if extra_args.plan:
+                plan = build_plan(
+                    client, parsed_args.config, parsed_args.catalog, state
+                )
+                with open(extra_args.plan, "w") as plan_file:
+                    json.dump(plan, plan_file, indent=2)
+            elif extra_args.daemon:
+                from tap_appsflyer.daemon import run_daemon
+
+                run_daemon(
+                    client=client,
+                    config=parsed_args.config,
+                    catalog=parsed_args.catalog,
+                    state=state,
+                    state_path=getattr(parsed_args, "state_path", None),
+                )
+            elif extra_args.shard:
+                with open(extra_args.shard) as plan_file:
+                    plan = json.load(plan_file)
+                sync_shards(
+                    client=client,
+                    config=parsed_args.config,
+                    catalog=parsed_args.catalog,
+                    state=state,
+                    shards=select_shards(
+                        plan, extra_args.shard_index, extra_args.shard_count
+                    ),
+                )
+            else:
+                sync(
+                    client=client,
+                    config=parsed_args.config,
+                    catalog=parsed_args.catalog,
+                    state=state,
+                )
 
 
 if __name__ == "__main__":
@@ -0,0 +1,232 @@
+import asyncio
+import collections
+import contextlib
+import time
+from typing import Any, AsyncIterator, Dict, List, Mapping, Optional, Tuple
+
+from singer import get_logger, metrics
+from singer.utils import strptime_to_utc
+
+from tap_appsflyer.client import REQUEST_TIMEOUT, Client, get_error
+from tap_appsflyer.quota import QuotaLedger
+from tap_appsflyer.retry import RetryEngine, RetryPolicy
+
+LOGGER = get_logger()
+
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 10
+DEFAULT_PREFETCH_CONCURRENCY = 10
+CHUNK_SIZE = 1024 * 1024
+
+
+class AsyncRateLimiter:
+    """At most `limit` requests started per `period` seconds, shared by every
+    task awaiting it. The async counterpart of `singer.utils.ratelimit`."""
+
+    def __init__(self, limit: int = 10, period: float = 1) -> None:
+        self.limit = limit
+        self.period = period
+        self.calls = collections.deque()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self.lock:
+            if len(self.calls) >= self.limit:
+                delay = self.calls.popleft() + self.period - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            self.calls.append(time.monotonic())
+
+
+class AsyncClient:
+    """asyncio counterpart of `Client`, on top of aiohttp.
+
+    Requests are authenticated, retried and mapped to the exceptions of
+    `tap_appsflyer.exceptions` like the synchronous client does, while
+    the bodies stay streamed. Connections are pooled with at most
+    `max_connections_per_host` per host. Pass the `retry_engine` of a
+    `Client` to share its retry budget and circuit breaker.
+    """
+
+    # Same headers as the synchronous client
+    authenticate = Client.authenticate
+
+    def __init__(
+        self,
+        config: Mapping[str, Any],
+        rate_limiter: Optional[AsyncRateLimiter] = None,
+        quota: Optional[QuotaLedger] = None,
+        retry_engine: Optional[RetryEngine] = None,
+    ) -> None:
+        self.config = config
+        self.base_url = "https://hq1.appsflyer.com"
+        self.rate_limiter = rate_limiter or AsyncRateLimiter()
+        self.quota = quota
+        self.retry_engine = retry_engine or RetryEngine.from_config(config)
+        self.max_connections_per_host = int(
+            config.get("max_connections_per_host") or DEFAULT_MAX_CONNECTIONS_PER_HOST
+        )
+        config_request_timeout = config.get("request_timeout")
+        self.request_timeout = (
+            float(config_request_timeout) if config_request_timeout else REQUEST_TIMEOUT
+        )
+        self._session = None
+
+    async def __aenter__(self):
+        try:
+            import aiohttp
+        except ImportError as ex:
+            raise ImportError(
+                "The async client requires aiohttp, install tap-appsflyer[async]"
+            ) from ex
+
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit_per_host=self.max_connections_per_host
+            ),
+            # Per connection and read like requests does, a download may take
+            # longer than `request_timeout` as long as the body keeps coming
+            timeout=aiohttp.ClientTimeout(
+                total=None,
+                sock_connect=self.request_timeout,
+                sock_read=self.request_timeout,
+            ),
+        )
+        # The network errors of aiohttp, retried like those of requests
+        self.retry_engine = self.retry_engine.with_policies(
+            (
+                (
+                    (
+                        aiohttp.ClientConnectionError,
+                        aiohttp.ClientPayloadError,
+                        asyncio.TimeoutError,
+                    ),
+                    RetryPolicy(max_tries=5, base_delay=1),
+                ),
+            )
+        )
+        return self
+
+    async def __aexit__(self, exception_type, exception_value, traceback):
+        await self._session.close()
+
+    async def _open(self, endpoint: str, params: Dict, headers: Dict):
+        await self.rate_limiter.acquire()
+        if self.quota:
+            self.quota.record_request(endpoint)
+        with metrics.http_request_timer(endpoint) as timer:
+            response = await self._session.get(endpoint, params=params, headers=headers)
+            timer.tags[metrics.Tag.http_status_code] = response.status
+
+        if response.status != 200:
+            try:
+                response_json = await response.json(content_type=None)
+            except Exception:
+                response_json = {}
+            response.release()
+            if not isinstance(response_json, dict):
+                response_json = {}
+            raise get_error(response.status, response_json, response)
+        return response
+
+    @contextlib.asynccontextmanager
+    async def get(
+        self, endpoint: str, params: Dict, headers: Dict, path: str = None
+    ) -> AsyncIterator[Any]:
+        """The streamed response of a `GET`, once its status is a success."""
+        endpoint = endpoint or f"{self.base_url}/{path}"
+        headers, params = self.authenticate(dict(headers), dict(params))
+        response = await self.retry_engine.call_async(
+            self._open, endpoint, params, headers
+        )
+        try:
+            yield response
+        finally:
+            response.release()
+
+    async def iter_content(
+        self, endpoint: str, params: Dict, headers: Dict, chunk_size: int = CHUNK_SIZE
+    ) -> AsyncIterator[bytes]:
+        async with self.get(endpoint, params, headers) as response:
+            async for chunk in response.content.iter_chunked(chunk_size):
+                yield chunk
+
+
+async def download_into_cache(
+    client: AsyncClient, downloads: List[Tuple[Any, str, Dict]], concurrency: int
+) -> int:
+    """Stream every (stream, cache key, params) window into the response
+    cache, `concurrency` downloads at a time. A failed download is logged
+    and left out of the cache, for the sync to fetch it. Returns the number
+    of windows downloaded."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def download(stream, cache_key: str, params: Dict) -> None:
+        async with semaphore:
+            metadata = {
+                "app_id": stream.client.config.get("app_id"),
+                "path": stream.path,
+                "params": params,
+            }
+            with stream.response_cache.writer(cache_key, metadata) as data_file:
+                async for chunk in client.iter_content(
+                    stream.get_url_endpoint(), params, stream.headers
+                ):
+                    data_file.write(chunk)
+            LOGGER.info(
+                f"Prefetched {stream.tap_stream_id} window "
+                f"{params['from']} - {params['to']}"
+            )
+
+    results = await asyncio.gather(
+        *(download(*entry) for entry in downloads), return_exceptions=True
+    )
+    failures = 0
+    for (stream, _, params), result in zip(downloads, results):
+        if isinstance(result, BaseException):
+            failures += 1
+            LOGGER.warning(
+                f"Prefetching {stream.tap_stream_id} window {params['from']} - "
+                f"{params['to']} failed, the sync fetches it instead: {result!r}"
+            )
+    return len(downloads) - failures
+
+
+def prefetch_shards(client: Client, shards: List[Dict]) -> int:
+    """Download the closed windows of the shards concurrently into the
+    response cache, which the shard syncs then read from. Returns the
+    number of windows downloaded."""
+    from tap_appsflyer.streams import STREAMS
+
+    downloads = []
+    for shard in shards:
+        if shard["app_id"] != client.config["app_id"]:
+            continue
+        stream = STREAMS[shard["stream"]](client)
+        if not stream.response_cache:
+            LOGGER.warning("Prefetching requires the response cache, set cache_dir")
+            return 0
+
+        params = stream.get_window_params(
+            strptime_to_utc(shard["from"]), strptime_to_utc(shard["to"])
+        )
+        cache_key = stream.get_cache_key(params)
+        if cache_key and not stream.response_cache.get(cache_key):
+            downloads.append((stream, cache_key, params))
+
+    async def run() -> int:
+        async with AsyncClient(
+            client.config, quota=client.quota, retry_engine=client.retry_engine
+        ) as async_client:
+            return await download_into_cache(
+                async_client,
+                downloads,
+                int(
+                    client.config.get("prefetch_concurrency")
+                    or DEFAULT_PREFETCH_CONCURRENCY
+                ),
+            )
+
+    if downloads:
+        LOGGER.info(f"Prefetching {len(downloads)} windows")
+        return asyncio.run(run())
+    return 0
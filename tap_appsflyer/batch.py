@@ -0,0 +1,194 @@
+import datetime
+import json
+import os
+import sys
+from typing import Any, Dict, List, Mapping, Optional
+
+import pytz
+from singer import get_logger, metadata
+
+LOGGER = get_logger()
+
+COLUMNAR_FORMATS = {"arrow": ".arrow", "parquet": ".parquet"}
+DEFAULT_BATCH_SIZE = 100000
+
+
+def is_selected(stream_metadata: Dict, field_name: str) -> bool:
+    """Mirrors the field filtering of `singer.Transformer`."""
+    breadcrumb = ("properties", field_name)
+    if metadata.get(stream_metadata, breadcrumb, "inclusion") == "automatic":
+        return True
+    return (
+        metadata.get(stream_metadata, breadcrumb, "selected") is not False
+        and metadata.get(stream_metadata, breadcrumb, "inclusion") != "unsupported"
+    )
+
+
+def to_string(value: Any) -> Optional[str]:
+    """Value of a string column, objects are stored as JSON."""
+    if value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+def get_arrow_type(pyarrow, field_schema: Dict):
+    """Arrow type of a JSON schema property, fields allowing several types
+    are kept as strings."""
+    if field_schema.get("format") == "date-time":
+        return pyarrow.timestamp("us", tz="UTC")
+
+    types = field_schema.get("type", [])
+    types = [types] if isinstance(types, str) else types
+    types = [typ for typ in types if typ != "null"]
+    if types == ["boolean"]:
+        return pyarrow.bool_()
+    if types == ["integer"]:
+        return pyarrow.int64()
+    if types == ["number"]:
+        return pyarrow.float64()
+    return pyarrow.string()
+
+
+class ColumnarBatchWriter:
+    """Collects transformed records of a stream into columns and writes them
+    as Arrow IPC or Parquet files, typed from the stream schema.
+
+    Records are written in place of Singer RECORD messages; every `flush`
+    emits a BATCH manifest of the files written since the last one, which
+    precedes the STATE message checkpointing them.
+    """
+
+    def __init__(
+        self,
+        tap_stream_id: str,
+        schema: Dict,
+        stream_metadata: Dict,
+        output_dir: str,
+        file_format: str,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> None:
+        try:
+            import pyarrow
+        except ImportError as err:
+            raise ImportError(
+                f"output_format '{file_format}' requires pyarrow, install "
+                "tap-appsflyer[arrow]"
+            ) from err
+
+        self.pyarrow = pyarrow
+        self.tap_stream_id = tap_stream_id
+        self.file_format = file_format
+        self.batch_size = batch_size
+        self.output_dir = os.path.join(output_dir, tap_stream_id)
+        os.makedirs(self.output_dir, exist_ok=True)
+
+        self.arrow_schema = pyarrow.schema(
+            [
+                (field_name, get_arrow_type(pyarrow, field_schema))
+                for field_name, field_schema in schema["properties"].items()
+                if is_selected(stream_metadata, field_name)
+            ]
+        )
+        self.columns = {name: [] for name in self.arrow_schema.names}
+        self.row_count = 0
+        self.file_sequence = 0
+        self.written_files: List[str] = []
+        self.written_rows = 0
+        self.run_id = datetime.datetime.now(pytz.utc).strftime("%Y%m%dT%H%M%S")
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Mapping[str, Any],
+        tap_stream_id: str,
+        schema: Dict,
+        stream_metadata: Dict,
+    ) -> Optional["ColumnarBatchWriter"]:
+        """Build the writer when a columnar `output_format` is configured,
+        returns None for the default Singer output."""
+        file_format = config.get("output_format") or "singer"
+        if file_format == "singer":
+            return None
+        if file_format not in COLUMNAR_FORMATS:
+            raise ValueError(f"Unsupported output_format: {file_format}")
+        if not config.get("batch_output_dir"):
+            raise ValueError(f"output_format '{file_format}' requires batch_output_dir")
+
+        return cls(
+            tap_stream_id,
+            schema,
+            stream_metadata,
+            config["batch_output_dir"],
+            file_format,
+            batch_size=int(config.get("batch_size") or DEFAULT_BATCH_SIZE),
+        )
+
+    def append(self, record: Dict) -> None:
+        for field_name, column in self.columns.items():
+            column.append(record.get(field_name))
+        self.row_count += 1
+        if self.row_count >= self.batch_size:
+            self.write_batch()
+
+    def write_batch(self) -> None:
+        """Write the collected rows to a new file."""
+        if not self.row_count:
+            return
+
+        pyarrow = self.pyarrow
+        arrays = []
+        for field in self.arrow_schema:
+            values = self.columns[field.name]
+            if pyarrow.types.is_timestamp(field.type):
+                arrays.append(pyarrow.array(values, pyarrow.string()).cast(field.type))
+            elif pyarrow.types.is_string(field.type):
+                arrays.append(
+                    pyarrow.array([to_string(value) for value in values], field.type)
+                )
+            else:
+                arrays.append(pyarrow.array(values, field.type))
+        table = pyarrow.Table.from_arrays(arrays, schema=self.arrow_schema)
+
+        self.file_sequence += 1
+        file_path = os.path.join(
+            self.output_dir,
+            f"{self.tap_stream_id}-{self.run_id}-{self.file_sequence:05d}"
+            f"{COLUMNAR_FORMATS[self.file_format]}",
+        )
+        if self.file_format == "parquet":
+            import pyarrow.parquet
+
+            pyarrow.parquet.write_table(table, file_path)
+        else:
+            with pyarrow.OSFile(file_path, "wb") as sink:
+                with pyarrow.ipc.new_file(sink, self.arrow_schema) as writer:
+                    writer.write_table(table)
+
+        LOGGER.info(f"Wrote {self.row_count} {self.tap_stream_id} rows to {file_path}")
+        self.written_files.append(file_path)
+        self.written_rows += self.row_count
+        self.columns = {name: [] for name in self.arrow_schema.names}
+        self.row_count = 0
+
+    def flush(self) -> None:
+        """Write the pending rows and a BATCH manifest of the files written
+        since the last flush."""
+        self.write_batch()
+        if not self.written_files:
+            return
+
+        manifest = {
+            "type": "BATCH",
+            "stream": self.tap_stream_id,
+            "encoding": {"format": self.file_format},
+            "manifest": [
+                f"file://{os.path.abspath(path)}" for path in self.written_files
+            ],
+            "row_count": self.written_rows,
+        }
+        sys.stdout.write(json.dumps(manifest) + "\n")
+        sys.stdout.flush()
+        self.written_files = []
+        self.written_rows = 0
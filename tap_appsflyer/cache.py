@@ -0,0 +1,176 @@
+import contextlib
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, BinaryIO, Dict, Iterator, Mapping, Optional
+
+import pytz
+from singer import get_logger
+
+LOGGER = get_logger()
+
+DEFAULT_CACHE_MAX_BYTES = 5 * 1024 * 1024 * 1024
+DEFAULT_CACHE_MAX_AGE_DAYS = 90
+# AppsFlyer keeps attributing rows for a while after they happen, windows
+# ending more recently than this are never served from (or written to) disk.
+DEFAULT_FINALIZATION_HOURS = 24
+CHUNK_SIZE = 1024 * 1024
+
+
+class CachedResponse:
+    """A minimal stand-in for `requests.Response` which replays a gzip
+    compressed export from disk."""
+
+    status_code = 200
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def iter_content(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        with gzip.open(self.path, "rb") as data_file:
+            for chunk in iter(lambda: data_file.read(chunk_size), b""):
+                yield chunk
+
+    def close(self) -> None:
+        pass
+
+
+class ResponseCache:
+    """Opt-in on-disk cache of completed (closed) window exports.
+
+    Entries are keyed by app id, report path and request params (which
+    carry the `from`/`to` window) and evicted least recently used first
+    once the cache grows past `max_bytes`, or when older than `max_age_days`.
+    """
+
+    data_suffix = ".csv.gz"
+    meta_suffix = ".json"
+
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        max_age_days: float = DEFAULT_CACHE_MAX_AGE_DAYS,
+        finalization_hours: float = DEFAULT_FINALIZATION_HOURS,
+    ) -> None:
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age = datetime.timedelta(days=max_age_days)
+        self.finalization_delay = datetime.timedelta(hours=finalization_hours)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> Optional["ResponseCache"]:
+        """Build the cache from the tap config, returns None when `cache_dir`
+        is not configured."""
+        cache_dir = config.get("cache_dir")
+        if not cache_dir:
+            return None
+        return cls(
+            cache_dir,
+            max_bytes=int(config.get("cache_max_bytes") or DEFAULT_CACHE_MAX_BYTES),
+            max_age_days=float(
+                config.get("cache_max_age_days") or DEFAULT_CACHE_MAX_AGE_DAYS
+            ),
+            finalization_hours=float(
+                config.get("cache_finalization_hours") or DEFAULT_FINALIZATION_HOURS
+            ),
+        )
+
+    @staticmethod
+    def key(app_id: str, path: str, params: Mapping[str, Any]) -> str:
+        """Stable key for a (app, report, window) request."""
+        raw_key = json.dumps([app_id, path, sorted(params.items())], default=str)
+        return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+    def is_closed(self, window_end: datetime.datetime) -> bool:
+        """A window is closed once AppsFlyer has finalized its data."""
+        return window_end <= datetime.datetime.now(pytz.utc) - self.finalization_delay
+
+    def _data_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.data_suffix)
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + self.meta_suffix)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """Return the cached export for the key, if present and not
+        expired."""
+        data_path = self._data_path(key)
+        try:
+            modified = os.stat(data_path).st_mtime
+        except FileNotFoundError:
+            return None
+
+        if time.time() - modified > self.max_age.total_seconds():
+            self._remove(key)
+            return None
+
+        # Bump the modification time, it doubles as the LRU clock
+        os.utime(data_path)
+        return CachedResponse(data_path)
+
+    @contextlib.contextmanager
+    def writer(self, key: str, metadata: Dict) -> Iterator[BinaryIO]:
+        """File the body of an export is written into; the entry only becomes
+        visible once the block exits without an error."""
+        data_path = self._data_path(key)
+        tmp_path = f"{data_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp_path, "wb") as data_file:
+                yield data_file
+            os.replace(tmp_path, data_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        with open(self._meta_path(key), "w") as meta_file:
+            json.dump(metadata, meta_file)
+
+        self.evict()
+
+    def put(self, key: str, response: Any, metadata: Dict) -> CachedResponse:
+        """Stream the response body into the cache and return a response
+        replaying it."""
+        with self.writer(key, metadata) as data_file:
+            for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                data_file.write(chunk)
+        return CachedResponse(self._data_path(key))
+
+    def _remove(self, key: str) -> None:
+        for path in (self._data_path(key), self._meta_path(key)):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def evict(self) -> None:
+        """Drop expired entries, then the least recently used ones until the
+        cache fits in `max_bytes`."""
+        entries = []
+        for file_name in os.listdir(self.cache_dir):
+            if not file_name.endswith(self.data_suffix):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, file_name))
+            entries.append(
+                (stat.st_mtime, stat.st_size, file_name[: -len(self.data_suffix)])
+            )
+
+        now = time.time()
+        total_size = 0
+        kept = []
+        for modified, size, key in entries:
+            if now - modified > self.max_age.total_seconds():
+                self._remove(key)
+            else:
+                kept.append((modified, size, key))
+                total_size += size
+
+        for _, size, key in sorted(kept):
+            if total_size <= self.max_bytes:
+                break
+            LOGGER.info(f"Evicting cached export: {key}")
+            self._remove(key)
+            total_size -= size
@@ -0,0 +1,196 @@
+import csv
+import datetime
+import hashlib
+import io
+import itertools
+import json
+import os
+import threading
+from typing import Any, BinaryIO, Dict, Iterator, List, Mapping, Optional, Sequence
+
+import pytz
+from singer import get_logger
+
+from tap_appsflyer.cache import CHUNK_SIZE, CachedResponse, ResponseCache
+
+LOGGER = get_logger()
+
+
+def pseudonymize(value: str, salt: bytes) -> str:
+    """A stand-in for a sensitive value: of the same length, and the same
+    for every occurrence of the value so the cardinality is kept."""
+    if not value:
+        return value
+    digest = hashlib.blake2b(value.encode("utf-8"), key=salt).hexdigest()
+    return (digest * (len(value) // len(digest) + 1))[: len(value)]
+
+
+class SanitizingWriter:
+    """Writes a CSV export fed in chunks to `data_file`, with the values of
+    the columns at `indexes` pseudonymized. The header row is kept."""
+
+    def __init__(self, data_file: BinaryIO, indexes: Sequence[int], salt: bytes):
+        self.data_file = data_file
+        self.indexes = indexes
+        self.salt = salt
+        self.pending = b""
+        self.record_lines: List[bytes] = []
+        self.quotes = 0
+        self.header_written = False
+
+    def feed(self, chunk: bytes) -> None:
+        if not self.indexes:
+            self.data_file.write(chunk)
+            return
+
+        lines = (self.pending + chunk).split(b"\n")
+        self.pending = lines.pop()
+        for line in lines:
+            self.record_lines.append(line + b"\n")
+            # A newline inside a quoted value leaves an odd count of quotes
+            self.quotes += line.count(b'"')
+            if self.quotes % 2 == 0:
+                self.write_record(b"".join(self.record_lines))
+                self.record_lines = []
+                self.quotes = 0
+
+    def close(self) -> None:
+        if self.pending or self.record_lines:
+            self.write_record(b"".join(self.record_lines) + self.pending)
+        self.pending = b""
+        self.record_lines = []
+
+    def write_record(self, raw_record: bytes) -> None:
+        if not self.header_written:
+            self.header_written = True
+            self.data_file.write(raw_record)
+            return
+
+        text = raw_record.decode("utf-8")
+        values = next(csv.reader(io.StringIO(text, newline="")), [])
+        for index in self.indexes:
+            if index < len(values):
+                values[index] = pseudonymize(values[index], self.salt)
+        output = io.StringIO()
+        csv.writer(output, lineterminator="\r\n").writerow(values)
+        self.data_file.write(output.getvalue().encode("utf-8"))
+
+
+class CapturingResponse:
+    """Response handing out the chunks of `response` while writing their
+    sanitized copy into the capture. A response not read to the end is not
+    captured."""
+
+    def __init__(
+        self, response, recorder: "ResponseRecorder", key: str, stream, metadata: Dict
+    ):
+        self.response = response
+        self.recorder = recorder
+        self.key = key
+        self.stream = stream
+        self.metadata = metadata
+        self.status_code = response.status_code
+
+    def iter_content(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        indexes = [
+            index
+            for index, field_name in enumerate(self.stream.fieldnames)
+            if field_name in self.stream.sensitive_fields
+        ]
+        with self.recorder.writer(self.key, self.metadata) as data_file:
+            sanitizer = SanitizingWriter(data_file, indexes, self.recorder.salt)
+            for chunk in self.response.iter_content(chunk_size=chunk_size):
+                sanitizer.feed(chunk)
+                yield chunk
+            sanitizer.close()
+
+    def close(self) -> None:
+        self.response.close()
+
+
+class ResponseRecorder(ResponseCache):
+    """Captures the raw exports of a sync with their request metadata, or
+    replays them without any network access.
+
+    Captures are laid out like the response cache and keyed alike, with
+    the sensitive columns of the rows pseudonymized. A replayed request is
+    served the capture of the same request, or the captures of the same
+    report in turn when there is none, so a replay does not need the
+    windows of the capturing run.
+    """
+
+    def __init__(
+        self, capture_dir: str, replay: bool = False, salt: Optional[bytes] = None
+    ) -> None:
+        super().__init__(capture_dir)
+        self.replaying = replay
+        self.salt = salt or os.urandom(16)
+        self.lock = threading.Lock()
+        self._captures_by_path = None
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> Optional["ResponseRecorder"]:
+        """Replays from `replay_dir` or captures into `capture_dir`, returns
+        None when neither is configured."""
+        if config.get("replay_dir"):
+            return cls(config["replay_dir"], replay=True)
+        if config.get("capture_dir"):
+            salt = config.get("capture_salt")
+            return cls(
+                config["capture_dir"], salt=salt.encode("utf-8") if salt else None
+            )
+        return None
+
+    def evict(self) -> None:
+        """Captures are kept until removed by hand."""
+
+    def capture(self, stream, params: Dict, response) -> CapturingResponse:
+        app_id = stream.client.config.get("app_id")
+        metadata = {
+            "app_id": app_id,
+            "stream": stream.tap_stream_id,
+            "path": stream.path,
+            "params": dict(params),
+            "captured_at": datetime.datetime.now(pytz.utc).isoformat(),
+            "sanitized_fields": list(stream.sensitive_fields),
+        }
+        key = self.key(app_id, stream.path, params)
+        return CapturingResponse(response, self, key, stream, metadata)
+
+    def get_captures_by_path(self) -> Dict[str, Iterator[str]]:
+        """Keys of the captures of every report path, cycled in capture
+        order."""
+        with self.lock:
+            if self._captures_by_path is None:
+                captures = []
+                for file_name in os.listdir(self.cache_dir):
+                    if not file_name.endswith(self.meta_suffix):
+                        continue
+                    key = file_name[: -len(self.meta_suffix)]
+                    with open(self._meta_path(key)) as meta_file:
+                        metadata = json.load(meta_file)
+                    captures.append((metadata["path"], metadata["captured_at"], key))
+
+                keys_by_path = {}
+                for path, _, key in sorted(captures):
+                    keys_by_path.setdefault(path, []).append(key)
+                self._captures_by_path = {
+                    path: itertools.cycle(keys) for path, keys in keys_by_path.items()
+                }
+            return self._captures_by_path
+
+    def replay(self, stream, params: Dict) -> CachedResponse:
+        key = self.key(stream.client.config.get("app_id"), stream.path, params)
+        if not os.path.exists(self._data_path(key)):
+            keys = self.get_captures_by_path().get(stream.path)
+            if keys is None:
+                raise FileNotFoundError(
+                    f"No capture of {stream.path} in {self.cache_dir} to replay"
+                )
+            with self.lock:
+                key = next(keys)
+            LOGGER.info(
+                f"No capture of the {stream.tap_stream_id} window {params.get('from')}"
+                f" - {params.get('to')}, replaying capture {key}"
+            )
+        return CachedResponse(self._data_path(key))
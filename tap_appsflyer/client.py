@@ -1,21 +1,36 @@
 from typing import Any, Dict, Mapping, Optional, Tuple
 
-import backoff
 import requests
 from requests import session
-from requests.exceptions import ChunkedEncodingError, ConnectionError, Timeout
 from singer import get_logger, metrics, utils
 
-from tap_appsflyer.exceptions import (
-    ERROR_CODE_EXCEPTION_MAPPING,
-    appsflyerBackoffError,
-    appsflyerError,
-)
+from tap_appsflyer.exceptions import ERROR_CODE_EXCEPTION_MAPPING, appsflyerError
+from tap_appsflyer.retry import RetryEngine
 
 LOGGER = get_logger()
 REQUEST_TIMEOUT = 300
 
 
+def get_error(status_code: int, response_json: Dict, response: Any) -> appsflyerError:
+    """The exception associated with an error status code, carrying the
+    error message of the response body when there is one."""
+    if response_json.get("error"):
+        message = f"HTTP-error-code: {status_code}, Error: {response_json.get('error')}"
+    else:
+        error_message = response_json.get(
+            "message",
+            ERROR_CODE_EXCEPTION_MAPPING.get(status_code, {}).get(
+                "message", "Unknown Error"
+            ),
+        )
+        message = f"HTTP-error-code: {status_code}, Error: {error_message}"
+
+    exc = ERROR_CODE_EXCEPTION_MAPPING.get(status_code, {}).get(
+        "raise_exception", appsflyerError
+    )
+    return exc(message, response)
+
+
 def raise_for_error(response: requests.Response) -> None:
     """Raises the associated response exception. Takes in a response object,
     checks the status code, and throws the associated exception based on the
@@ -28,21 +43,7 @@ def raise_for_error(response: requests.Response) -> None:
     except Exception:
         response_json = {}
     if response.status_code != 200:
-        if response_json.get("error"):
-            message = f"HTTP-error-code: {response.status_code}, Error: {response_json.get('error')}"
-        else:
-            error_message = response_json.get(
-                "message",
-                ERROR_CODE_EXCEPTION_MAPPING.get(response.status_code, {}).get(
-                    "message", "Unknown Error"
-                ),
-            )
-            message = f"HTTP-error-code: {response.status_code}, Error: {error_message}"
-
-        exc = ERROR_CODE_EXCEPTION_MAPPING.get(response.status_code, {}).get(
-            "raise_exception", appsflyerError
-        )
-        raise exc(message, response) from None
+        raise get_error(response.status_code, response_json, response) from None
 
 
 class Client:
@@ -64,6 +65,11 @@ class Client:
         self.request_timeout = (
             float(config_request_timeout) if config_request_timeout else REQUEST_TIMEOUT
         )
+        # One engine per client, so its retry budget and circuit breaker are
+        # shared by every thread fetching through it
+        self.retry_engine = RetryEngine.from_config(config)
+        # Counts the export calls against `daily_api_quota`, set by the sync
+        self.quota = None
 
     def __enter__(self):
         self.check_api_credentials()
@@ -75,9 +81,6 @@ class Client:
     def check_api_credentials(self) -> None:
         pass
 
-    def giveup(self, exc):
-        return exc.response is not None and 400 <= exc.response.status_code < 500
-
     def authenticate(self, headers: Dict, params: Dict) -> Tuple[Dict, Dict]:
         """Authenticates the request with the token."""
         headers["Authorization"] = f"Bearer {self.config.get('api_token')}"
@@ -94,26 +97,25 @@ class Client:
         ).prepare()
         return req
 
-    @backoff.on_exception(
-        wait_gen=backoff.expo,
-        exception=(
-            ConnectionResetError,
-            ConnectionError,
-            ChunkedEncodingError,
-            Timeout,
-            appsflyerBackoffError,
-        ),
-        max_tries=5,
-        factor=2,
-    )
-    @backoff.on_exception(
-        backoff.expo,
-        (requests.exceptions.RequestException),
-        max_tries=5,
-        giveup=giveup,
-        factor=2,
-    )
+    def send(self, request: requests.PreparedRequest) -> requests.Response:
+        """Sends a prepared request under the retry policies, returns the
+        response with its body left to be streamed."""
+        return self.retry_engine.call(self._send, request)
+
     @utils.ratelimit(10, 1)
+    def _send(self, request: requests.PreparedRequest) -> requests.Response:
+        if self.quota:
+            self.quota.record_request(request.url)
+        response = self._session.send(
+            request, stream=True, timeout=self.request_timeout
+        )
+        if response.status_code != 200:
+            try:
+                raise_for_error(response)
+            finally:
+                response.close()
+        return response
+
     def __make_request(
         self, method: str, endpoint: str, **kwargs
     ) -> Optional[Mapping[Any, Any]]:
@@ -129,6 +131,12 @@ class Client:
         Returns:
             Dict,List,None: Returns a `Json Parsed` HTTP Response or None if exception
         """
+        return self.retry_engine.call(self._request, method, endpoint, **kwargs)
+
+    @utils.ratelimit(10, 1)
+    def _request(
+        self, method: str, endpoint: str, **kwargs
+    ) -> Optional[Mapping[Any, Any]]:
         with metrics.http_request_timer(endpoint) as _:
             response = self._session.request(method, endpoint, **kwargs)
             raise_for_error(response)
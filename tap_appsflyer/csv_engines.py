@@ -0,0 +1,145 @@
+import io
+from typing import Any, Dict, Iterator, Mapping
+
+from singer import get_logger
+
+LOGGER = get_logger()
+
+# Rows converted to Python objects at once, out of a parsed block
+ROWS_PER_SLICE = 1000
+# Bytes parsed at once by pyarrow, a single row must fit in a block
+DEFAULT_BLOCK_SIZE = 1024 * 1024
+
+
+class ResponseFile(io.RawIOBase):
+    """Read-only file over the streamed body of a response."""
+
+    def __init__(self, request_data, chunk_size: int) -> None:
+        self.chunks = iter(request_data.iter_content(chunk_size=chunk_size))
+        self.buffer = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, target) -> int:
+        while not self.buffer:
+            self.buffer = next(self.chunks, None)
+            if self.buffer is None:
+                self.buffer = b""
+                return 0
+        size = min(len(target), len(self.buffer))
+        target[:size] = self.buffer[:size]
+        self.buffer = self.buffer[size:]
+        return size
+
+
+class StdlibCsvEngine:
+    """Parses the rows with `csv.DictReader`, one line at a time. The
+    conversions are left to `IncrementalStream.xform`."""
+
+    name = "stdlib"
+
+    def __init__(self, stream) -> None:
+        self.stream = stream
+
+    def read_rows(self, request_data) -> Iterator[Dict]:
+        reader = self.stream.get_csv_reader(request_data)
+        try:
+            next(reader)  # Skip the header row
+        except StopIteration:
+            LOGGER.warning("No data available in the CSV.")
+            return
+        yield from reader
+
+
+class ArrowCsvEngine:
+    """Parses whole blocks of rows with the streaming CSV reader of pyarrow.
+
+    Empty strings become None and the boolean fields are converted on the
+    columns, before the rows are handed out as dicts. Every row must fit
+    in a block of `csv_block_size` bytes.
+
+    Unlike stdlib, a row with more columns than the header fails the
+    window, newlines in quoted values are kept, and `max_line_size` and
+    `max_field_size` do not apply.
+    """
+
+    name = "pyarrow"
+
+    def __init__(self, stream) -> None:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.csv
+
+        self.pyarrow = pyarrow
+        self.stream = stream
+
+    def read_rows(self, request_data) -> Iterator[Dict]:
+        pyarrow = self.pyarrow
+        field_names = list(self.stream.fieldnames)
+        response_file = io.BufferedReader(
+            ResponseFile(request_data, self.stream.get_read_chunk_size())
+        )
+        try:
+            reader = pyarrow.csv.open_csv(
+                response_file,
+                read_options=pyarrow.csv.ReadOptions(
+                    column_names=field_names,
+                    skip_rows=1,
+                    block_size=int(
+                        self.stream.client.config.get("csv_block_size")
+                        or DEFAULT_BLOCK_SIZE
+                    ),
+                ),
+                parse_options=pyarrow.csv.ParseOptions(newlines_in_values=True),
+                convert_options=pyarrow.csv.ConvertOptions(
+                    column_types={name: pyarrow.string() for name in field_names},
+                    null_values=[""],
+                    strings_can_be_null=True,
+                    quoted_strings_can_be_null=True,
+                ),
+            )
+        except pyarrow.ArrowInvalid as ex:
+            if "Empty CSV file" not in str(ex):
+                raise
+            LOGGER.warning("No data available in the CSV.")
+            return
+
+        for batch in reader:
+            batch = self.convert_booleans(batch)
+            for offset in range(0, batch.num_rows, ROWS_PER_SLICE):
+                yield from batch.slice(offset, ROWS_PER_SLICE).to_pylist()
+
+    def convert_booleans(self, batch):
+        """`xform_boolean_field` on whole columns: "true" in any case is
+        True, anything else False, and nulls are kept."""
+        compute = self.pyarrow.compute
+        columns = list(batch.columns)
+        for field_name in self.stream.boolean_fields:
+            index = batch.schema.get_field_index(field_name)
+            if index < 0:
+                continue
+            columns[index] = compute.equal(
+                compute.utf8_lower(compute.utf8_trim_whitespace(columns[index])),
+                "true",
+            )
+        return self.pyarrow.RecordBatch.from_arrays(columns, names=batch.schema.names)
+
+
+CSV_ENGINES = {"stdlib": StdlibCsvEngine, "pyarrow": ArrowCsvEngine}
+
+
+def get_csv_engine(config: Mapping[str, Any], stream):
+    """The `csv_engine` of the config, stdlib by default. Reports without a
+    fixed set of columns always use stdlib."""
+    name = config.get("csv_engine") or "stdlib"
+    if name not in CSV_ENGINES:
+        raise ValueError(f"Unsupported csv_engine: {name}")
+    if not stream.fixed_columns:
+        return StdlibCsvEngine(stream)
+    try:
+        return CSV_ENGINES[name](stream)
+    except ImportError as ex:
+        raise ValueError(
+            f"csv_engine '{name}' requires pyarrow, install tap-appsflyer[arrow]"
+        ) from ex
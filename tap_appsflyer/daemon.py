@@ -0,0 +1,123 @@
+import datetime
+import json
+import os
+import signal
+import threading
+from typing import Dict, Optional
+
+import pytz
+import singer
+
+from tap_appsflyer.client import Client
+from tap_appsflyer.streams import STREAMS
+from tap_appsflyer.sync import attach_quota, sync_stream
+
+LOGGER = singer.get_logger()
+
+DEFAULT_POLL_INTERVAL_MINUTES = 15
+# Delay before polling a failed stream again, doubled after every failure
+# in a row
+POLL_RETRY_MIN_DELAY = datetime.timedelta(minutes=1)
+POLL_RETRY_MAX_DELAY = datetime.timedelta(hours=1)
+
+
+def write_state_file(path: str, state: Dict) -> None:
+    """Replace the state file atomically, so a crash leaves either the
+    previous or the new state on disk."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as state_file:
+        json.dump(state, state_file)
+        state_file.flush()
+        os.fsync(state_file.fileno())
+    os.replace(tmp_path, path)
+
+
+def run_daemon(
+    client: Client,
+    config: Dict,
+    catalog: singer.Catalog,
+    state: Dict,
+    state_path: Optional[str] = None,
+    stop_event: Optional[threading.Event] = None,
+    max_polls: Optional[int] = None,
+) -> Dict:
+    """Poll every selected stream every `poll_interval_minutes`, for as long
+    as the process runs.
+
+    The client, its connections and the streams stay warm between polls.
+    The state is kept in memory, emitted after every poll and written to
+    `state_path`. A failed poll is logged and the stream polled again with
+    an exponential backoff, the other streams keep their schedule. SIGTERM
+    and SIGINT stop the daemon once the current poll is done.
+    """
+    poll_interval = config.get("poll_interval_minutes")
+    if poll_interval is None:
+        poll_interval = DEFAULT_POLL_INTERVAL_MINUTES
+    interval = datetime.timedelta(minutes=float(poll_interval))
+    if stop_event is None:
+        stop_event = threading.Event()
+        for signal_number in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signal_number, lambda *_: stop_event.set())
+
+    quota = attach_quota(client, config, state)
+    streams = {}
+    next_polls = {}
+    failures = {}
+    now = datetime.datetime.now(pytz.utc)
+    for stream_catalog in catalog.get_selected_streams(state):
+        stream = STREAMS[stream_catalog.stream](client)
+        stream.quota = quota
+        stream.write_schema(stream_catalog.schema.to_dict(), stream_catalog.stream)
+        streams[stream_catalog.stream] = (stream, stream_catalog)
+        next_polls[stream_catalog.stream] = now
+
+    if not streams:
+        LOGGER.warning("No stream selected, nothing to poll")
+        return state
+
+    LOGGER.info(f"Polling {sorted(streams)} every {interval}")
+    polls = 0
+    with singer.Transformer() as transformer:
+        while not stop_event.is_set() and (max_polls is None or polls < max_polls):
+            stream_name = min(next_polls, key=next_polls.get)
+            delay = (
+                next_polls[stream_name] - datetime.datetime.now(pytz.utc)
+            ).total_seconds()
+            if delay > 0 and stop_event.wait(delay):
+                break
+
+            stream, stream_catalog = streams[stream_name]
+            # Every poll is a run of its own, with the whole retry budget
+            client.retry_engine.budget.reset()
+            try:
+                sync_stream(stream, stream_catalog, state, transformer)
+            except Exception as ex:  # pylint: disable=broad-except
+                # API and network errors past their retries, CSV rows past
+                # max_line_size, ... only end the poll of the stream, while
+                # KeyboardInterrupt and SystemExit stop the daemon
+                failures[stream_name] = failures.get(stream_name, 0) + 1
+                delay = min(
+                    POLL_RETRY_MIN_DELAY * 2 ** (failures[stream_name] - 1),
+                    POLL_RETRY_MAX_DELAY,
+                )
+                LOGGER.error(
+                    f"Poll of {stream_name} failed ({failures[stream_name]} in a "
+                    f"row), retrying in {delay}: {ex!r}"
+                )
+                next_polls[stream_name] = datetime.datetime.now(pytz.utc) + delay
+            else:
+                failures.pop(stream_name, None)
+                # A poll running late is not caught up with several in a row
+                next_polls[stream_name] = max(
+                    next_polls[stream_name] + interval,
+                    datetime.datetime.now(pytz.utc),
+                )
+            # The windows done before a failure are checkpointed as well
+            singer.write_state(state)
+            if state_path:
+                write_state_file(state_path, state)
+
+            polls += 1
+
+    LOGGER.info(f"Daemon stopped after {polls} polls")
+    return state
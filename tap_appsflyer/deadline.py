@@ -0,0 +1,23 @@
+import time
+from typing import Any, Mapping, Optional
+
+
+class Deadline:
+    """The point in time a run has to wrap up by, from the `max_runtime`
+    config in seconds."""
+
+    def __init__(self, seconds: float) -> None:
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> Optional["Deadline"]:
+        """Returns None when the runs are not time budgeted."""
+        max_runtime = config.get("max_runtime")
+        return cls(float(max_runtime)) if max_runtime else None
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
@@ -0,0 +1,94 @@
+import datetime
+import hashlib
+import json
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from singer import get_bookmark, write_bookmark
+
+BUCKET_FORMAT = "%Y-%m-%dT%H"
+# About 80 KB of state per hour of lookback
+DEFAULT_MAX_KEYS_PER_BUCKET = 2000
+
+
+def digest(value: object) -> str:
+    """Short, stable digest of a JSON serializable value."""
+    encoded = json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+
+class DedupeIndex:
+    """Digests of the records emitted inside the lookback window, kept in
+    state between runs.
+
+    Records are bucketed by the hour of their replication key, so that
+    buckets which fall out of the lookback window are dropped whole. Every
+    entry maps the digest of the record's key properties to the digest of
+    the whole record, which tells new, changed and already emitted rows
+    apart.
+
+    The index is emitted with every STATE message, so buckets hold at most
+    `max_keys_per_bucket` entries. Records past that are emitted without
+    being indexed, and emitted again by the next lookback.
+    """
+
+    state_key = "dedupe_index"
+
+    def __init__(
+        self,
+        key_properties: Iterable[str],
+        buckets: Optional[Dict[str, Dict[str, str]]] = None,
+        max_keys_per_bucket: int = DEFAULT_MAX_KEYS_PER_BUCKET,
+    ) -> None:
+        self.key_properties = list(key_properties)
+        self.buckets = buckets or {}
+        self.max_keys_per_bucket = max_keys_per_bucket
+        # Records left out of full buckets during this run
+        self.unindexed = 0
+
+    @classmethod
+    def from_state(
+        cls,
+        state: Dict,
+        tap_stream_id: str,
+        key_properties: Iterable[str],
+        config: Optional[Mapping[str, Any]] = None,
+    ) -> "DedupeIndex":
+        buckets = get_bookmark(state, tap_stream_id, cls.state_key) or {}
+        return cls(
+            key_properties,
+            buckets=buckets,
+            max_keys_per_bucket=int(
+                (config or {}).get("dedupe_max_keys_per_hour")
+                or DEFAULT_MAX_KEYS_PER_BUCKET
+            ),
+        )
+
+    def write_state(self, state: Dict, tap_stream_id: str) -> Dict:
+        return write_bookmark(state, tap_stream_id, self.state_key, self.buckets)
+
+    def update(self, record: Dict, record_timestamp: datetime.datetime) -> bool:
+        """Index the record, returns True if it is new or changed since it was
+        last emitted."""
+        bucket_name = record_timestamp.strftime(BUCKET_FORMAT)
+        key_digest = digest([record.get(key) for key in self.key_properties])
+        record_digest = digest(record)
+
+        bucket = self.buckets.get(bucket_name, {})
+        if bucket.get(key_digest) == record_digest:
+            return False
+
+        if key_digest in bucket or len(bucket) < self.max_keys_per_bucket:
+            bucket[key_digest] = record_digest
+            self.buckets[bucket_name] = bucket
+        else:
+            self.unindexed += 1
+        return True
+
+    def prune(self, oldest: datetime.datetime) -> None:
+        """Drop every bucket before the hour of `oldest`."""
+        oldest_bucket = oldest.strftime(BUCKET_FORMAT)
+        self.buckets = {
+            bucket_name: bucket
+            for bucket_name, bucket in self.buckets.items()
+            if bucket_name >= oldest_bucket
+        }
@@ -79,6 +79,18 @@ class appsflyerServiceUnavailableError(appsflyerBackoffError):
     pass
 
 
+class appsflyerGatewayTimeoutError(appsflyerBackoffError):
+    """Class representing 504 status code."""
+
+    pass
+
+
+class appsflyerCircuitOpenError(appsflyerError):
+    """Class representing requests refused while the API keeps failing."""
+
+    pass
+
+
 ERROR_CODE_EXCEPTION_MAPPING = {
     400: {
         "raise_exception": appsflyerBadRequestError,
@@ -125,4 +137,8 @@ ERROR_CODE_EXCEPTION_MAPPING = {
         "raise_exception": appsflyerServiceUnavailableError,
         "message": "API service is currently unavailable.",
     },
+    504: {
+        "raise_exception": appsflyerGatewayTimeoutError,
+        "message": "The server did not receive a timely response from the upstream server.",
+    },
 }
@@ -0,0 +1,68 @@
+from typing import Any, Dict, Iterable, Mapping, Optional
+
+from singer import get_logger, metrics
+
+LOGGER = get_logger()
+
+DEFAULT_INTERN_MAX_SIZE = 10000
+
+
+class StringInterner:
+    """Bounded cache of repeated column values.
+
+    Rows of a report repeat the same few values of columns such as
+    `media_source` or `country_code` over and over; handing out one shared
+    string per value lets every other copy be freed as soon as the row is
+    parsed, instead of living on in buffered records. Once `max_size`
+    distinct values are cached, new values are passed through unchanged.
+    """
+
+    def __init__(self, max_size: int = DEFAULT_INTERN_MAX_SIZE) -> None:
+        self.max_size = max_size
+        self.values: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> Optional["StringInterner"]:
+        """Returns None when interning is disabled with `intern_max_size: 0`."""
+        max_size = config.get("intern_max_size")
+        max_size = DEFAULT_INTERN_MAX_SIZE if max_size is None else int(max_size)
+        return cls(max_size) if max_size > 0 else None
+
+    def intern(self, value: str) -> str:
+        cached = self.values.get(value)
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        self.misses += 1
+        if len(self.values) < self.max_size:
+            self.values[value] = value
+        return value
+
+    def intern_row(self, row: Dict, field_names: Iterable[str]) -> Dict:
+        for field_name in field_names:
+            value = row.get(field_name)
+            if value:
+                row[field_name] = self.intern(value)
+        return row
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def write_metrics(self, tap_stream_id: str) -> None:
+        metrics.log(
+            LOGGER,
+            metrics.Point(
+                "gauge",
+                "intern_hit_rate",
+                round(self.hit_rate, 4),
+                {
+                    metrics.Tag.endpoint: tap_stream_id,
+                    "cached_values": len(self.values),
+                },
+            ),
+        )
@@ -0,0 +1,126 @@
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+from singer import get_bookmark, write_bookmark
+from singer.utils import strftime, strptime_to_utc
+
+Range = Tuple[datetime.datetime, datetime.datetime, Optional[datetime.datetime]]
+
+
+def latest(*values: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    values = [value for value in values if value is not None]
+    return max(values) if values else None
+
+
+class WindowLedger:
+    """Windows of a stream completed past its bookmark, kept in state as
+    run-length encoded `[from, to, bookmark]` ranges.
+
+    Windows completed out of order, after a failed window or by shard runs,
+    are recorded here while the bookmark stays put. Once the ranges are
+    contiguous with the bookmark they are compacted into it, and the syncs
+    in between only fetch the gaps left.
+    """
+
+    state_key = "completed_windows"
+
+    def __init__(self, ranges: Optional[List[Range]] = None) -> None:
+        self.ranges = sorted(ranges or [], key=lambda entry: entry[0])
+
+    @classmethod
+    def from_state(
+        cls, state: Dict, tap_stream_id: str, bookmark_key: str
+    ) -> "WindowLedger":
+        ledgers = get_bookmark(state, tap_stream_id, cls.state_key) or {}
+        return cls(
+            [
+                (
+                    strptime_to_utc(start),
+                    strptime_to_utc(end),
+                    strptime_to_utc(bookmark) if bookmark else None,
+                )
+                for start, end, bookmark in ledgers.get(bookmark_key, [])
+            ]
+        )
+
+    def write_state(self, state: Dict, tap_stream_id: str, bookmark_key: str) -> Dict:
+        ledgers = dict(get_bookmark(state, tap_stream_id, self.state_key) or {})
+        ledgers.pop(bookmark_key, None)
+        if self.ranges:
+            ledgers[bookmark_key] = [
+                [
+                    strftime(start),
+                    strftime(end),
+                    strftime(bookmark) if bookmark else None,
+                ]
+                for start, end, bookmark in self.ranges
+            ]
+        if ledgers:
+            return write_bookmark(state, tap_stream_id, self.state_key, ledgers)
+
+        state.get("bookmarks", {}).get(tap_stream_id, {}).pop(self.state_key, None)
+        return state
+
+    def add(
+        self,
+        start: datetime.datetime,
+        end: datetime.datetime,
+        bookmark: Optional[datetime.datetime] = None,
+    ) -> None:
+        """Record a completed window and the greatest replication key value
+        emitted by it, merged with the ranges it touches."""
+        ranges = []
+        for range_start, range_end, range_bookmark in self.ranges:
+            if range_end < start or range_start > end:
+                ranges.append((range_start, range_end, range_bookmark))
+                continue
+            start = min(start, range_start)
+            end = max(end, range_end)
+            bookmark = latest(bookmark, range_bookmark)
+        ranges.append((start, end, bookmark))
+        self.ranges = sorted(ranges, key=lambda entry: entry[0])
+
+    def compact(
+        self,
+        bookmark: Optional[datetime.datetime],
+        covered: Optional[datetime.datetime],
+    ) -> Tuple[Optional[datetime.datetime], Optional[datetime.datetime]]:
+        """Fold the ranges contiguous with the completed range ending at
+        `covered` into the bookmark. Returns the new bookmark and end of
+        the completed range, or leaves the ranges alone when the start of
+        the sync (`covered`) is not known.
+
+        The bookmark is the greatest replication key value emitted, which
+        may be short of the end of the last window fetched: only what is
+        past the bookmark is fetched again by the next run.
+        """
+        if not self.ranges or covered is None:
+            return bookmark, covered
+
+        remaining = []
+        for range_start, range_end, range_bookmark in self.ranges:
+            if remaining or range_start > covered:
+                remaining.append((range_start, range_end, range_bookmark))
+                continue
+            covered = max(covered, range_end)
+            bookmark = latest(bookmark, range_bookmark)
+        self.ranges = remaining
+        return bookmark, covered
+
+    def get_gaps(
+        self, start: datetime.datetime, stop: datetime.datetime
+    ) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+        """The parts of `start` - `stop` not covered by a completed range."""
+        gaps = []
+        cursor = start
+        for range_start, range_end, _ in self.ranges:
+            if cursor >= stop:
+                break
+            if range_end <= cursor:
+                continue
+            if range_start > cursor:
+                gaps.append((cursor, min(range_start, stop)))
+            cursor = max(cursor, range_end)
+        if cursor < stop:
+            gaps.append((cursor, stop))
+        return gaps
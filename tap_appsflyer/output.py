@@ -0,0 +1,219 @@
+import contextlib
+import gzip
+import io
+import os
+import re
+import stat
+import sys
+from typing import Any, BinaryIO, Dict, Iterator, Mapping, TextIO
+
+from singer import get_logger
+
+LOGGER = get_logger()
+
+STATE_MESSAGE_PREFIX = '{"type": "STATE"'
+# Messages written to the output of their stream by `StreamFanoutWriter`
+STREAM_MESSAGE_PATTERN = re.compile(
+    r'\{"type": "(?:RECORD|SCHEMA|ACTIVATE_VERSION)", "stream": "([^"\\/]+)"'
+)
+
+DEFAULT_COMPRESSION_LEVELS = {"gzip": 6, "zstd": 3}
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class StateFlushingWriter(io.TextIOWrapper):
+    """Text stdout which holds Singer messages in a buffer of bounded size.
+
+    singer-python flushes stdout after every message; here only STATE
+    messages (the target's checkpoints) force a flush, everything else
+    reaches the pipe once the buffer is full. Writing into a full pipe
+    blocks, so a slow target slows the tap down instead of growing its
+    memory.
+    """
+
+    def __init__(self, buffer: io.BufferedIOBase) -> None:
+        super().__init__(buffer, encoding="utf-8")
+        self.pending_state = False
+
+    def write(self, text: str) -> int:
+        if text.startswith(STATE_MESSAGE_PREFIX):
+            self.pending_state = True
+        return super().write(text)
+
+    def flush(self) -> None:
+        if self.pending_state:
+            self.pending_state = False
+            super().flush()
+
+    def flush_all(self) -> None:
+        self.pending_state = True
+        self.flush()
+
+
+class StreamFanoutWriter(io.TextIOBase):
+    """Text stdout which writes the SCHEMA, RECORD and ACTIVATE_VERSION
+    messages of every stream to an output of its own, leaving STATE and
+    the other messages on `stdout`.
+
+    A stream goes to the named pipe `<output_dir>/<stream>` when there is
+    one, which blocks until its loader opens the pipe; otherwise it is
+    appended to `<output_dir>/<stream>.jsonl`. The stream outputs are
+    flushed ahead of every STATE message, so a STATE only checkpoints
+    records the loaders can already read.
+    """
+
+    def __init__(
+        self, stdout: TextIO, output_dir: str, buffer_size: int = io.DEFAULT_BUFFER_SIZE
+    ) -> None:
+        super().__init__()
+        self.stdout = stdout
+        self.output_dir = output_dir
+        self.buffer_size = buffer_size
+        self.stream_outputs: Dict[str, TextIO] = {}
+        os.makedirs(output_dir, exist_ok=True)
+
+    def writable(self) -> bool:
+        return True
+
+    def get_stream_output(self, stream_name: str) -> TextIO:
+        output = self.stream_outputs.get(stream_name)
+        if output is None:
+            path = os.path.join(self.output_dir, stream_name)
+            if os.path.exists(path) and stat.S_ISFIFO(os.stat(path).st_mode):
+                LOGGER.info(f"Writing {stream_name} to the named pipe {path}")
+                output = open(path, "w", encoding="utf-8", buffering=self.buffer_size)
+            else:
+                path = f"{path}.jsonl"
+                LOGGER.info(f"Writing {stream_name} to {path}")
+                output = open(path, "a", encoding="utf-8", buffering=self.buffer_size)
+            self.stream_outputs[stream_name] = output
+        return output
+
+    def write(self, text: str) -> int:
+        match = STREAM_MESSAGE_PATTERN.match(text)
+        if match:
+            return self.get_stream_output(match.group(1)).write(text)
+        if text.startswith(STATE_MESSAGE_PREFIX):
+            for output in self.stream_outputs.values():
+                output.flush()
+        return self.stdout.write(text)
+
+    def flush(self) -> None:
+        self.stdout.flush()
+
+    def close(self) -> None:
+        if not self.closed:
+            for output in self.stream_outputs.values():
+                output.close()
+            self.stream_outputs = {}
+        super().close()
+
+
+def get_compressed_writer(
+    compression: str, level: Any, target: BinaryIO
+) -> io.BufferedIOBase:
+    """A writer compressing into `target`. Flushing it ends a block which
+    the reader can decompress, without ending the stream."""
+    if compression not in DEFAULT_COMPRESSION_LEVELS:
+        raise ValueError(f"Unsupported output_compression: {compression}")
+    level = DEFAULT_COMPRESSION_LEVELS[compression] if level is None else int(level)
+
+    if compression == "gzip":
+        # Flushing a GzipFile is a zlib sync flush
+        return gzip.GzipFile(fileobj=target, mode="wb", compresslevel=level, mtime=0)
+
+    try:
+        import zstandard
+    except ImportError as ex:
+        raise ValueError(
+            "output_compression 'zstd' requires zstandard, install tap-appsflyer[zstd]"
+        ) from ex
+    return zstandard.ZstdCompressor(level=level).stream_writer(target, closefd=False)
+
+
+def open_messages(path: str) -> TextIO:
+    """Open a file of Singer messages, compressed with `output_compression`
+    or not."""
+    with open(path, "rb") as messages_file:
+        magic = messages_file.read(4)
+
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if magic == ZSTD_MAGIC:
+        import zstandard
+
+        return io.TextIOWrapper(
+            zstandard.ZstdDecompressor().stream_reader(open(path, "rb")),
+            encoding="utf-8",
+        )
+    return open(path)
+
+
+@contextlib.contextmanager
+def configure_stdout(config: Mapping[str, Any]) -> Iterator[None]:
+    """Set up stdout for the messages of a sync from the config, see
+    `buffer_stdout` and `fan_out_stdout`."""
+    with buffer_stdout(config), fan_out_stdout(config):
+        yield
+
+
+@contextlib.contextmanager
+def fan_out_stdout(config: Mapping[str, Any]) -> Iterator[None]:
+    """Swap stdout for a `StreamFanoutWriter` while syncing, when
+    `stream_output_dir` is configured."""
+    output_dir = config.get("stream_output_dir")
+    if not output_dir:
+        yield
+        return
+
+    original_stdout = sys.stdout
+    stdout = StreamFanoutWriter(
+        original_stdout,
+        output_dir,
+        buffer_size=int(config.get("stdout_buffer_size") or io.DEFAULT_BUFFER_SIZE),
+    )
+    sys.stdout = stdout
+    try:
+        yield
+    finally:
+        stdout.close()
+        sys.stdout = original_stdout
+
+
+@contextlib.contextmanager
+def buffer_stdout(config: Mapping[str, Any]) -> Iterator[None]:
+    """Swap stdout for a `StateFlushingWriter` while syncing, when
+    `stdout_buffer_size` or `output_compression` is configured.
+
+    Compressed output is flushed on STATE messages only, each flush ending
+    a block the target can decompress and checkpoint on.
+    """
+    buffer_size = config.get("stdout_buffer_size")
+    compression = config.get("output_compression")
+    if not buffer_size and not compression:
+        yield
+        return
+
+    original_stdout = sys.stdout
+    original_stdout.flush()
+    raw_stdout = io.FileIO(original_stdout.fileno(), "w", closefd=False)
+    buffered_stdout = io.BufferedWriter(
+        raw_stdout, buffer_size=int(buffer_size or io.DEFAULT_BUFFER_SIZE)
+    )
+    compressed_stdout = None
+    if compression:
+        compressed_stdout = get_compressed_writer(
+            compression, config.get("output_compression_level"), buffered_stdout
+        )
+    stdout = StateFlushingWriter(compressed_stdout or buffered_stdout)
+    sys.stdout = stdout
+    try:
+        yield
+    finally:
+        stdout.flush_all()
+        if compressed_stdout:
+            # Ends the compressed stream, stdout itself stays open
+            stdout.close()
+        buffered_stdout.flush()
+        sys.stdout = original_stdout
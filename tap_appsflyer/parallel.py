@@ -0,0 +1,73 @@
+import queue
+import threading
+from typing import Callable, Iterable, Iterator, List
+
+DEFAULT_MAX_QUEUE_SIZE = 10000
+# Rows are handed over between threads in chunks, to keep the queue cheap
+CHUNK_ROWS = 100
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException) -> None:
+        self.error = error
+
+
+class BackgroundIterator:
+    """Drains an iterable on a daemon thread into a bounded queue.
+
+    The producing thread blocks once `max_queue_size` items are waiting to
+    be consumed, which bounds the memory held per background fetch. Errors
+    raised by the producer are re-raised to the consumer.
+    """
+
+    def __init__(
+        self,
+        iterable_factory: Callable[[], Iterable],
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        name: str = None,
+    ) -> None:
+        self.queue = queue.Queue(maxsize=max(1, max_queue_size // CHUNK_ROWS))
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(
+            target=self._produce, args=(iterable_factory,), name=name, daemon=True
+        )
+        self.thread.start()
+
+    def _put(self, item) -> bool:
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self, iterable_factory: Callable[[], Iterable]) -> None:
+        try:
+            chunk: List = []
+            for item in iterable_factory():
+                chunk.append(item)
+                if len(chunk) >= CHUNK_ROWS:
+                    if not self._put(chunk):
+                        return
+                    chunk = []
+            if chunk and not self._put(chunk):
+                return
+            self._put(_DONE)
+        except Exception as err:  # pylint: disable=broad-except
+            self._put(_Failure(err))
+
+    def __iter__(self) -> Iterator:
+        while True:
+            item = self.queue.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield from item
+
+    def stop(self) -> None:
+        """Release the producer, when the consumer stops early."""
+        self.stopped.set()
@@ -0,0 +1,165 @@
+import datetime
+from typing import Dict, Iterable, List, Tuple
+
+import pytz
+import singer
+from singer.utils import strftime, strptime_to_utc
+
+LOGGER = singer.get_logger()
+
+DEFAULT_SHARD_HOURS = 24
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+
+
+def plan_windows(
+    start: datetime.datetime,
+    stop: datetime.datetime,
+    window_size: datetime.timedelta,
+    aligned: bool = False,
+) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+    """Split `start` - `stop` into consecutive windows of at most
+    `window_size`. With `aligned` the windows end on a fixed grid of
+    `window_size` steps from the epoch (UTC midnights for a day), so that
+    runs starting at different times request the same windows."""
+    windows = []
+    window_start = start
+    while window_start < stop:
+        window_end = window_start + window_size
+        if aligned:
+            window_end -= (window_end - EPOCH) % window_size
+        window_end = min(window_end, stop)
+        windows.append((window_start, window_end))
+        window_start = window_end
+    return windows
+
+
+def fit_windows(
+    windows: List[Tuple[datetime.datetime, datetime.datetime]], max_windows: int
+) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+    """Merge contiguous windows, the shortest pairs first, down to at most
+    `max_windows`. Windows apart are not merged, the last ones are dropped
+    when there are still too many."""
+    windows = list(windows)
+    while len(windows) > max_windows:
+        contiguous = [
+            index
+            for index in range(len(windows) - 1)
+            if windows[index][1] == windows[index + 1][0]
+        ]
+        if not contiguous:
+            break
+        index = min(
+            contiguous, key=lambda index: windows[index + 1][1] - windows[index][0]
+        )
+        windows[index] = (windows[index][0], windows.pop(index + 1)[1])
+    return windows[: max(max_windows, 0)]
+
+
+def build_plan(client, config: Dict, catalog: singer.Catalog, state: Dict) -> Dict:
+    """Work list of (app_id, stream, from, to) shards, covering for every
+    selected stream the window its next sync would fetch, less the windows
+    completed in its ledger. With `daily_api_quota` the shards of a stream
+    are merged to fit the calls left to its report today."""
+    from tap_appsflyer.ledger import WindowLedger
+    from tap_appsflyer.quota import QuotaLedger
+    from tap_appsflyer.streams import STREAMS
+
+    quota = QuotaLedger.from_config(config, state)
+
+    shard_size = datetime.timedelta(
+        hours=float(config.get("shard_hours") or DEFAULT_SHARD_HOURS)
+    )
+
+    shards = []
+    for catalog_entry in catalog.get_selected_streams(state):
+        stream = STREAMS[catalog_entry.stream](client)
+        from_datetime, to_datetime = stream.get_sync_window(state)
+        ledger = WindowLedger.from_state(
+            state, stream.tap_stream_id, stream.get_bookmark_key()
+        )
+        windows = [
+            window
+            for gap in ledger.get_gaps(from_datetime, to_datetime)
+            for window in plan_windows(
+                *gap,
+                stream.round_window_size(shard_size),
+                # Cached windows are only hit again on a fixed grid
+                aligned=bool(stream.response_cache),
+            )
+        ]
+        if quota:
+            stream.quota = quota
+            windows = stream.fit_to_quota(windows, state)
+        for window_start, window_end in windows:
+            shards.append(
+                {
+                    "id": len(shards),
+                    "app_id": config["app_id"],
+                    "stream": stream.tap_stream_id,
+                    "bookmark_key": stream.get_bookmark_key(),
+                    "from": strftime(window_start),
+                    "to": strftime(window_end),
+                    # Start of the range planned for the stream, which the
+                    # merge only advances the bookmark from
+                    "plan_from": strftime(from_datetime),
+                }
+            )
+
+    LOGGER.info(f"Planned {len(shards)} shards")
+    return {"shards": shards}
+
+
+def select_shards(plan: Dict, shard_index: int, shard_count: int) -> List[Dict]:
+    """The shards of the plan run by worker `shard_index` of `shard_count`."""
+    return plan["shards"][shard_index::shard_count]
+
+
+def merge_states(state: Dict, partial_states: Iterable[Dict]) -> Dict:
+    """Fold the completed shards of partial states into the canonical state.
+
+    The shards go to the window ledger of their stream, and the bookmark
+    only advances over the ones contiguous with it, or with the start of
+    the plan when the stream has no bookmark yet. The others stay in the
+    ledger, and the next sync or plan only covers the missing windows.
+    The API calls counted by the shards are added up.
+    """
+    from tap_appsflyer.ledger import WindowLedger
+    from tap_appsflyer.quota import merge_calls
+
+    partial_states = list(partial_states)
+    ledgers = {}
+    plan_starts = {}
+    for shard_state in [state, *partial_states]:
+        for shard in shard_state.get("completed_shards", []):
+            key = (shard["stream"], shard["bookmark_key"])
+            if key not in ledgers:
+                ledgers[key] = WindowLedger.from_state(state, *key)
+            if shard.get("plan_from"):
+                plan_from = strptime_to_utc(shard["plan_from"])
+                plan_starts[key] = min(plan_starts.get(key, plan_from), plan_from)
+            ledgers[key].add(
+                strptime_to_utc(shard["from"]),
+                strptime_to_utc(shard["to"]),
+                strptime_to_utc(shard["bookmark"]) if shard.get("bookmark") else None,
+            )
+
+    for (stream_name, bookmark_key), ledger in sorted(ledgers.items()):
+        bookmark = singer.get_bookmark(state, stream_name, bookmark_key)
+        bookmark = strptime_to_utc(bookmark) if bookmark else None
+        # Without a bookmark, the windows of a first backfill only count
+        # once they are contiguous with the start of the plan
+        covered = bookmark or plan_starts.get((stream_name, bookmark_key))
+        max_bookmark, _ = ledger.compact(bookmark, covered)
+        if max_bookmark != bookmark:
+            state = singer.write_bookmark(
+                state, stream_name, bookmark_key, strftime(max_bookmark)
+            )
+        if ledger.ranges:
+            LOGGER.warning(
+                f"Shards of {stream_name} are not contiguous yet, keeping them "
+                "in the window ledger"
+            )
+        state = ledger.write_state(state, stream_name, bookmark_key)
+
+    state.pop("completed_shards", None)
+    return merge_calls(state, partial_states)
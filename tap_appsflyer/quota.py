@@ -0,0 +1,159 @@
+import contextlib
+import datetime
+import json
+import re
+import threading
+import urllib.parse
+from typing import Any, Dict, Iterable, Iterator, Mapping, Optional, Tuple
+
+import pytz
+from singer import get_logger, metrics
+
+LOGGER = get_logger()
+
+STATE_KEY = "api_calls"
+# `.../app/<app id>/<report>/v5` export paths
+REPORT_PATH_PATTERN = re.compile(r"app/(?P<app_id>[^/]+)/(?P<report>[^/]+)/v\d+/?$")
+
+
+def parse_report_path(url_or_path: str) -> Optional[Tuple[str, str]]:
+    """The app id and report name of an export URL or path, None for any
+    other request."""
+    match = REPORT_PATH_PATTERN.search(urllib.parse.urlsplit(url_or_path).path)
+    if not match:
+        return None
+    return match.group("app_id"), match.group("report")
+
+
+def get_day() -> str:
+    """The UTC day the calls made now count against."""
+    return datetime.datetime.now(pytz.utc).strftime("%Y-%m-%d")
+
+
+def prune_calls(calls: Dict, day: str) -> Dict:
+    """Drop the counts of the days before `day`, in place."""
+    for reports in calls.values():
+        for days in reports.values():
+            for past_day in [past_day for past_day in days if past_day < day]:
+                del days[past_day]
+    return calls
+
+
+class QuotaLedger:
+    """Export calls made per app, report and UTC day, against the daily
+    quota of `daily_api_quota` calls.
+
+    Every request sent counts, retries included. The counts are kept in
+    the state under `api_calls`, emitted with it, or in the JSON file of
+    `quota_ledger_path` when concurrent runs share the quota.
+    """
+
+    def __init__(
+        self, daily_quota: int, calls: Optional[Dict] = None, path: Optional[str] = None
+    ) -> None:
+        self.daily_quota = daily_quota
+        self.calls = prune_calls(calls if calls is not None else {}, get_day())
+        self.path = path
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_config(
+        cls, config: Mapping[str, Any], state: Dict
+    ) -> Optional["QuotaLedger"]:
+        """Returns None unless `daily_api_quota` is set."""
+        if not config.get("daily_api_quota"):
+            return None
+        daily_quota = int(config["daily_api_quota"])
+        if config.get("quota_ledger_path"):
+            return cls(daily_quota, path=config["quota_ledger_path"])
+        # The counts live in the state, every STATE message carries them
+        return cls(daily_quota, state.setdefault(STATE_KEY, {}))
+
+    @contextlib.contextmanager
+    def locked_file(self) -> Iterator[Dict]:
+        """The counts of the ledger file under an exclusive lock, written
+        back on exit."""
+        try:
+            import fcntl
+        except ImportError:
+            # Not available on Windows, concurrent runs may lose counts there
+            fcntl = None
+
+        with open(self.path, "a+") as ledger_file:
+            if fcntl:
+                fcntl.flock(ledger_file, fcntl.LOCK_EX)
+            ledger_file.seek(0)
+            content = ledger_file.read()
+            calls = prune_calls(
+                json.loads(content) if content.strip() else {}, get_day()
+            )
+            yield calls
+            ledger_file.seek(0)
+            ledger_file.truncate()
+            json.dump(calls, ledger_file)
+        self.calls = calls
+
+    def add_call(self, calls: Dict, app_id: str, report: str) -> None:
+        days = calls.setdefault(app_id, {}).setdefault(report, {})
+        day = get_day()
+        days[day] = days.get(day, 0) + 1
+
+    def record_request(self, url: str) -> None:
+        """Count a request about to be sent to `url`."""
+        report_path = parse_report_path(url)
+        if not report_path:
+            return
+
+        with self.lock:
+            if self.path:
+                with self.locked_file() as calls:
+                    self.add_call(calls, *report_path)
+            else:
+                self.add_call(prune_calls(self.calls, get_day()), *report_path)
+
+    def get_calls(self, app_id: str, report: str) -> int:
+        """Calls made today."""
+        if self.path:
+            # Reloads the counts, concurrent runs may have added some
+            with self.lock, self.locked_file():
+                pass
+        return self.calls.get(app_id, {}).get(report, {}).get(get_day(), 0)
+
+    def get_remaining(self, app_id: str, report: str) -> int:
+        return max(self.daily_quota - self.get_calls(app_id, report), 0)
+
+    def write_metric(self, app_id: str, report: str, tap_stream_id: str) -> None:
+        metrics.log(
+            LOGGER,
+            metrics.Point(
+                "gauge",
+                "quota_remaining",
+                self.get_remaining(app_id, report),
+                {
+                    metrics.Tag.endpoint: tap_stream_id,
+                    "app_id": app_id,
+                    "report": report,
+                },
+            ),
+        )
+
+
+def merge_calls(state: Dict, partial_states: Iterable[Dict]) -> Dict:
+    """Add the calls counted by the shard runs, each started from the
+    counts of `state`, to the counts of `state`."""
+    day = get_day()
+    base = prune_calls(state.get(STATE_KEY) or {}, day)
+    merged = json.loads(json.dumps(base))
+    for partial_state in partial_states:
+        partial = prune_calls(partial_state.get(STATE_KEY) or {}, day)
+        for app_id, reports in partial.items():
+            for report, days in reports.items():
+                for call_day, count in days.items():
+                    base_count = base.get(app_id, {}).get(report, {}).get(call_day, 0)
+                    merged_days = merged.setdefault(app_id, {}).setdefault(report, {})
+                    merged_days[call_day] = merged_days.get(call_day, 0) + max(
+                        count - base_count, 0
+                    )
+    if merged:
+        state[STATE_KEY] = merged
+    return state
@@ -0,0 +1,58 @@
+import functools
+from typing import Any, Dict, Iterable, Mapping, Tuple, Type
+
+from tap_appsflyer.batch import is_selected
+
+
+class CompactRecord:
+    """Base of the row types built by `get_record_type`.
+
+    A CSV row holds one dict entry per column, most of them empty strings.
+    Compact records keep the selected columns in `__slots__` and only set
+    the non-empty ones, about 1.5x smaller than the parsed dict while rows
+    wait in a queue or a sort buffer (see `bench_record_size.py`). Unset
+    columns read as None, like `xform_empty_strings_to_none` would make
+    them.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_row(cls, row: Mapping[str, Any]) -> "CompactRecord":
+        record = cls()
+        for field_name in cls.__slots__:
+            value = row.get(field_name)
+            # Only the empty cells, the pyarrow engine gives real booleans
+            if value is not None and value != "":
+                setattr(record, field_name, value)
+        return record
+
+    def get(self, field_name: str, default: Any = None) -> Any:
+        return getattr(self, field_name, default)
+
+    def __getitem__(self, field_name: str) -> Any:
+        return getattr(self, field_name, None)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """The row as parsed from the CSV, with None for empty columns."""
+        return {
+            field_name: getattr(self, field_name, None) for field_name in self.__slots__
+        }
+
+
+@functools.lru_cache(maxsize=None)
+def _make_record_type(field_names: Tuple[str, ...]) -> Type[CompactRecord]:
+    return type("CompactRecord", (CompactRecord,), {"__slots__": field_names})
+
+
+def get_record_type(
+    field_names: Iterable[str], stream_metadata: Dict
+) -> Type[CompactRecord]:
+    """Compact row type holding the selected `field_names`."""
+    return _make_record_type(
+        tuple(
+            field_name
+            for field_name in field_names
+            if is_selected(stream_metadata, field_name)
+        )
+    )
@@ -0,0 +1,254 @@
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from typing import Any, Callable, Mapping, Optional, Sequence, Tuple, Type
+
+from requests.exceptions import ChunkedEncodingError, ConnectionError, Timeout
+from singer import get_logger
+
+from tap_appsflyer.exceptions import (
+    appsflyerBackoffError,
+    appsflyerCircuitOpenError,
+    appsflyerNotImplementedError,
+    appsflyerRateLimitError,
+    appsflyerUnprocessableEntityError,
+)
+
+LOGGER = get_logger()
+
+DEFAULT_RETRY_BUDGET = 50
+DEFAULT_CIRCUIT_BREAKER_THRESHOLD = 5
+DEFAULT_CIRCUIT_BREAKER_COOLDOWN = 60
+
+
+class RetryPolicy:
+    """How often and how long to wait before retrying a class of errors.
+
+    Waits use full jitter: a uniform draw between 0 and an exponentially
+    growing cap, unless the server asked for a delay with Retry-After.
+    """
+
+    def __init__(
+        self, max_tries: int, base_delay: float, max_delay: float = 300
+    ) -> None:
+        self.max_tries = max_tries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def get_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.max_delay)
+        # Retry jitter, not cryptography
+        return random.uniform(  # nosec B311
+            0, min(self.max_delay, self.base_delay * 2**attempt)
+        )
+
+
+# First match wins, errors matching no policy (or a None one) are raised
+# right away
+DEFAULT_POLICIES: Sequence[
+    Tuple[Tuple[Type[BaseException], ...], Optional[RetryPolicy]]
+] = (
+    # Sending the same request again cannot fix these
+    ((appsflyerUnprocessableEntityError, appsflyerNotImplementedError), None),
+    ((appsflyerRateLimitError,), RetryPolicy(max_tries=5, base_delay=10)),
+    ((appsflyerBackoffError,), RetryPolicy(max_tries=5, base_delay=2)),
+    (
+        (ConnectionResetError, ConnectionError, ChunkedEncodingError, Timeout),
+        RetryPolicy(max_tries=5, base_delay=1),
+    ),
+)
+
+
+def get_retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds to wait from the Retry-After header of the failed response,
+    given either as seconds or as an HTTP date."""
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    value = headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0)
+
+
+class RetryBudget:
+    """Retries left for the whole run, shared by every thread of it."""
+
+    def __init__(self, retries: int) -> None:
+        self.retries = retries
+        self.remaining = retries
+        self.lock = threading.Lock()
+
+    def reset(self) -> None:
+        """Start a new run, every retry available again."""
+        with self.lock:
+            self.remaining = self.retries
+
+    def consume(self) -> bool:
+        with self.lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+
+class CircuitBreaker:
+    """Fails calls fast once `threshold` retryable errors happened in a row.
+
+    After `cooldown` seconds a single trial call goes through: its success
+    closes the circuit again, its failure reopens it.
+    """
+
+    def __init__(self, threshold: int, cooldown: float) -> None:
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self.lock:
+            if self.opened_at is None:
+                return
+            remaining = self.opened_at + self.cooldown - time.monotonic()
+            if remaining > 0:
+                raise appsflyerCircuitOpenError(
+                    f"Circuit open after {self.failures} consecutive failures, "
+                    f"retrying in {remaining:.0f}s"
+                )
+            # Half open, let this call through as the trial
+            self.opened_at = None
+            self.failures = self.threshold - 1
+
+    def record_success(self) -> None:
+        with self.lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self) -> None:
+        with self.lock:
+            self.failures += 1
+            if self.failures >= self.threshold and self.opened_at is None:
+                LOGGER.warning(
+                    f"Opening the circuit after {self.failures} consecutive failures"
+                )
+                self.opened_at = time.monotonic()
+
+
+class RetryEngine:
+    """Runs calls under the retry policies, a run wide retry budget and a
+    circuit breaker."""
+
+    def __init__(
+        self,
+        policies: Sequence[
+            Tuple[Tuple[Type[BaseException], ...], Optional[RetryPolicy]]
+        ],
+        budget: RetryBudget,
+        breaker: CircuitBreaker,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.policies = policies
+        self.budget = budget
+        self.breaker = breaker
+        self.sleep = sleep
+
+    @classmethod
+    def from_config(cls, config: Mapping[str, Any]) -> "RetryEngine":
+        return cls(
+            DEFAULT_POLICIES,
+            RetryBudget(int(config.get("retry_budget") or DEFAULT_RETRY_BUDGET)),
+            CircuitBreaker(
+                int(
+                    config.get("circuit_breaker_threshold")
+                    or DEFAULT_CIRCUIT_BREAKER_THRESHOLD
+                ),
+                float(
+                    config.get("circuit_breaker_cooldown")
+                    or DEFAULT_CIRCUIT_BREAKER_COOLDOWN
+                ),
+            ),
+        )
+
+    def get_policy(self, exc: BaseException) -> Optional[RetryPolicy]:
+        for exception_classes, policy in self.policies:
+            if isinstance(exc, exception_classes):
+                return policy
+        return None
+
+    def with_policies(
+        self,
+        policies: Sequence[
+            Tuple[Tuple[Type[BaseException], ...], Optional[RetryPolicy]]
+        ],
+    ) -> "RetryEngine":
+        """An engine retrying `policies` as well, sharing the budget and the
+        circuit breaker of this one."""
+        return RetryEngine(
+            tuple(self.policies) + tuple(policies),
+            self.budget,
+            self.breaker,
+            sleep=self.sleep,
+        )
+
+    def get_retry_delay(self, exc: BaseException, attempt: int) -> Optional[float]:
+        """Seconds to wait before the next attempt after the `attempt`th
+        failed with `exc`, None to give up."""
+        policy = self.get_policy(exc)
+        if policy is None:
+            return None
+        self.breaker.record_failure()
+        if attempt >= policy.max_tries:
+            return None
+        if not self.budget.consume():
+            LOGGER.warning("Retry budget of the run spent, giving up")
+            return None
+        delay = policy.get_delay(attempt - 1, get_retry_after(exc))
+        LOGGER.warning(
+            f"{exc.__class__.__name__}: {exc}, retry {attempt} in {delay:.1f}s"
+        )
+        return delay
+
+    def call(self, func: Callable, *args, **kwargs) -> Any:
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as exc:
+                attempt += 1
+                delay = self.get_retry_delay(exc, attempt)
+                if delay is None:
+                    raise
+                self.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def call_async(self, func: Callable, *args, **kwargs) -> Any:
+        """`call` for a coroutine function, waiting without blocking the
+        event loop."""
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception as exc:
+                attempt += 1
+                delay = self.get_retry_delay(exc, attempt)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+            else:
+                self.breaker.record_success()
+                return result
@@ -1,14 +1,20 @@
+import copy
+import hashlib
 import json
 import os
-from typing import Dict, Tuple
+from typing import Dict, Optional, Tuple
 
 import singer
 from singer import metadata
 
-from tap_appsflyer.streams import STREAMS
-
 LOGGER = singer.get_logger()
 
+# Files the schemas and metadata are built from, a change to any of them
+# invalidates the serialized catalog artifact.
+ARTIFACT_SOURCES = ("schemas", "streams", "schema.py")
+
+_SCHEMAS_CACHE: Optional[Tuple[Dict, Dict]] = None
+
 
 def get_abs_path(path: str) -> str:
     """Get the absolute path for the schema files."""
@@ -36,9 +42,103 @@ def load_schema_references() -> Dict:
     return refs
 
 
+def get_artifact_dir() -> str:
+    """Cache directory of the user running the tap, never shared with other
+    users like the system temp directory."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(cache_home, "tap_appsflyer")
+
+
+def get_artifact_path() -> str:
+    """Path of the serialized schemas and metadata, fingerprinted by the size
+    and modification time of every source file."""
+    fingerprint = hashlib.sha256()
+    for source in ARTIFACT_SOURCES:
+        source_path = get_abs_path(source)
+        if os.path.isdir(source_path):
+            file_paths = sorted(
+                os.path.join(source_path, f) for f in os.listdir(source_path)
+            )
+        else:
+            file_paths = [source_path]
+        for file_path in file_paths:
+            if os.path.isfile(file_path):
+                stat = os.stat(file_path)
+                fingerprint.update(
+                    f"{file_path}:{stat.st_size}:{stat.st_mtime_ns};".encode()
+                )
+
+    return os.path.join(
+        get_artifact_dir(), f"catalog_{fingerprint.hexdigest()[:16]}.json"
+    )
+
+
+def is_trusted(artifact_file) -> bool:
+    """Whether the artifact was written by the current user and cannot be
+    modified by anyone else."""
+    if not hasattr(os, "getuid"):
+        # No file ownership to check on Windows
+        return True
+    stat = os.fstat(artifact_file.fileno())
+    return stat.st_uid == os.getuid() and not stat.st_mode & 0o022
+
+
+def load_artifact(artifact_path: str) -> Optional[Tuple[Dict, Dict]]:
+    """Load the serialized schemas and metadata, if they were already
+    built by the current user."""
+    try:
+        with open(artifact_path) as artifact_file:
+            if not is_trusted(artifact_file):
+                LOGGER.warning(
+                    f"Ignoring catalog artifact {artifact_path}, not owned by the "
+                    "current user or writable by others"
+                )
+                return None
+            artifact = json.load(artifact_file)
+        return artifact["schemas"], artifact["metadata"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def dump_artifact(artifact_path: str, schemas: Dict, field_metadata: Dict) -> None:
+    """Serialize the schemas and metadata, failures only cost the next
+    startup a rebuild."""
+    tmp_path = f"{artifact_path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(artifact_path), mode=0o700, exist_ok=True)
+        # Readable by the current user only, whatever the umask
+        with os.fdopen(
+            os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w"
+        ) as artifact_file:
+            json.dump({"schemas": schemas, "metadata": field_metadata}, artifact_file)
+        os.replace(tmp_path, artifact_path)
+    except OSError as err:
+        LOGGER.warning(f"Unable to write catalog artifact {artifact_path}: {err}")
+
+
 def get_schemas() -> Tuple[Dict, Dict]:
+    """Return schema and metadata for the catalog, built once and then served
+    from memory or from the serialized artifact."""
+    global _SCHEMAS_CACHE
+    if _SCHEMAS_CACHE is None:
+        artifact_path = get_artifact_path()
+        _SCHEMAS_CACHE = load_artifact(artifact_path)
+        if _SCHEMAS_CACHE is None:
+            _SCHEMAS_CACHE = build_schemas()
+            dump_artifact(artifact_path, *_SCHEMAS_CACHE)
+
+    # Callers edit the catalog they build, never the cached copy
+    return copy.deepcopy(_SCHEMAS_CACHE)
+
+
+def build_schemas() -> Tuple[Dict, Dict]:
     """Load the schema references, prepare metadata for each streams and return
     schema and metadata for the catalog."""
+    # Imported here so that serving the artifact does not load the streams
+    from tap_appsflyer.streams import STREAMS
+
     schemas = {}
     field_metadata = {}
 
@@ -0,0 +1,105 @@
+import math
+import sys
+from typing import Any, Callable, Dict, Mapping, Optional
+
+import simplejson
+from simplejson.encoder import encode_basestring_ascii
+
+from tap_appsflyer.batch import is_selected
+
+RECORD_SERIALIZERS = ("singer", "compiled")
+
+
+def encode_value(value: Any) -> str:
+    """Any other value, objects and arrays included, as singer encodes it."""
+    return simplejson.dumps(value, use_decimal=True)
+
+
+def encode_float(value: float) -> str:
+    if not math.isfinite(value):
+        # NaN and infinities are refused or not depending on simplejson
+        return encode_value(value)
+    return float.__repr__(value)
+
+
+# Encoders of the exact types the transformer outputs, subclasses fall back
+# to `encode_value`
+VALUE_ENCODERS: Dict[type, Callable[[Any], str]] = {
+    str: encode_basestring_ascii,
+    int: int.__repr__,
+    float: encode_float,
+    bool: lambda value: "true" if value else "false",
+}
+
+
+class RecordSerializer:
+    """Formats the RECORD messages of a stream byte for byte as
+    `singer.format_message` does.
+
+    The message envelope and the `"key": ` fragments of the selected
+    fields are encoded once, and the values by type without walking the
+    record through the generic JSON encoder. With `skip_none` the fields
+    without a value are left out of the messages.
+    """
+
+    def __init__(
+        self,
+        stream_name: str,
+        schema: Dict,
+        stream_metadata: Dict,
+        skip_none: bool = False,
+    ) -> None:
+        self.prefix = (
+            '{"type": "RECORD", "stream": '
+            f'{encode_basestring_ascii(stream_name)}, "record": {{'
+        )
+        self.key_fragments = {
+            field_name: encode_basestring_ascii(field_name) + ": "
+            for field_name in schema.get("properties", {})
+            if is_selected(stream_metadata, field_name)
+        }
+        self.skip_none = skip_none
+
+    @classmethod
+    def from_config(
+        cls,
+        config: Mapping[str, Any],
+        stream_name: str,
+        schema: Dict,
+        stream_metadata: Dict,
+    ) -> Optional["RecordSerializer"]:
+        """Returns None for the `singer` serializer, the default, unless
+        `skip_null_fields` is set."""
+        name = config.get("record_serializer") or "singer"
+        if name not in RECORD_SERIALIZERS:
+            raise ValueError(f"Unsupported record_serializer: {name}")
+        skip_none = bool(config.get("skip_null_fields"))
+        if name == "singer" and not skip_none:
+            return None
+        return cls(stream_name, schema, stream_metadata, skip_none=skip_none)
+
+    def encode_key(self, key: Any) -> str:
+        # Fields past the schema, or keys simplejson converts to strings
+        fragment = simplejson.dumps({key: 0})[1:-2]
+        self.key_fragments[key] = fragment
+        return fragment
+
+    def format_record(self, record: Dict) -> str:
+        key_fragments = self.key_fragments
+        parts = []
+        for key, value in record.items():
+            if value is None:
+                if self.skip_none:
+                    continue
+                encoded = "null"
+            elif type(value) is str:
+                encoded = encode_basestring_ascii(value)
+            else:
+                encoded = VALUE_ENCODERS.get(type(value), encode_value)(value)
+            parts.append((key_fragments.get(key) or self.encode_key(key)) + encoded)
+        return self.prefix + ", ".join(parts) + "}}"
+
+    def write_record(self, record: Dict) -> None:
+        """Writes and flushes the message like `singer.write_record`."""
+        sys.stdout.write(self.format_record(record) + "\n")
+        sys.stdout.flush()
@@ -0,0 +1,109 @@
+import heapq
+
+# The runs are private temporary files, written and read back only by the
+# sorter, never untrusted data
+import pickle  # nosec B403
+import tempfile
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional
+
+from singer import get_logger
+
+from tap_appsflyer.deadline import Deadline
+from tap_appsflyer.records import CompactRecord
+
+LOGGER = get_logger()
+
+DEFAULT_SORT_RUN_SIZE = 100000
+
+
+class ExternalSorter:
+    """Sorts rows by `key` with bounded memory.
+
+    Runs of `run_size` rows are sorted in memory and spilled to temporary
+    files, which are then merged holding a single row of each run. The
+    sort is stable, rows with equal keys keep the order of the response.
+    A sort reaching its deadline before every row is read yields nothing.
+    """
+
+    def __init__(
+        self,
+        key: Callable[[Any], Any],
+        run_size: int = DEFAULT_SORT_RUN_SIZE,
+        tmp_dir: Optional[str] = None,
+    ) -> None:
+        self.key = key
+        self.run_size = run_size
+        self.tmp_dir = tmp_dir
+        # Runs spilled by the last sort, reported in the logs and tests
+        self.spilled_runs = 0
+        # Whether the last sort stopped reading at its deadline
+        self.interrupted = False
+
+    @classmethod
+    def from_config(
+        cls, config: Mapping[str, Any], key: Callable[[Any], Any]
+    ) -> Optional["ExternalSorter"]:
+        """Returns None unless `sort_by_replication_key` is set."""
+        if not config.get("sort_by_replication_key"):
+            return None
+        return cls(
+            key,
+            run_size=int(config.get("sort_run_size") or DEFAULT_SORT_RUN_SIZE),
+            tmp_dir=config.get("sort_tmp_dir"),
+        )
+
+    def spill(self, run: List) -> IO[bytes]:
+        run.sort(key=self.key)
+        run_file = tempfile.TemporaryFile(dir=self.tmp_dir)
+        pickler = pickle.Pickler(run_file, pickle.HIGHEST_PROTOCOL)
+        for row in run:
+            # The compact record types are built at runtime, not picklable
+            pickler.dump(row.to_dict() if isinstance(row, CompactRecord) else row)
+            # Rows do not share objects, no need to track them across dumps
+            pickler.clear_memo()
+        run_file.seek(0)
+        return run_file
+
+    @staticmethod
+    def read_run(run_file: IO[bytes]) -> Iterator[Dict]:
+        unpickler = pickle.Unpickler(run_file)  # nosec B301
+        while True:
+            try:
+                yield unpickler.load()
+            except EOFError:
+                return
+
+    def sort(self, rows: Iterable, deadline: Optional[Deadline] = None) -> Iterator:
+        run = []
+        run_files = []
+        self.spilled_runs = 0
+        self.interrupted = False
+        try:
+            for row in rows:
+                if deadline and deadline.expired():
+                    LOGGER.info(
+                        f"Deadline reached after spilling {len(run_files)} sorted runs"
+                    )
+                    self.interrupted = True
+                    return
+                run.append(row)
+                if len(run) >= self.run_size:
+                    run_files.append(self.spill(run))
+                    run = []
+
+            run.sort(key=self.key)
+            if not run_files:
+                yield from run
+                return
+
+            self.spilled_runs = len(run_files)
+            LOGGER.info(f"Merging {len(run_files)} sorted runs spilled to disk")
+            # The last run stays in memory, it comes last in the response
+            yield from heapq.merge(
+                *(self.read_run(run_file) for run_file in run_files),
+                run,
+                key=self.key,
+            )
+        finally:
+            for run_file in run_files:
+                run_file.close()
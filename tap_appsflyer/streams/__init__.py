@@ -1,9 +1,13 @@
+from tap_appsflyer.streams.daily_report import DailyReport
 from tap_appsflyer.streams.in_app_events import InAppEvents
 from tap_appsflyer.streams.installs import Installs
 from tap_appsflyer.streams.organic_installs import OrganicInstalls
+from tap_appsflyer.streams.partners_by_date_report import PartnersByDateReport
 
 STREAMS = {
     "installs": Installs,
     "organic_installs": OrganicInstalls,
     "in_app_events": InAppEvents,
+    "daily_report": DailyReport,
+    "partners_by_date_report": PartnersByDateReport,
 }
@@ -1,11 +1,11 @@
 import csv
 import datetime
+import math
 import re
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 import pytz
-import requests
 import singer
 from singer import (
     Transformer,
@@ -16,13 +16,45 @@ from singer import (
     write_bookmark,
     write_record,
     write_schema,
+    write_state,
 )
 from singer.utils import strftime, strptime_to_utc
 
+from tap_appsflyer.batch import ColumnarBatchWriter
+from tap_appsflyer.cache import ResponseCache
+from tap_appsflyer.capture import ResponseRecorder
+from tap_appsflyer.csv_engines import get_csv_engine
+from tap_appsflyer.deadline import Deadline
+from tap_appsflyer.dedupe import DedupeIndex
+from tap_appsflyer.exceptions import appsflyerError
+from tap_appsflyer.interning import StringInterner
+from tap_appsflyer.ledger import WindowLedger
+from tap_appsflyer.planner import fit_windows, plan_windows
+from tap_appsflyer.quota import QuotaLedger, parse_report_path
+from tap_appsflyer.records import CompactRecord, get_record_type
+from tap_appsflyer.serializer import RecordSerializer
+from tap_appsflyer.sorting import ExternalSorter
+
 LOGGER = get_logger()
 
 
-SESSION = requests.Session()
+# Format of the `from`/`to` request params
+PARAMS_DATETIME_FORMAT = "%Y-%m-%d %H:%M"
+
+# Memory budgets of the response parsing, overridable from the config
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_MAX_LINE_SIZE = 16 * 1024 * 1024
+
+# Records emitted between STATE checkpoints of a sorted window
+DEFAULT_SORT_CHECKPOINT_INTERVAL = 50000
+
+# Window of a time budgeted run without `window_hours`, so that a backfill
+# longer than `max_runtime` still advances its bookmark window by window
+DEFAULT_BUDGETED_WINDOW_HOURS = 24
+
+# Window of a sync through the response cache without `window_hours`; the
+# windows are aligned on a grid of this size for later runs to hit the cache
+DEFAULT_CACHED_WINDOW_HOURS = 24
 
 # This order matters
 fieldnames = (
@@ -109,6 +141,27 @@ fieldnames = (
     "original_url",
 )
 
+# Columns of the aggregate reports, in the order of the CSV
+aggregate_fieldnames = (
+    "date",
+    "af_prt",
+    "media_source",
+    "campaign",
+    "impressions",
+    "clicks",
+    "ctr",
+    "installs",
+    "conversion_rate",
+    "sessions",
+    "loyal_users",
+    "loyal_users_rate",
+    "total_revenue",
+    "total_cost",
+    "roi",
+    "arpu",
+    "average_ecpi",
+)
+
 
 class BaseStream(ABC):
     """
@@ -125,10 +178,28 @@ class BaseStream(ABC):
     path = ""
     next_page_key = "next_page"
     headers = {"Accept": "application/json"}
+    # Format of the `from`/`to` request params of the report
+    params_datetime_format = PARAMS_DATETIME_FORMAT
 
     def __init__(self, client=None) -> None:
         self.client = client
         self.params = {}
+        self.response_cache = (
+            ResponseCache.from_config(client.config) if client else None
+        )
+        self.recorder = ResponseRecorder.from_config(client.config) if client else None
+        self.batch_writer = None
+        self.serializer = None
+        self.interner = StringInterner.from_config(client.config) if client else None
+        # Row type of the selected fields, for rows buffered before the transform
+        self.record_type = None
+        self.csv_engine = None
+        # Set by the sync when the run is time budgeted, see `max_runtime`
+        self.deadline: Optional[Deadline] = None
+        # Set by the sync when the calls are capped, see `daily_api_quota`
+        self.quota: Optional[QuotaLedger] = None
+        # Whether the last sync stopped at the deadline before being done
+        self.interrupted = False
 
     @property
     @abstractmethod
@@ -195,19 +266,67 @@ class BaseStream(ABC):
             return match.group(1)
         return None
 
-    def get_records(self) -> List:
-        """Interacts with api client interaction and pagination."""
+    def get_cache_key(self, params: Dict) -> Optional[str]:
+        """Returns the response cache key for the request params, or None if
+        the request window is not eligible for caching."""
+        if not self.response_cache or "to" not in params:
+            return None
+
+        if not self.response_cache.is_closed(self.get_window_end(params)):
+            return None
+
+        return self.response_cache.key(
+            self.client.config.get("app_id"), self.path, params
+        )
+
+    def get_window_end(self, params: Dict) -> datetime.datetime:
+        """End of the window requested by the params."""
+        return datetime.datetime.strptime(
+            params["to"], self.params_datetime_format
+        ).replace(tzinfo=pytz.utc)
+
+    def get_records(self, params: Optional[Dict] = None) -> List:
+        """Interacts with api client interaction and pagination, for the
+        stream's params unless others are given."""
         extraction_url = self.url_endpoint
+        params = self.params if params is None else params
+
+        if self.recorder and self.recorder.replaying:
+            return self.recorder.replay(self, params)
+
+        cache_key = self.get_cache_key(params)
+        if cache_key:
+            cached_response = self.response_cache.get(cache_key)
+            if cached_response:
+                LOGGER.info(
+                    f"Serving {self.tap_stream_id} window {params['from']} - "
+                    f"{params['to']} from the response cache"
+                )
+                return cached_response
 
-        response = self.client.get(extraction_url, self.params, self.headers)
+        response = self.client.get(extraction_url, params, self.headers)
         if not response:
             LOGGER.warning("No records found in the response")
 
         with singer.metrics.http_request_timer(
             self.parse_source_from_url(self.client.base_url)
         ) as timer:
-            resp = SESSION.send(response)
+            resp = self.client.send(response)
             timer.tags[singer.metrics.Tag.http_status_code] = resp.status_code
+
+        if self.recorder:
+            resp = self.recorder.capture(self, params, resp)
+
+        if cache_key and resp.status_code == 200:
+            return self.response_cache.put(
+                cache_key,
+                resp,
+                {
+                    "app_id": self.client.config.get("app_id"),
+                    "path": self.path,
+                    "params": params,
+                },
+            )
         return resp
 
     def write_schema(self, schema, stream_name):
@@ -220,8 +339,33 @@ class BaseStream(ABC):
 
 
 class RequestToCsvAdapter:
-    def __init__(self, request_data):
-        self.request_data_iter = request_data.iter_lines()
+    """Splits the streamed response body into lines for the csv reader,
+    without ever holding more than `max_line_size` bytes of a single line."""
+
+    def __init__(
+        self,
+        request_data,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        max_line_size: int = DEFAULT_MAX_LINE_SIZE,
+    ):
+        self.max_line_size = max_line_size
+        self.request_data_iter = self.iter_lines(
+            request_data.iter_content(chunk_size=chunk_size)
+        )
+
+    def iter_lines(self, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        pending = b""
+        for chunk in chunks:
+            lines = (pending + chunk).split(b"\n")
+            pending = lines.pop()
+            if len(pending) > self.max_line_size:
+                raise csv.Error(
+                    f"line larger than max_line_size ({self.max_line_size} bytes)"
+                )
+            for line in lines:
+                yield line[:-1] if line.endswith(b"\r") else line
+        if pending:
+            yield pending
 
     def __iter__(self):
         return self
@@ -236,6 +380,53 @@ class IncrementalStream(BaseStream):
     replication_method = "INCREMENTAL"
     forced_replication_method = "INCREMENTAL"
     config_start_key = "start_date"
+    # Columns of the report, in the order of the CSV
+    fieldnames: Tuple[str, ...] = fieldnames
+    # Columns holding "true"/"false" strings, converted to booleans
+    boolean_fields: Tuple[str, ...] = ("wifi", "is_retargeting")
+    # Columns identifying users or devices, pseudonymized in the captures
+    sensitive_fields: Tuple[str, ...] = (
+        "ip",
+        "appsflyer_id",
+        "advertising_id",
+        "idfa",
+        "android_id",
+        "customer_user_id",
+        "imei",
+        "idfv",
+        "user_agent",
+        "http_referrer",
+        "original_url",
+    )
+    # Columns repeating few distinct values, shared through the interner
+    low_cardinality_fields: Tuple[str, ...] = (
+        "attributed_touch_type",
+        "event_name",
+        "media_source",
+        "af_channel",
+        "campaign",
+        "country_code",
+        "platform",
+        "device_type",
+        "app_id",
+    )
+    # Request params the report can be filtered on, see `get_filters`
+    supported_filters: Tuple[str, ...] = ()
+    # Whether every row has exactly the `fieldnames` columns, which the
+    # pyarrow CSV engine requires
+    fixed_columns = True
+    # Format of the replication key values in the raw CSV
+    raw_datetime_format = "%Y-%m-%d %H:%M:%S"
+    raw_datetime_pattern = re.compile(r"\d{4}-\d\d-\d\d \d\d:\d\d:\d\d")
+
+    def __init__(self, client=None) -> None:
+        super().__init__(client)
+        # Sorts the rows of a window by replication key, when configured
+        self.sorter = (
+            ExternalSorter.from_config(client.config, self.get_sort_key)
+            if client
+            else None
+        )
 
     @staticmethod
     def get_restricted_start_date(date: str) -> datetime.datetime:
@@ -245,13 +436,54 @@ class IncrementalStream(BaseStream):
 
         return max(start_date, restriction_date)
 
+    def get_filters(self) -> Dict[str, str]:
+        """Report filters of the stream from the `filters` config, as request
+        params."""
+        stream_filters = (self.client.config.get("filters") or {}).get(
+            self.tap_stream_id, {}
+        )
+        unsupported = set(stream_filters) - set(self.supported_filters)
+        if unsupported:
+            raise ValueError(
+                f"Unsupported filters for {self.tap_stream_id}: {sorted(unsupported)}"
+            )
+
+        filter_params = {}
+        for name, values in sorted(stream_filters.items()):
+            if isinstance(values, str):
+                values = values.split(",")
+            values = sorted(value.strip() for value in values if value.strip())
+            if values:
+                filter_params[name] = ",".join(values)
+        return filter_params
+
+    def get_window_params(
+        self, from_datetime: datetime.datetime, to_datetime: datetime.datetime
+    ) -> Dict[str, str]:
+        """Request params of the report over a window."""
+        return {
+            **self.get_filters(),
+            "from": from_datetime.strftime(self.params_datetime_format),
+            "to": to_datetime.strftime(self.params_datetime_format),
+        }
+
+    def get_bookmark_key(self) -> str:
+        """The bookmark of a filtered sync is scoped to its filters, so
+        changing them never resumes from another filter's bookmark."""
+        filter_params = self.get_filters()
+        if not filter_params:
+            return self.replication_keys[0]
+
+        scope = ";".join(f"{name}={values}" for name, values in filter_params.items())
+        return f"{self.replication_keys[0]}|{scope}"
+
     def get_bookmark(self, state: dict, key: Any = None) -> int:
         """A wrapper for singer.get_bookmark to deal with compatibility for
         bookmark values or start values."""
         get_bookmark_value = get_bookmark(
             state,
             self.tap_stream_id,
-            key or self.replication_keys[0],
+            key or self.get_bookmark_key(),
             self.client.config.get(self.config_start_key, False),
         )
 
@@ -271,16 +503,97 @@ class IncrementalStream(BaseStream):
                 f"Expected start_datetime to be a datetime object, got {type(start_datetime)}"
             )
 
+    def get_csv_reader(self, request_data) -> csv.DictReader:
+        """Returns a reader over the response rows, bounded by the memory
+        budgets of the config."""
+        config = self.client.config
+        if config.get("max_field_size"):
+            # The limit is process wide, it applies to every stream alike
+            csv.field_size_limit(int(config["max_field_size"]))
+
+        csv_data = RequestToCsvAdapter(
+            request_data,
+            chunk_size=self.get_read_chunk_size(),
+            max_line_size=self.get_max_line_size(),
+        )
+        return csv.DictReader(csv_data, self.fieldnames)
+
+    def get_read_chunk_size(self) -> int:
+        return int(self.client.config.get("read_chunk_size") or DEFAULT_CHUNK_SIZE)
+
+    def get_max_line_size(self) -> int:
+        return int(self.client.config.get("max_line_size") or DEFAULT_MAX_LINE_SIZE)
+
+    def get_sort_key(self, row: Dict) -> str:
+        """The replication key of a raw row, as a string ordering in time.
+        Rows without a valid value sort first."""
+        value = row.get(self.replication_keys[0])
+        if not value:
+            return ""
+        if self.raw_datetime_pattern.fullmatch(value):
+            return value
+        try:
+            return strptime_to_utc(value).strftime(self.raw_datetime_format)
+        except (ValueError, OverflowError):
+            return ""
+
+    def get_rows(self, params: Optional[Dict] = None) -> Iterator[Dict]:
+        """Yields the raw CSV rows of the report, for the stream's params
+        unless others are given."""
+        if self.csv_engine is None:
+            self.csv_engine = get_csv_engine(self.client.config, self)
+        reader = self.csv_engine.read_rows(self.get_records(params))
+        if not self.interner:
+            yield from reader
+            return
+
+        for row in reader:
+            yield self.interner.intern_row(row, self.low_cardinality_fields)
+
+    def get_lookback(self) -> datetime.timedelta:
+        """Trailing window re-fetched on every run to pick up late attributed
+        rows."""
+        return datetime.timedelta(
+            hours=float(self.client.config.get("lookback_hours") or 0)
+        )
+
     def write_bookmark(self, state: dict, key: Any = None, value: Any = None) -> Dict:
         """A wrapper for singer.get_bookmark to deal with compatibility for
         bookmark values or start values."""
         return write_bookmark(
-            state, self.tap_stream_id, key or self.replication_keys[0], value
+            state, self.tap_stream_id, key or self.get_bookmark_key(), value
         )
 
+    def is_raw_timestamp_before(
+        self, raw_value: Optional[str], raw_bookmark: str
+    ) -> bool:
+        """Compares a raw CSV timestamp with the bookmark, formatted alike.
+
+        Values of the fixed width `raw_datetime_format` order as strings.
+        The bookmark is truncated to that precision, so only rows strictly
+        before it are rejected and anything else is left to the exact check
+        on the transformed record.
+        """
+        return (
+            raw_value is not None
+            and raw_value < raw_bookmark
+            and self.raw_datetime_pattern.fullmatch(raw_value) is not None
+        )
+
+    def write_record(self, record: Dict) -> None:
+        """Emit a transformed record, as a Singer RECORD message or into the
+        columnar batch files."""
+        if self.batch_writer:
+            self.batch_writer.append(record)
+        elif self.serializer:
+            self.serializer.write_record(record)
+        else:
+            write_record(self.tap_stream_id, record)
+
     def xform_boolean_field(self, record, field_name):
         value = record[field_name]
-        if value is None:
+        if not isinstance(value, str):
+            # Empty, or already converted by the CSV engine
             return
 
         record[field_name] = value.strip().lower() == "true"
@@ -292,37 +605,271 @@ class IncrementalStream(BaseStream):
 
     def xform(self, record):
         self.xform_empty_strings_to_none(record)
-        self.xform_boolean_field(record, "wifi")
-        self.xform_boolean_field(record, "is_retargeting")
+        for field_name in self.boolean_fields:
+            self.xform_boolean_field(record, field_name)
         return record
 
+    def get_sync_window(
+        self, state: Dict
+    ) -> Tuple[datetime.datetime, datetime.datetime]:
+        """The `from` and `to` of the next sync, from the bookmark (less the
+        lookback) up to 30 days later or now."""
+        from_datetime = self.get_bookmark(state)
+        lookback = self.get_lookback()
+        if lookback:
+            from_datetime = self.get_restricted_start_date(
+                strftime(from_datetime - lookback)
+            )
+
+        to_datetime = self.get_stop(from_datetime, datetime.datetime.now(pytz.utc))
+        return from_datetime, to_datetime
+
+    def get_windows(
+        self, from_datetime: datetime.datetime, to_datetime: datetime.datetime
+    ) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+        """The sync window requested in slices of `window_hours`, or in a
+        single request by default. Time budgeted runs default to slices of
+        `DEFAULT_BUDGETED_WINDOW_HOURS`.
+
+        With the response cache the slices, `DEFAULT_CACHED_WINDOW_HOURS` by
+        default, are aligned on a fixed UTC grid: the range of a run starts
+        at a different time every run, only its first slice is then missed.
+        """
+        window_hours = self.client.config.get("window_hours")
+        if not window_hours and self.client.config.get("max_runtime"):
+            window_hours = DEFAULT_BUDGETED_WINDOW_HOURS
+        if not window_hours and self.response_cache:
+            window_hours = DEFAULT_CACHED_WINDOW_HOURS
+        if not window_hours:
+            return [(from_datetime, to_datetime)]
+        return plan_windows(
+            from_datetime,
+            to_datetime,
+            self.round_window_size(datetime.timedelta(hours=float(window_hours))),
+            aligned=bool(self.response_cache),
+        )
+
+    def round_window_size(self, window_size: datetime.timedelta) -> datetime.timedelta:
+        """The size of the windows the report can be requested in."""
+        return window_size
+
+    def get_requests_per_window(self, state: Dict) -> int:
+        """Export calls made to fetch a window."""
+        return 1
+
+    def get_report(self) -> Tuple[str, str]:
+        """The app id and report name the calls of the stream count against."""
+        return parse_report_path(self.path.format(self.client.config["app_id"]))
+
+    def fit_to_quota(
+        self, windows: List[Tuple[datetime.datetime, datetime.datetime]], state: Dict
+    ) -> List[Tuple[datetime.datetime, datetime.datetime]]:
+        """The windows merged down to the calls left to the report today.
+        Those that do not fit are left to the next day."""
+        app_id, report = self.get_report()
+        self.quota.write_metric(app_id, report, self.tap_stream_id)
+        fitted = fit_windows(
+            windows,
+            self.quota.get_remaining(app_id, report)
+            // self.get_requests_per_window(state),
+        )
+        if windows and not fitted:
+            LOGGER.warning(
+                f"Daily quota of {report} spent, {self.tap_stream_id} is synced "
+                "the next day"
+            )
+        elif len(fitted) < len(windows):
+            LOGGER.warning(
+                f"Merged the {len(windows)} windows of {self.tap_stream_id} into "
+                f"{len(fitted)} to fit the daily quota of {report}"
+            )
+            if fitted[-1][1] < windows[-1][1]:
+                LOGGER.warning(
+                    f"{self.tap_stream_id} is synced up to {strftime(fitted[-1][1])}, "
+                    "the rest is left to the next day"
+                )
+        return fitted
+
     def sync(
         self, state: Dict, schema: Dict, stream_metadata: Dict, transformer: Transformer
     ) -> Dict:
+        bookmark_date = self.get_bookmark(state)
+        lookback = self.get_lookback()
+        from_datetime, to_datetime = self.get_sync_window(state)
+
+        # Rows re-fetched by the lookback are only emitted when new or changed.
+        # The next run re-fetches from its bookmark less the lookback, so every
+        # emitted row is indexed and the prune below drops what falls behind
+        dedupe_index = None
+        if lookback:
+            dedupe_index = DedupeIndex.from_state(
+                state, self.tap_stream_id, self.key_properties, self.client.config
+            )
+
+        # Completed windows go to the ledger, which advances the bookmark over
+        # the ones contiguous with it; only the gaps it leaves are fetched.
+        # A failed window does not stop the following ones. A window cut
+        # short by the deadline is fetched again by the next run, from its
+        # last emitted record when the rows are sorted
+        bookmark_key = self.get_bookmark_key()
+        ledger = WindowLedger.from_state(state, self.tap_stream_id, bookmark_key)
+        windows = [
+            window
+            for gap in ledger.get_gaps(from_datetime, to_datetime)
+            for window in self.get_windows(*gap)
+        ]
+        if self.quota:
+            windows = self.fit_to_quota(windows, state)
+        self.interrupted = False
+        total_records = 0
+        failure = None
+        # End of the completed range the bookmark is part of
+        covered = from_datetime
+        for window_start, window_end in windows:
+            if self.deadline and self.deadline.expired():
+                LOGGER.info(f"Deadline reached, {self.tap_stream_id} resumes next run")
+                self.interrupted = True
+                break
+
+            try:
+                max_bookmark_date, window_records = self.sync_window(
+                    schema,
+                    stream_metadata,
+                    transformer,
+                    window_start,
+                    window_end,
+                    dedupe_index=dedupe_index,
+                    # Checkpoints must not move the bookmark past a gap
+                    state=state if failure is None else None,
+                )
+            except appsflyerError as ex:
+                if len(windows) == 1:
+                    raise
+                LOGGER.error(
+                    f"{self.tap_stream_id} window {strftime(window_start)} - "
+                    f"{strftime(window_end)} failed, left to the next run: {ex}"
+                )
+                failure = failure or ex
+                continue
+
+            total_records += window_records
+            if not self.interrupted:
+                ledger.add(window_start, window_end, max_bookmark_date)
+            elif self.sorter and max_bookmark_date:
+                ledger.add(window_start, max_bookmark_date, max_bookmark_date)
+            else:
+                # Unsorted rows give no safe point to resume from
+                LOGGER.warning(
+                    f"Window {strftime(window_start)} - {strftime(window_end)} of "
+                    f"{self.tap_stream_id} did not fit in max_runtime and is "
+                    "fetched again next run, lower window_hours for the "
+                    "bookmark to advance"
+                )
+
+            bookmark_date, covered = ledger.compact(bookmark_date, covered)
+            state = self.write_bookmark(state, value=strftime(bookmark_date))
+            ledger.write_state(state, self.tap_stream_id, bookmark_key)
+            if self.interrupted:
+                break
+            if len(windows) > 1:
+                write_state(state)
+
+        if self.quota:
+            self.quota.write_metric(*self.get_report(), self.tap_stream_id)
+
+        if failure:
+            # Keeps the windows completed after the failed ones
+            write_state(state)
+            raise failure
+
+        if dedupe_index:
+            if dedupe_index.unindexed:
+                LOGGER.warning(
+                    f"{dedupe_index.unindexed} {self.tap_stream_id} records past "
+                    "dedupe_max_keys_per_hour were not indexed, the next lookback "
+                    "emits them again"
+                )
+            dedupe_index.prune(bookmark_date - lookback)
+            dedupe_index.write_state(state, self.tap_stream_id)
+
+        state = self.write_bookmark(state, value=strftime(bookmark_date))
+        return total_records
+
+    def checkpoint(self, state: Dict, max_bookmark_date: datetime.datetime) -> None:
+        """Emit a STATE bookmarking the records of a sorted window emitted
+        so far. Records sharing the bookmarked value may not all be out
+        yet, the next run starts at that value again."""
+        if self.batch_writer:
+            self.batch_writer.flush()
+        bookmark_date = max(self.get_bookmark(state), max_bookmark_date)
+        write_state(self.write_bookmark(state, value=strftime(bookmark_date)))
+
+    def sync_window(
+        self,
+        schema: Dict,
+        stream_metadata: Dict,
+        transformer: Transformer,
+        from_datetime: datetime.datetime,
+        to_datetime: datetime.datetime,
+        dedupe_index: Optional[DedupeIndex] = None,
+        state: Optional[Dict] = None,
+    ) -> Tuple[Optional[datetime.datetime], int]:
+        """Emits the records of the window, returns the greatest replication
+        key value emitted (None when nothing was) and the record count.
+
+        With `sort_by_replication_key` the records are emitted in order of
+        the replication key, and the bookmark of the `state` is checkpointed
+        every `sort_checkpoint_interval` records.
+        """
         self.url_endpoint = self.get_url_endpoint()
+        if self.batch_writer is None:
+            self.batch_writer = ColumnarBatchWriter.from_config(
+                self.client.config, self.tap_stream_id, schema, stream_metadata
+            )
+        if self.serializer is None:
+            self.serializer = RecordSerializer.from_config(
+                self.client.config, self.tap_stream_id, schema, stream_metadata
+            )
 
-        bookmark_date = self.get_bookmark(state)
-        from_datetime = bookmark_date
+        self.record_type = get_record_type(self.fieldnames, stream_metadata)
+        current_max_bookmark_date = None
 
-        to_datetime = self.get_stop(from_datetime, datetime.datetime.now(pytz.utc))
+        self.params.update(self.get_window_params(from_datetime, to_datetime))
 
-        bookmark_date_to_utc = bookmark_date
-        current_max_bookmark_date = bookmark_date_to_utc
+        replication_key = self.replication_keys[0]
+        raw_bookmark = from_datetime.strftime(self.raw_datetime_format)
 
-        self.params["from"] = from_datetime.strftime("%Y-%m-%d %H:%M")
-        self.params["to"] = to_datetime.strftime("%Y-%m-%d %H:%M")
+        rows = self.get_rows()
+        checkpoint_interval = None
+        if self.sorter:
+            # Nothing comes out of the sort before every row is read, the
+            # deadline is checked while reading them too
+            rows = self.sorter.sort(rows, self.deadline)
+            if state is not None:
+                checkpoint_interval = int(
+                    self.client.config.get("sort_checkpoint_interval")
+                    or DEFAULT_SORT_CHECKPOINT_INTERVAL
+                )
 
-        with metrics.record_counter(self.tap_stream_id) as counter:
-            request_data = self.get_records()
-            csv_data = RequestToCsvAdapter(request_data)
-            try:
-                reader = csv.DictReader(csv_data, fieldnames)
-                next(reader)  # Skip the header row
-            except StopIteration:
-                LOGGER.warning("No data available in the CSV.")
-                return state
+        with metrics.record_counter(self.tap_stream_id) as counter, metrics.Counter(
+            "filtered_record_count", {metrics.Tag.endpoint: self.tap_stream_id}
+        ) as filtered_counter:
+            for row in rows:
+                if self.deadline and self.deadline.expired():
+                    LOGGER.info(
+                        f"Deadline reached, stopping {self.tap_stream_id} window "
+                        f"{self.params['from']} - {self.params['to']}"
+                    )
+                    self.interrupted = True
+                    break
 
-            for _, row in enumerate(reader):
+                # Rows before the bookmark are dropped ahead of the conversions
+                if self.is_raw_timestamp_before(row.get(replication_key), raw_bookmark):
+                    filtered_counter.increment()
+                    continue
+
+                if isinstance(row, CompactRecord):
+                    row = row.to_dict()
                 xform_record = self.xform(row)
                 transformed_record = transformer.transform(
                     xform_record, schema, stream_metadata
@@ -338,14 +885,89 @@ class IncrementalStream(BaseStream):
                         self.__class__,
                     )
                     continue
-                if record_timestamp >= bookmark_date_to_utc:
-                    write_record(self.tap_stream_id, transformed_record)
-                    current_max_bookmark_date = max(
-                        current_max_bookmark_date, record_timestamp
-                    )
+                if record_timestamp >= from_datetime:
+                    if dedupe_index and not dedupe_index.update(
+                        transformed_record, record_timestamp
+                    ):
+                        continue
+                    self.write_record(transformed_record)
+                    if (
+                        current_max_bookmark_date is None
+                        or record_timestamp > current_max_bookmark_date
+                    ):
+                        current_max_bookmark_date = record_timestamp
                     counter.increment()
+                    if checkpoint_interval and counter.value % checkpoint_interval == 0:
+                        self.checkpoint(state, current_max_bookmark_date)
 
-            state = self.write_bookmark(
-                state, value=strftime(current_max_bookmark_date)
-            )
-            return counter.value
+            if self.sorter and self.sorter.interrupted:
+                LOGGER.info(
+                    f"Deadline reached, stopping {self.tap_stream_id} window "
+                    f"{self.params['from']} - {self.params['to']} before sorting it"
+                )
+                self.interrupted = True
+
+            if self.batch_writer:
+                self.batch_writer.flush()
+
+            if self.interner:
+                self.interner.write_metrics(self.tap_stream_id)
+
+            return current_max_bookmark_date, counter.value
+
+
+class AggregateReportStream(IncrementalStream):
+    """Base Class for the aggregate (Pull API) reports, with one row of
+    figures per day and attribution.
+
+    The reports are requested by day, so the sync windows start at
+    midnight UTC. The figures of the last day synced keep changing until
+    the day is over, it is fetched again by the next run.
+    """
+
+    key_properties = ["date", "af_prt", "media_source", "campaign"]
+    replication_keys = ["date"]
+    fieldnames = aggregate_fieldnames
+    boolean_fields = ()
+    sensitive_fields = ()
+    low_cardinality_fields = ("af_prt", "media_source", "campaign")
+    # The reports add columns for the in-app events of the app
+    fixed_columns = False
+    params_datetime_format = "%Y-%m-%d"
+    raw_datetime_format = "%Y-%m-%d"
+    raw_datetime_pattern = re.compile(r"\d{4}-\d\d-\d\d")
+
+    def get_url_endpoint(self) -> str:
+        return (
+            f"{self.client.base_url}/{self.path.format(self.client.config['app_id'])}"
+        )
+
+    def get_window_params(
+        self, from_datetime: datetime.datetime, to_datetime: datetime.datetime
+    ) -> Dict[str, str]:
+        """The `to` date is inclusive, a window ending at midnight stops at
+        the day before."""
+        last_day = to_datetime - datetime.timedelta(microseconds=1)
+        return super().get_window_params(from_datetime, max(from_datetime, last_day))
+
+    def get_window_end(self, params: Dict) -> datetime.datetime:
+        return super().get_window_end(params) + datetime.timedelta(days=1)
+
+    def round_window_size(self, window_size: datetime.timedelta) -> datetime.timedelta:
+        """Whole days, every window shorter than a day would request its
+        whole day again."""
+        day = datetime.timedelta(days=1)
+        return max(math.ceil(window_size / day), 1) * day
+
+    def get_sync_window(
+        self, state: Dict
+    ) -> Tuple[datetime.datetime, datetime.datetime]:
+        from_datetime, to_datetime = super().get_sync_window(state)
+        from_datetime = from_datetime.replace(hour=0, minute=0, second=0, microsecond=0)
+        return from_datetime, to_datetime
+
+    def get_rows(self, params: Optional[Dict] = None) -> Iterator[Dict]:
+        for row in super().get_rows(params):
+            # Columns of the in-app events, past `fieldnames`
+            row.pop(None, None)
+            yield row
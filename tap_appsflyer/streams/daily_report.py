@@ -0,0 +1,6 @@
+from tap_appsflyer.streams.abstracts import AggregateReportStream
+
+
+class DailyReport(AggregateReportStream):
+    tap_stream_id = "daily_report"
+    path = "api/agg-data/export/app/{}/daily_report/v5"
@@ -1,20 +1,240 @@
-from typing import Dict, Iterator, List
+import collections
+import copy
+import functools
+import heapq
+import json
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
-from singer import Transformer, get_logger, metrics, write_record
-from singer.utils import strftime, strptime_to_utc
+from singer import Transformer, get_bookmark, get_logger, metrics, write_bookmark
 
+from tap_appsflyer.batch import is_selected
+from tap_appsflyer.parallel import DEFAULT_MAX_QUEUE_SIZE, BackgroundIterator
 from tap_appsflyer.streams.abstracts import IncrementalStream
 
 LOGGER = get_logger()
 
+DEFAULT_MAX_EVENT_NAME_PARTITIONS = 10
+DEFAULT_EVENT_VALUE_CACHE_SIZE = 10000
+
 
 class InAppEvents(IncrementalStream):
     tap_stream_id = "in_app_events"
     key_properties = ["event_time", "event_name", "appsflyer_id"]
     replication_keys = ["event_time"]
     path = "api/raw-data/export/app/{}/in_app_events_report/v5"
+    supported_filters = ("event_name", "media_source")
+
+    def __init__(self, client=None) -> None:
+        super().__init__(client)
+        self.event_name_partitions: List[str] = []
+        self.observed_event_names = collections.Counter()
+        self.event_value_decoder: Optional[Callable[[str], Any]] = None
 
     def get_url_endpoint(self) -> str:
         return (
             f"{self.client.base_url}/{self.path.format(self.client.config['app_id'])}"
         )
+
+    def get_event_name_partitions(self, state: Dict) -> List[str]:
+        """Event names fetched as partitions of their own, from the config or
+        else the most frequent ones observed by the previous run."""
+        config = self.client.config
+        if (
+            not config.get("partition_by_event_name")
+            or "event_name" in self.get_filters()
+        ):
+            return []
+
+        event_names = config.get("event_name_partitions") or get_bookmark(
+            state, self.tap_stream_id, "observed_event_names", []
+        )
+        return sorted(set(event_names))[: self.get_max_event_name_partitions()]
+
+    def get_partition_rows(self, params: Dict) -> Iterator[Dict]:
+        """Rows of a single event_name partition, or of the catch-all
+        partition excluding every partitioned event name. They wait in the
+        partition queues, as compact records."""
+        rows = self.get_rows(params)
+        if "event_name" not in params:
+            # The API has no exclusion filter, the catch-all drops them here
+            excluded = set(self.event_name_partitions)
+            rows = (row for row in rows if row["event_name"] not in excluded)
+
+        if self.record_type is None:
+            return rows
+        return map(self.record_type.from_row, rows)
+
+    def get_event_value_decoder(
+        self, stream_metadata: Dict
+    ) -> Optional[Callable[[str], Any]]:
+        """Decoder of the `event_value` JSON payloads when `decode_event_value`
+        is set and the field is selected.
+
+        Payloads repeat a handful of shapes, so decoded objects are memoized
+        on the raw string and shared between records; they must not be
+        modified. Malformed or non object payloads are kept as strings.
+        """
+        config = self.client.config
+        if not config.get("decode_event_value") or not is_selected(
+            stream_metadata, "event_value"
+        ):
+            return None
+
+        @functools.lru_cache(
+            maxsize=int(
+                config.get("event_value_cache_size") or DEFAULT_EVENT_VALUE_CACHE_SIZE
+            )
+        )
+        def decode(raw_value: str) -> Any:
+            try:
+                value = json.loads(raw_value)
+            except ValueError:
+                return raw_value
+            return value if isinstance(value, dict) else raw_value
+
+        return decode
+
+    def get_decoded_schema(self, schema: Dict) -> Dict:
+        """The schema with `event_value` allowed to be an object, when the
+        payloads are decoded."""
+        if not self.client.config.get("decode_event_value"):
+            return schema
+        schema = copy.deepcopy(schema)
+        schema["properties"]["event_value"]["type"] = ["null", "object", "string"]
+        return schema
+
+    def write_schema(self, schema, stream_name):
+        super().write_schema(self.get_decoded_schema(schema), stream_name)
+
+    def xform(self, record):
+        record = super().xform(record)
+        if self.event_value_decoder and record.get("event_value"):
+            record["event_value"] = self.event_value_decoder(record["event_value"])
+        return record
+
+    def sync_window(self, schema: Dict, stream_metadata: Dict, *args, **kwargs):
+        if self.event_value_decoder is None:
+            # Kept across windows and polls, along with its cache
+            self.event_value_decoder = self.get_event_value_decoder(stream_metadata)
+        result = super().sync_window(
+            self.get_decoded_schema(schema), stream_metadata, *args, **kwargs
+        )
+
+        if self.event_value_decoder:
+            cache_info = self.event_value_decoder.cache_info()
+            lookups = cache_info.hits + cache_info.misses
+            metrics.log(
+                LOGGER,
+                metrics.Point(
+                    "gauge",
+                    "event_value_cache_hit_rate",
+                    round(cache_info.hits / lookups, 4) if lookups else 0.0,
+                    {metrics.Tag.endpoint: self.tap_stream_id},
+                ),
+            )
+        return result
+
+    def get_max_event_name_partitions(self) -> int:
+        return int(
+            self.client.config.get("max_event_name_partitions")
+            or DEFAULT_MAX_EVENT_NAME_PARTITIONS
+        )
+
+    def get_catch_all(self) -> bool:
+        """Whether the catch-all partition is fetched: by default only when
+        the partitions are not listed by `event_name_partitions`."""
+        config = self.client.config
+        catch_all = config.get("event_name_partitions_catch_all")
+        if catch_all is None:
+            return not config.get("event_name_partitions")
+        return bool(catch_all)
+
+    def get_requests_per_window(self, state: Dict) -> int:
+        event_name_partitions = self.get_event_name_partitions(state)
+        if not event_name_partitions:
+            return 1
+        return len(event_name_partitions) + self.get_catch_all()
+
+    def get_partitioned_rows(self) -> Iterator[Dict]:
+        """Fetches every event_name partition concurrently and merges them
+        back into a single stream.
+
+        The merge takes the row with the smallest replication key among the
+        next row of each partition. The exports are not sorted, so neither is
+        the merged stream; `sort_by_replication_key` sorts it like any other
+        window.
+        """
+        partition_params = [
+            {**self.params, "event_name": event_name}
+            for event_name in self.event_name_partitions
+        ]
+        if self.get_catch_all():
+            LOGGER.warning(
+                f"The catch-all partition of {self.tap_stream_id} downloads the "
+                "whole unfiltered export on top of the event_name partitions, "
+                "list every event in event_name_partitions to skip it"
+            )
+            partition_params.append(dict(self.params))
+
+        max_queue_size = int(
+            self.client.config.get("max_queue_size") or DEFAULT_MAX_QUEUE_SIZE
+        )
+        partitions = [
+            BackgroundIterator(
+                lambda params=params: self.get_partition_rows(params),
+                max_queue_size=max_queue_size,
+                name=f"{self.tap_stream_id}-{params.get('event_name', 'other')}",
+            )
+            for params in partition_params
+        ]
+        LOGGER.info(
+            f"Fetching {self.tap_stream_id} in {len(partitions)} event_name partitions"
+        )
+        try:
+            yield from heapq.merge(
+                *partitions, key=lambda row: row[self.replication_keys[0]] or ""
+            )
+        finally:
+            for partition in partitions:
+                partition.stop()
+
+    def get_rows(self, params: Optional[Dict] = None) -> Iterator[Dict]:
+        if params is not None:
+            yield from super().get_rows(params)
+            return
+
+        if self.event_name_partitions:
+            rows = self.get_partitioned_rows()
+        else:
+            rows = super().get_rows()
+
+        if not self.client.config.get("partition_by_event_name"):
+            yield from rows
+            return
+
+        # Observed event names become the partitions of the next run
+        for row in rows:
+            if row["event_name"]:
+                self.observed_event_names[row["event_name"]] += 1
+            yield row
+
+    def sync(
+        self, state: Dict, schema: Dict, stream_metadata: Dict, transformer: Transformer
+    ) -> Dict:
+        self.event_name_partitions = self.get_event_name_partitions(state)
+        self.observed_event_names.clear()
+        total_records = super().sync(state, schema, stream_metadata, transformer)
+
+        if self.observed_event_names:
+            write_bookmark(
+                state,
+                self.tap_stream_id,
+                "observed_event_names",
+                [
+                    name
+                    for name, _ in self.observed_event_names.most_common(
+                        self.get_max_event_name_partitions()
+                    )
+                ],
+            )
+        return total_records
@@ -0,0 +1,6 @@
+from tap_appsflyer.streams.abstracts import AggregateReportStream
+
+
+class PartnersByDateReport(AggregateReportStream):
+    tap_stream_id = "partners_by_date_report"
+    path = "api/agg-data/export/app/{}/partners_by_date_report/v5"
@@ -1,8 +1,12 @@
-from typing import Dict
+import sys
+from typing import Dict, List, Optional
 
 import singer
+from singer import metrics
 
 from tap_appsflyer.client import Client
+from tap_appsflyer.deadline import Deadline
+from tap_appsflyer.quota import QuotaLedger
 from tap_appsflyer.streams import STREAMS
 
 LOGGER = singer.get_logger()
@@ -16,6 +20,38 @@ def update_currently_syncing(state: Dict, stream_name: str) -> None:
     singer.write_state(state)
 
 
+def get_peak_rss() -> Optional[int]:
+    """Peak resident set size of the process so far, in bytes."""
+    try:
+        import resource
+    except ImportError:
+        # Not available on Windows
+        return None
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS and in kilobytes everywhere else
+    return peak_rss if sys.platform == "darwin" else peak_rss * 1024
+
+
+def write_peak_rss_metric(stream_name: str) -> None:
+    peak_rss = get_peak_rss()
+    if peak_rss is not None:
+        metrics.log(
+            LOGGER,
+            metrics.Point(
+                "gauge", "peak_rss_bytes", peak_rss, {metrics.Tag.endpoint: stream_name}
+            ),
+        )
+
+
+def attach_quota(client: Client, config: Dict, state: Dict) -> Optional[QuotaLedger]:
+    """The ledger of the export calls of the run, counting the requests of
+    the client, when `daily_api_quota` is set."""
+    quota = QuotaLedger.from_config(config, state)
+    client.quota = quota
+    return quota
+
+
 def sync(client: Client, config: Dict, catalog: singer.Catalog, state) -> None:
     """Sync selected streams from catalog."""
 
@@ -27,26 +63,104 @@ def sync(client: Client, config: Dict, catalog: singer.Catalog, state) -> None:
     last_stream = singer.get_currently_syncing(state)
     LOGGER.info(f"last/currently syncing stream: {last_stream}")
 
+    deadline = Deadline.from_config(config)
+    quota = attach_quota(client, config, state)
     with singer.Transformer() as transformer:
         for stream_name in selected_streams:
+            if deadline and deadline.expired():
+                LOGGER.info(f"Deadline reached, {stream_name} is synced next run")
+                update_currently_syncing(state, stream_name)
+                break
+
+            stream = STREAMS[stream_name](client)
+            stream.deadline = deadline
+            stream.quota = quota
+            stream_catalog = catalog.get_stream(stream_name)
+            stream.write_schema(stream_catalog.schema.to_dict(), stream_name)
+            sync_stream(stream, stream_catalog, state, transformer)
+            if stream.interrupted:
+                break
+
 
+def sync_stream(
+    stream, stream_catalog: singer.CatalogEntry, state: Dict, transformer
+) -> int:
+    """Sync a single stream from its bookmark, returns the record count."""
+    stream_name = stream_catalog.stream
+    LOGGER.info(f"START Syncing: {stream_name}")
+    update_currently_syncing(state, stream_name)
+    total_records = stream.sync(
+        state=state,
+        schema=stream_catalog.schema.to_dict(),
+        stream_metadata=singer.metadata.to_map(stream_catalog.metadata),
+        transformer=transformer,
+    )
+
+    # An interrupted stream stays the one to resume with
+    update_currently_syncing(state, stream_name if stream.interrupted else None)
+    write_peak_rss_metric(stream_name)
+    LOGGER.info(f"FINISHED Syncing: {stream_name}, total_records: {total_records}")
+    return total_records
+
+
+def sync_shards(
+    client: Client, config: Dict, catalog: singer.Catalog, state: Dict, shards: List
+) -> None:
+    """Sync the given shards of a plan, recording each completed one under
+    `completed_shards` of the state rather than advancing the bookmarks."""
+    # The plan fits the quota, the calls of the shards are only counted
+    attach_quota(client, config, state)
+    if config.get("prefetch_concurrency"):
+        from tap_appsflyer.async_client import prefetch_shards
+
+        prefetch_shards(client, shards)
+
+    deadline = Deadline.from_config(config)
+    written_schemas = set()
+    with singer.Transformer() as transformer:
+        for shard in shards:
+            if deadline and deadline.expired():
+                LOGGER.info(f"Deadline reached, shard {shard['id']} is left to a rerun")
+                break
+            if shard["app_id"] != config["app_id"]:
+                LOGGER.warning(
+                    f"Skipping shard {shard['id']}, planned for app {shard['app_id']}"
+                )
+                continue
+
+            stream_name = shard["stream"]
             stream = STREAMS[stream_name](client)
+            stream.deadline = deadline
             stream_catalog = catalog.get_stream(stream_name)
             stream_schema = stream_catalog.schema.to_dict()
             stream_metadata = singer.metadata.to_map(stream_catalog.metadata)
+            if stream_name not in written_schemas:
+                stream.write_schema(stream_schema, stream_name)
+                written_schemas.add(stream_name)
 
-            stream.write_schema(stream_schema, stream_name)
-
-            LOGGER.info(f"START Syncing: {stream_name}")
-            update_currently_syncing(state, stream_name)
-            total_records = stream.sync(
-                state=state,
-                schema=stream_schema,
-                stream_metadata=stream_metadata,
-                transformer=transformer,
+            LOGGER.info(
+                f"START Syncing shard {shard['id']}: {stream_name} "
+                f"{shard['from']} - {shard['to']}"
             )
+            max_bookmark, total_records = stream.sync_window(
+                stream_schema,
+                stream_metadata,
+                transformer,
+                singer.utils.strptime_to_utc(shard["from"]),
+                singer.utils.strptime_to_utc(shard["to"]),
+            )
+            if stream.interrupted:
+                break
 
-            update_currently_syncing(state, None)
+            state.setdefault("completed_shards", []).append(
+                {
+                    **shard,
+                    "bookmark": singer.utils.strftime(max_bookmark)
+                    if max_bookmark
+                    else None,
+                }
+            )
+            singer.write_state(state)
             LOGGER.info(
-                f"FINISHED Syncing: {stream_name}, total_records: {total_records}"
+                f"FINISHED Syncing shard {shard['id']}, total_records: {total_records}"
             )
@@ -0,0 +1,132 @@
+"""Syncs a synthetic export from a local stand-in of the AppsFlyer API with
+each `output_compression`, and reports the size of the Singer output and
+the CPU time of the run.
+
+    python tests/benchmarks/bench_compression.py --rows 200000
+"""
+import argparse
+import datetime
+import http.server
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import pytz
+import singer
+from singer import metadata
+
+from tap_appsflyer.client import Client
+from tap_appsflyer.output import configure_stdout
+from tap_appsflyer.schema import build_schemas
+from tap_appsflyer.streams.abstracts import fieldnames
+from tap_appsflyer.streams.installs import Installs
+
+MEDIA_SOURCES = ["googleadwords_int", "Facebook Ads", "tiktokglobal_int", "organic"]
+COUNTRIES = ["US", "GB", "DE", "IN", "BR", "JP"]
+DEVICES = ["Pixel 8", "iPhone 15", "SM-S911B", "iPhone 13"]
+
+
+def make_export(rows):
+    """CSV rows varying like a real export: unique ids, a handful of
+    distinct attributions and devices."""
+    rng = random.Random(0)
+    start = datetime.datetime.now(pytz.utc) - datetime.timedelta(days=2)
+    lines = [",".join(fieldnames)]
+    for index in range(rows):
+        touch_time = (start + datetime.timedelta(seconds=index)).strftime("%Y-%m-%d %H:%M:%S")
+        values = {
+            "attributed_touch_type": rng.choice(["click", "impression"]),
+            "attributed_touch_time": touch_time,
+            "install_time": touch_time,
+            "event_time": touch_time,
+            "event_name": "install",
+            "media_source": rng.choice(MEDIA_SOURCES),
+            "campaign": f"campaign_{rng.randrange(20)}",
+            "country_code": rng.choice(COUNTRIES),
+            "ip": f"10.{rng.randrange(256)}.{rng.randrange(256)}.{rng.randrange(256)}",
+            "wifi": rng.choice(["true", "false"]),
+            "appsflyer_id": f"{1700000000000 + index}-{rng.randrange(10 ** 7)}",
+            "advertising_id": f"{rng.getrandbits(128):032x}",
+            "platform": "android",
+            "device_type": rng.choice(DEVICES),
+            "os_version": str(rng.randrange(10, 15)),
+            "app_id": "com.example.app",
+            "is_retargeting": "false",
+        }
+        lines.append(",".join(values.get(field, "") for field in fieldnames))
+    return ("\r\n".join(lines) + "\r\n").encode("utf-8")
+
+
+def make_handler(body):
+    class ExportHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return ExportHandler
+
+
+def run(port, compression, schemas, field_metadata):
+    config = {
+        "app_id": "app",
+        "api_token": "token",
+        "start_date": "2000-01-01T00:00:00Z",
+        "output_compression": compression,
+    }
+    with tempfile.TemporaryFile(mode="w") as output_file:
+        started = time.process_time()
+        with Client(config) as client, singer.Transformer() as transformer:
+            client.base_url = f"http://127.0.0.1:{port}"
+            stdout, sys.stdout = sys.stdout, output_file
+            try:
+                with configure_stdout(config):
+                    Installs(client).sync(
+                        state={},
+                        schema=schemas["installs"],
+                        stream_metadata=metadata.to_map(field_metadata["installs"]),
+                        transformer=transformer,
+                    )
+                    singer.write_state({})
+            finally:
+                sys.stdout = stdout
+        cpu = time.process_time() - started
+        return os.fstat(output_file.fileno()).st_size, cpu
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_handler(make_export(args.rows))
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    schemas, field_metadata = build_schemas()
+
+    plain_size, plain_cpu = run(server.server_address[1], None, schemas, field_metadata)
+    print(f"none: {plain_size / 1024 / 1024:.1f} MiB, cpu {plain_cpu:.2f}s")  # noqa: T201
+    for compression in ("gzip", "zstd"):
+        try:
+            size, cpu = run(server.server_address[1], compression, schemas, field_metadata)
+        except ValueError as ex:
+            print(f"{compression}: skipped, {ex}")  # noqa: T201
+            continue
+        print(  # noqa: T201
+            f"{compression}: {size / 1024 / 1024:.1f} MiB, "
+            f"ratio {plain_size / size:.1f}x, cpu {cpu:.2f}s "
+            f"({(cpu - plain_cpu) / plain_cpu:+.0%})"
+        )
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Decodes the event_value payloads of in_app_events rows drawn from a few
+repeated shapes, with and without the memoized decoder.
+
+    python tests/benchmarks/bench_event_value.py --rows 1000000 --shapes 50
+"""
+import argparse
+import json
+import random
+import time
+from unittest import mock
+
+from singer import metadata
+
+from tap_appsflyer.schema import build_schemas
+from tap_appsflyer.streams.in_app_events import InAppEvents
+
+
+def make_payloads(shape_count):
+    return [
+        json.dumps(
+            {
+                "af_revenue": f"{index}.99",
+                "af_currency": "USD",
+                "af_content_id": f"sku-{index}",
+                "af_quantity": index % 5 + 1,
+                "af_content_type": "product",
+                "af_params": {"screen": "checkout", "variant": index % 3},
+            }
+        )
+        for index in range(shape_count)
+    ]
+
+
+def run(decode, payloads, row_count):
+    # Fresh string objects, like the CSV parser hands out for every row
+    rows = [(payloads[random.randrange(len(payloads))] + " ")[:-1] for _ in range(row_count)]
+    started = time.perf_counter()
+    for raw_value in rows:
+        decode(raw_value)
+    return row_count / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--shapes", type=int, default=50)
+    args = parser.parse_args()
+
+    _, field_metadata = build_schemas()
+    stream = InAppEvents(mock.MagicMock(config={"decode_event_value": True}))
+    decoder = stream.get_event_value_decoder(metadata.to_map(field_metadata["in_app_events"]))
+    payloads = make_payloads(args.shapes)
+
+    print(f"json.loads per row: {run(json.loads, payloads, args.rows):.0f} rows/s")  # noqa: T201
+    print(f"memoized decoder:   {run(decoder, payloads, args.rows):.0f} rows/s")  # noqa: T201
+    print(f"cache: {decoder.cache_info()}")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Streams a large synthetic export from a local stand-in of the AppsFlyer
+API through `Installs.sync` and reports the peak RSS.
+
+    python tests/benchmarks/bench_memory.py --size-mb 5120
+"""
+import argparse
+import datetime
+import http.server
+import os
+import sys
+import threading
+import time
+
+import pytz
+import singer
+from singer import metadata
+
+from tap_appsflyer.client import Client
+from tap_appsflyer.schema import build_schemas
+from tap_appsflyer.streams.abstracts import fieldnames
+from tap_appsflyer.streams.installs import Installs
+from tap_appsflyer.sync import get_peak_rss
+
+CHUNK_ROWS = 1000
+
+
+def make_row(touch_time):
+    values = {
+        "attributed_touch_time": touch_time,
+        "event_time": touch_time,
+        "install_time": touch_time,
+        "event_name": "install",
+        "wifi": "true",
+        "is_retargeting": "false",
+    }
+    return ",".join(values.get(field, f"{field}_value") for field in fieldnames)
+
+
+def make_handler(size_bytes):
+    touch_time = (datetime.datetime.now(pytz.utc) - datetime.timedelta(days=2)).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+    chunk = ("\r\n".join([make_row(touch_time)] * CHUNK_ROWS) + "\r\n").encode("utf-8")
+    header = (",".join(fieldnames) + "\r\n").encode("utf-8")
+
+    class ExportHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/csv")
+            self.end_headers()
+            self.wfile.write(header)
+            sent = 0
+            while sent < size_bytes:
+                self.wfile.write(chunk)
+                sent += len(chunk)
+
+        def log_message(self, *args):
+            pass
+
+    return ExportHandler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=512)
+    parser.add_argument("--csv-engine", default="stdlib")
+    args = parser.parse_args()
+
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), make_handler(args.size_mb * 1024 * 1024)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    schemas, field_metadata = build_schemas()
+    config = {
+        "app_id": "app",
+        "api_token": "token",
+        "start_date": "2000-01-01T00:00:00Z",
+        "csv_engine": args.csv_engine,
+    }
+    state = {}
+    started = time.time()
+    with Client(config) as client, singer.Transformer() as transformer, open(
+        os.devnull, "w"
+    ) as devnull:
+        client.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        stdout, sys.stdout = sys.stdout, devnull
+        try:
+            total_records = Installs(client).sync(
+                state=state,
+                schema=schemas["installs"],
+                stream_metadata=metadata.to_map(field_metadata["installs"]),
+                transformer=transformer,
+            )
+        finally:
+            sys.stdout = stdout
+
+    elapsed = time.time() - started
+    print(f"records: {total_records}")  # noqa: T201
+    print(f"elapsed: {elapsed:.1f}s ({total_records / elapsed:.0f} records/s)")  # noqa: T201
+    print(f"peak RSS: {get_peak_rss() / 1024 / 1024:.1f} MiB")  # noqa: T201
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
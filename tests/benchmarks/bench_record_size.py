@@ -0,0 +1,85 @@
+"""Reports the memory held by buffered rows of a typical export, as parsed
+dicts and as compact records.
+
+    python tests/benchmarks/bench_record_size.py --records 100000
+"""
+import argparse
+import tracemalloc
+
+import singer
+
+from tap_appsflyer.records import get_record_type
+from tap_appsflyer.schema import build_schemas
+from tap_appsflyer.streams.abstracts import fieldnames
+from tap_appsflyer.streams.installs import Installs
+
+ROW = {
+    "attributed_touch_type": "click",
+    "attributed_touch_time": "2024-01-01 10:00:00",
+    "install_time": "2024-01-01 10:05:00",
+    "event_time": "2024-01-01 10:05:00",
+    "event_name": "install",
+    "media_source": "googleadwords_int",
+    "campaign": "brand",
+    "appsflyer_id": "1700000000000-1234567",
+    "country_code": "US",
+    "city": "New York",
+    "ip": "10.0.0.1",
+    "wifi": "true",
+    "language": "en-US",
+    "platform": "android",
+    "device_type": "Pixel 8",
+    "os_version": "14",
+    "app_version": "1.2.3",
+    "sdk_version": "v6.12.0",
+    "app_id": "com.example.app",
+    "app_name": "Example",
+    "is_retargeting": "false",
+}
+
+
+def make_row(index):
+    # Fresh strings per row, like the csv module hands out
+    row = {field: "" for field in fieldnames}
+    row.update({field: (value + " ")[:-1] for field, value in ROW.items()})
+    row["appsflyer_id"] = f"1700000000000-{index}"
+    return row
+
+
+def measure(count, build):
+    tracemalloc.start()
+    buffered = [build(make_row(index)) for index in range(count)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del buffered
+    return size / count
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+
+    schemas, field_metadata = build_schemas()
+    stream_metadata = singer.metadata.to_map(field_metadata["installs"])
+    stream = Installs()
+    record_type = get_record_type(fieldnames, stream_metadata)
+
+    with singer.Transformer() as transformer:
+        results = {
+            "dict (parsed)": measure(args.records, lambda row: row),
+            "dict (transformed)": measure(
+                args.records,
+                lambda row: transformer.transform(
+                    stream.xform(row), schemas["installs"], stream_metadata
+                ),
+            ),
+            "compact record": measure(args.records, record_type.from_row),
+        }
+
+    for name, size in results.items():
+        print(f"{name}: {size:.0f} bytes/record")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Replays the exports captured with `capture_dir` through the sync of their
+stream, once with the base config and once per `--variant`, and reports
+the records per second of each run. No request reaches the API.
+
+    python tests/benchmarks/bench_replay.py --replay-dir captures \
+        --variant csv_engine=stdlib --variant intern_max_size=0
+"""
+import argparse
+import datetime
+import io
+import json
+import os
+import sys
+import time
+
+import pytz
+import singer
+from singer import metadata
+
+from tap_appsflyer.client import Client
+from tap_appsflyer.schema import build_schemas
+from tap_appsflyer.streams import STREAMS
+
+
+def load_captures(replay_dir):
+    """The stream and params of every capture, in capture order."""
+    captures = []
+    for file_name in os.listdir(replay_dir):
+        if file_name.endswith(".json"):
+            with open(os.path.join(replay_dir, file_name)) as meta_file:
+                captures.append(json.load(meta_file))
+    return sorted(captures, key=lambda capture: capture["captured_at"])
+
+
+def parse_variant(variant):
+    """`key=value` pairs separated by commas, values parsed as JSON when
+    they are."""
+    overrides = {}
+    for pair in filter(None, variant.split(",")):
+        key, _, value = pair.partition("=")
+        try:
+            overrides[key] = json.loads(value)
+        except ValueError:
+            overrides[key] = value
+    return overrides
+
+
+class RecordCounter(io.TextIOBase):
+    """Discards the Singer output, counting its RECORD messages."""
+
+    def __init__(self):
+        self.records = 0
+
+    def write(self, text):
+        self.records += text.startswith('{"type": "RECORD"')
+        return len(text)
+
+
+def run(config, captures, schemas, field_metadata):
+    output = RecordCounter()
+    started = time.perf_counter()
+    with Client(config) as client, singer.Transformer() as transformer:
+        stdout, sys.stdout = sys.stdout, output
+        try:
+            for capture in captures:
+                stream = STREAMS[capture["stream"]](client)
+                from_datetime = datetime.datetime.strptime(
+                    capture["params"]["from"], stream.params_datetime_format
+                ).replace(tzinfo=pytz.utc)
+                stream.sync_window(
+                    schemas[stream.tap_stream_id],
+                    metadata.to_map(field_metadata[stream.tap_stream_id]),
+                    transformer,
+                    from_datetime,
+                    stream.get_window_end(capture["params"]),
+                )
+        finally:
+            sys.stdout = stdout
+    return output.records, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--replay-dir", required=True)
+    parser.add_argument("--config", help="Base tap config, the credentials are not used")
+    parser.add_argument("--variant", action="append", default=[])
+    args = parser.parse_args()
+
+    base_config = {"app_id": "app", "api_token": "token", "start_date": "2000-01-01T00:00:00Z"}
+    if args.config:
+        with open(args.config) as config_file:
+            base_config.update(json.load(config_file))
+    base_config["replay_dir"] = args.replay_dir
+    base_config.pop("capture_dir", None)
+
+    captures = load_captures(args.replay_dir)
+    if not captures:
+        parser.error(f"No capture in {args.replay_dir}")
+    schemas, field_metadata = build_schemas()
+
+    for variant in [""] + args.variant:
+        config = {**base_config, **parse_variant(variant)}
+        records, elapsed = run(config, captures, schemas, field_metadata)
+        print(f"{variant or 'base'}: {records} records in {elapsed:.2f}s, {records / elapsed:,.0f} records/s")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
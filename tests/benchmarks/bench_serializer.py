@@ -0,0 +1,93 @@
+"""Reports the time to format the RECORD message of a typical transformed
+installs record with `singer.format_message` and with the compiled
+`RecordSerializer`, with and without `skip_null_fields`.
+
+    python tests/benchmarks/bench_serializer.py --records 100000
+"""
+import argparse
+import time
+
+import singer
+from singer import metadata
+
+from tap_appsflyer.schema import build_schemas
+from tap_appsflyer.serializer import RecordSerializer
+from tap_appsflyer.streams.abstracts import fieldnames
+from tap_appsflyer.streams.installs import Installs
+
+ROW = {
+    "attributed_touch_type": "click",
+    "attributed_touch_time": "2024-01-01 10:00:00",
+    "install_time": "2024-01-01 10:05:00",
+    "event_time": "2024-01-01 10:05:00",
+    "event_name": "install",
+    "media_source": "googleadwords_int",
+    "campaign": "brand",
+    "country_code": "US",
+    "city": "New York",
+    "ip": "10.0.0.1",
+    "wifi": "true",
+    "language": "en-US",
+    "platform": "android",
+    "device_type": "Pixel 8",
+    "os_version": "14",
+    "app_version": "1.2.3",
+    "sdk_version": "v6.12.0",
+    "app_id": "com.example.app",
+    "app_name": "Example",
+    "is_retargeting": "false",
+    "user_agent": "Dalvik/2.1.0 (Linux; U; Android 14; Pixel 8 Build/AP2A.240805.005)",
+}
+
+
+def make_records(count, stream, schema, stream_metadata):
+    records = []
+    with singer.Transformer() as transformer:
+        for index in range(count):
+            row = {field: "" for field in fieldnames}
+            row.update(ROW)
+            row["appsflyer_id"] = f"1700000000000-{index}"
+            records.append(transformer.transform(stream.xform(row), schema, stream_metadata))
+    return records
+
+
+def measure(records, format_record):
+    started = time.perf_counter()
+    for record in records:
+        format_record(record)
+    return (time.perf_counter() - started) / len(records) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--records", type=int, default=100000)
+    args = parser.parse_args()
+
+    schemas, field_metadata = build_schemas()
+    schema = schemas["installs"]
+    stream_metadata = metadata.to_map(field_metadata["installs"])
+    records = make_records(args.records, Installs(), schema, stream_metadata)
+
+    compiled = RecordSerializer("installs", schema, stream_metadata)
+    for record in records[:100]:
+        assert compiled.format_record(record) == singer.format_message(
+            singer.RecordMessage(stream="installs", record=record)
+        )
+
+    baseline = measure(
+        records,
+        lambda record: singer.format_message(
+            singer.RecordMessage(stream="installs", record=record)
+        ),
+    )
+    print(f"singer.format_message: {baseline:.2f} us/record")  # noqa: T201
+    for name, serializer in (
+        ("compiled", compiled),
+        ("compiled, skip_null_fields", RecordSerializer("installs", schema, stream_metadata, skip_none=True)),
+    ):
+        elapsed = measure(records, serializer.format_record)
+        print(f"{name}: {elapsed:.2f} us/record, {baseline / elapsed:.1f}x")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
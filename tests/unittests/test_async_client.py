@@ -0,0 +1,200 @@
+import asyncio
+import http.server
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from singer.utils import strptime_to_utc
+
+from tap_appsflyer.async_client import AsyncClient, AsyncRateLimiter, prefetch_shards
+from tap_appsflyer.cache import CachedResponse
+from tap_appsflyer.client import Client
+from tap_appsflyer.exceptions import appsflyerNotFoundError
+from tap_appsflyer.streams.installs import Installs
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+BODY = b"header\r\n" + b"row\r\n" * 1000
+
+
+class ExportHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if "unavailable" in self.path and not self.server.unavailable_served:
+            self.server.unavailable_served = True
+            self.send_response(503)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if "slow" in self.path:
+            self.send_response(200)
+            self.send_header("Content-Length", "30")
+            self.end_headers()
+            for _ in range(30):
+                self.wfile.write(b"x")
+                self.wfile.flush()
+                time.sleep(0.02)
+            return
+        if "installs_report" not in self.path:
+            self.send_response(404)
+            self.send_header("Content-Type", "application/json")
+            self.end_headers()
+            self.wfile.write(b'{"message": "no such report"}')
+            return
+        self.server.authorizations.append(self.headers["Authorization"])
+        self.send_response(200)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestAsyncRateLimiter(unittest.TestCase):
+
+    def test_spreads_requests_over_the_period(self):
+        """Verify requests past the limit wait for the period to roll."""
+
+        async def acquire_all():
+            limiter = AsyncRateLimiter(limit=2, period=0.2)
+            await asyncio.gather(*(limiter.acquire() for _ in range(5)))
+
+        started = time.monotonic()
+        asyncio.run(acquire_all())
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.4)
+
+
+@unittest.skipUnless(aiohttp, "aiohttp is not installed")
+class TestAsyncClient(unittest.TestCase):
+
+    def setUp(self):
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), ExportHandler)
+        self.server.authorizations = []
+        self.server.unavailable_served = False
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.config = {"app_id": "app", "api_token": "token"}
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_streams_the_body(self):
+        """Verify the body is streamed in chunks with the token attached."""
+
+        async def fetch():
+            async with AsyncClient(self.config) as client:
+                return [
+                    chunk
+                    async for chunk in client.iter_content(
+                        f"{self.base_url}/installs_report", {}, {}, chunk_size=100
+                    )
+                ]
+
+        chunks = asyncio.run(fetch())
+
+        self.assertEqual(b"".join(chunks), BODY)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(self.server.authorizations, ["Bearer token"])
+
+    def test_slow_body_outlasting_the_timeout(self):
+        """Verify request_timeout bounds every read, not the whole download."""
+
+        async def fetch():
+            async with AsyncClient({**self.config, "request_timeout": 0.3}) as client:
+                return b"".join(
+                    [
+                        chunk
+                        async for chunk in client.iter_content(f"{self.base_url}/slow", {}, {}, chunk_size=1)
+                    ]
+                )
+
+        self.assertEqual(asyncio.run(fetch()), b"x" * 30)
+
+    def test_errors_map_to_the_client_exceptions(self):
+        """Verify error statuses raise the same exceptions as `Client`."""
+
+        async def fetch():
+            async with AsyncClient(self.config) as client:
+                async with client.get(f"{self.base_url}/other_report", {}, {}):
+                    pass
+
+        with self.assertRaises(appsflyerNotFoundError) as context:
+            asyncio.run(fetch())
+        self.assertIn("no such report", str(context.exception))
+
+    def test_retries_through_the_client_engine(self):
+        """Verify a 503 is retried under the retry engine of the sync client,
+        drawing on its budget."""
+        client = Client({**self.config, "retry_budget": 3})
+
+        async def fetch():
+            async with AsyncClient(self.config, retry_engine=client.retry_engine) as async_client:
+                async with async_client.get(
+                    f"{self.base_url}/unavailable/installs_report", {}, {}
+                ) as response:
+                    return await response.read()
+
+        self.assertEqual(asyncio.run(fetch()), BODY)
+        self.assertEqual(client.retry_engine.budget.remaining, 2)
+
+    def test_prefetch_shards(self):
+        """Verify closed shard windows are downloaded into the response cache
+        and then served from it."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            config = {**self.config, "cache_dir": cache_dir, "prefetch_concurrency": 2}
+            shards = [
+                {
+                    "app_id": "app",
+                    "stream": "installs",
+                    "from": f"2024-01-0{day}T00:00:00.000000Z",
+                    "to": f"2024-01-0{day + 1}T00:00:00.000000Z",
+                }
+                for day in (1, 2, 3)
+            ]
+            with Client(config) as client:
+                client.base_url = self.base_url
+                self.assertEqual(prefetch_shards(client, shards), 3)
+                self.assertEqual(prefetch_shards(client, shards), 0)
+
+                stream = Installs(client)
+                stream.url_endpoint = stream.get_url_endpoint()
+                stream.params.update(
+                    stream.get_window_params(
+                        strptime_to_utc(shards[0]["from"]),
+                        strptime_to_utc(shards[0]["to"]),
+                    )
+                )
+                response = stream.get_records()
+
+            self.assertIsInstance(response, CachedResponse)
+            self.assertEqual(b"".join(response.iter_content()), BODY)
+
+    def test_failed_prefetch_is_left_to_the_sync(self):
+        """Verify a failed download does not abort the others and stays out
+        of the cache, for the shard sync to fetch."""
+        with tempfile.TemporaryDirectory() as cache_dir:
+            config = {**self.config, "cache_dir": cache_dir, "prefetch_concurrency": 2}
+            shards = [
+                {
+                    "app_id": "app",
+                    "stream": stream_name,
+                    "from": "2024-01-01T00:00:00.000000Z",
+                    "to": "2024-01-02T00:00:00.000000Z",
+                }
+                for stream_name in ("installs", "in_app_events")
+            ]
+            with Client(config) as client:
+                client.base_url = self.base_url
+                with mock.patch("tap_appsflyer.async_client.LOGGER") as mocked_logger:
+                    self.assertEqual(prefetch_shards(client, shards), 1)
+                self.assertIn("in_app_events", mocked_logger.warning.call_args.args[0])
+                self.assertEqual(prefetch_shards(client, shards), 0)
@@ -0,0 +1,91 @@
+import io
+import json
+import tempfile
+import unittest
+from unittest import mock
+
+from singer import metadata
+
+from tap_appsflyer.batch import ColumnarBatchWriter
+from tap_appsflyer.schema import build_schemas
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+SCHEMAS, FIELD_METADATA = build_schemas()
+
+
+@unittest.skipUnless(pyarrow, "pyarrow is not installed")
+class TestColumnarBatchWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.stream_metadata = metadata.to_map(FIELD_METADATA["installs"])
+        self.stream_metadata = metadata.write(
+            self.stream_metadata, ("properties", "city"), "selected", False
+        )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_writer(self, file_format, batch_size=2):
+        return ColumnarBatchWriter.from_config(
+            {
+                "output_format": file_format,
+                "batch_output_dir": self.tmp_dir.name,
+                "batch_size": batch_size,
+            },
+            "installs",
+            SCHEMAS["installs"],
+            self.stream_metadata,
+        )
+
+    def test_default_output_is_singer(self):
+        """Verify no writer is built without a columnar output format."""
+        writer = ColumnarBatchWriter.from_config(
+            {}, "installs", SCHEMAS["installs"], self.stream_metadata
+        )
+
+        self.assertIsNone(writer)
+
+    def test_parquet_batches_and_manifest(self):
+        """Verify records are written as typed columns and announced in a
+        manifest."""
+        writer = self.get_writer("parquet")
+        for appsflyer_id in ("1", "2", "3"):
+            writer.append(
+                {
+                    "appsflyer_id": appsflyer_id,
+                    "attributed_touch_time": "2024-01-01T10:30:00.000000Z",
+                    "wifi": True,
+                }
+            )
+
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            writer.flush()
+        manifest = json.loads(stdout.getvalue())
+
+        self.assertEqual(manifest["type"], "BATCH")
+        self.assertEqual(manifest["row_count"], 3)
+        self.assertEqual(len(manifest["manifest"]), 2)
+
+        table = pyarrow.parquet.read_table(manifest["manifest"][0][len("file://"):])
+        self.assertEqual(table.column("appsflyer_id").to_pylist(), ["1", "2"])
+        self.assertEqual(table.schema.field("wifi").type, pyarrow.bool_())
+        self.assertTrue(pyarrow.types.is_timestamp(table.schema.field("attributed_touch_time").type))
+        self.assertNotIn("city", table.schema.names)
+
+    def test_arrow_ipc(self):
+        """Verify records can be written as Arrow IPC files."""
+        writer = self.get_writer("arrow", batch_size=10)
+        writer.append({"appsflyer_id": "1"})
+
+        with mock.patch("sys.stdout", new_callable=io.StringIO) as stdout:
+            writer.flush()
+        path = json.loads(stdout.getvalue())["manifest"][0][len("file://"):]
+
+        table = pyarrow.ipc.open_file(path).read_all()
+        self.assertEqual(table.column("appsflyer_id").to_pylist(), ["1"])
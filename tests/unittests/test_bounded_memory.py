@@ -0,0 +1,71 @@
+import csv
+import io
+import tracemalloc
+import unittest
+from unittest import mock
+
+from tap_appsflyer.output import StateFlushingWriter
+from tap_appsflyer.streams.abstracts import RequestToCsvAdapter, fieldnames
+
+ROW = ",".join(["value"] * len(fieldnames)).encode("utf-8") + b"\r\n"
+
+
+def make_response(chunks):
+    response = mock.MagicMock()
+    response.iter_content.return_value = chunks
+    return response
+
+
+class TestRequestToCsvAdapter(unittest.TestCase):
+
+    def test_splits_lines_across_chunks(self):
+        """Verify lines split over several chunks are joined back."""
+        adapter = RequestToCsvAdapter(make_response([b"a,b\r\nc", b",d\n", b"e,f"]))
+
+        self.assertEqual(list(adapter), ["a,b", "c,d", "e,f"])
+
+    def test_max_line_size(self):
+        """Verify a line growing past the budget raises instead of being
+        buffered."""
+        adapter = RequestToCsvAdapter(
+            make_response([b"x" * 10, b"x" * 10]), max_line_size=15
+        )
+
+        with self.assertRaises(csv.Error):
+            list(adapter)
+
+    def test_memory_is_flat_while_streaming(self):
+        """Verify parsing a large export holds a bounded amount of memory."""
+        # About 8 MB of rows, streamed in 64 KiB chunks
+        chunk = ROW * (64 * 1024 // len(ROW))
+        chunk_count = 8 * 1024 * 1024 // len(chunk)
+
+        tracemalloc.start()
+        try:
+            reader = csv.DictReader(
+                RequestToCsvAdapter(make_response(chunk for _ in range(chunk_count))),
+                fieldnames,
+            )
+            for _ in reader:
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        self.assertLess(peak, 2 * 1024 * 1024)
+
+
+class TestStateFlushingWriter(unittest.TestCase):
+
+    def test_only_state_messages_flush(self):
+        """Verify records stay buffered until a STATE message is written."""
+        raw = io.BytesIO()
+        stdout = StateFlushingWriter(io.BufferedWriter(raw, buffer_size=1024))
+
+        stdout.write('{"type": "RECORD", "stream": "installs", "record": {}}\n')
+        stdout.flush()
+        self.assertEqual(raw.getvalue(), b"")
+
+        stdout.write('{"type": "STATE", "value": {}}\n')
+        stdout.flush()
+        self.assertTrue(raw.getvalue().endswith(b'{"type": "STATE", "value": {}}\n'))
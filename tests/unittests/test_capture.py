@@ -0,0 +1,115 @@
+import io
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from tap_appsflyer.capture import SanitizingWriter, pseudonymize
+from tap_appsflyer.streams.abstracts import fieldnames
+from tap_appsflyer.streams.installs import Installs
+
+BODY = (
+    b"IP,Event Value,Appsflyer ID\r\n"
+    b'10.0.0.1,"{""a"": ""multi\nline""}",1700-1\r\n'
+    b"10.0.0.2,,1700-2\r\n"
+    b"10.0.0.1,,1700-3"
+)
+
+
+def make_export(ips):
+    """An export with the IP of every row in the `ip` column."""
+    lines = [",".join(fieldnames)]
+    for ip in ips:
+        values = [""] * len(fieldnames)
+        values[fieldnames.index("ip")] = ip
+        lines.append(",".join(values))
+    return "\r\n".join(lines).encode("utf-8")
+
+
+EXPORT = make_export(["10.0.0.1", "10.0.0.2"])
+
+
+class TestSanitizingWriter(unittest.TestCase):
+
+    def sanitize(self, chunks, indexes):
+        data_file = io.BytesIO()
+        writer = SanitizingWriter(data_file, indexes, salt=b"salt")
+        for chunk in chunks:
+            writer.feed(chunk)
+        writer.close()
+        return data_file.getvalue()
+
+    def test_sensitive_columns_are_pseudonymized(self):
+        """Verify the header and other columns are kept, and the sensitive
+        values keep their length and cardinality, whatever the chunks."""
+        byte_chunks = [BODY[index:index + 1] for index in range(len(BODY))]
+        sanitized = self.sanitize(byte_chunks, [0, 2])
+
+        self.assertEqual(sanitized, self.sanitize([BODY], [0, 2]))
+        lines = sanitized.decode("utf-8").split("\r\n")
+        self.assertEqual(lines[0], "IP,Event Value,Appsflyer ID")
+        self.assertEqual(
+            lines[1],
+            f'{pseudonymize("10.0.0.1", b"salt")},"{{""a"": ""multi\nline""}}",'
+            f'{pseudonymize("1700-1", b"salt")}',
+        )
+        self.assertEqual(len(pseudonymize("10.0.0.1", b"salt")), len("10.0.0.1"))
+        self.assertNotEqual(pseudonymize("10.0.0.1", b"salt"), "10.0.0.1")
+        self.assertTrue(lines[3].startswith(pseudonymize("10.0.0.1", b"salt") + ","))
+
+    def test_nothing_to_sanitize(self):
+        self.assertEqual(self.sanitize([BODY[:10], BODY[10:]], []), BODY)
+
+
+class TestCaptureReplay(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.params = {"from": "2024-01-01 00:00", "to": "2024-01-02 00:00"}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def make_stream(self, config):
+        client = mock.MagicMock(config={"app_id": "app", **config}, base_url="https://hq1.appsflyer.com")
+        client.send.return_value = mock.MagicMock(status_code=200)
+        client.send.return_value.iter_content.return_value = [EXPORT[:700], EXPORT[700:]]
+        return Installs(client)
+
+    def test_capture_then_replay(self):
+        """Verify a capture keeps the request metadata, and is replayed for
+        another window without sending a request."""
+        stream = self.make_stream({"capture_dir": self.tmp_dir.name})
+        response = stream.get_records(self.params)
+        self.assertEqual(b"".join(response.iter_content()), EXPORT)
+
+        meta_files = [name for name in os.listdir(self.tmp_dir.name) if name.endswith(".json")]
+        self.assertEqual(len(meta_files), 1)
+        with open(os.path.join(self.tmp_dir.name, meta_files[0])) as meta_file:
+            metadata = json.load(meta_file)
+        self.assertEqual(metadata["params"], self.params)
+        self.assertIn("ip", metadata["sanitized_fields"])
+
+        stream = self.make_stream({"replay_dir": self.tmp_dir.name})
+        replayed = stream.get_records({"from": "2025-01-01 00:00", "to": "2025-01-02 00:00"})
+
+        stream.client.send.assert_not_called()
+        body = b"".join(replayed.iter_content())
+        self.assertEqual(body.split(b"\r\n")[0], EXPORT.split(b"\r\n")[0])
+        self.assertEqual(len(body.split(b"\r\n")), 4)
+        self.assertNotIn(b"10.0.0.1", body)
+
+    def test_partial_response_is_not_captured(self):
+        stream = self.make_stream({"capture_dir": self.tmp_dir.name})
+        chunks = stream.get_records(self.params).iter_content()
+        next(chunks)
+        chunks.close()
+
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+    def test_replay_without_capture(self):
+        stream = self.make_stream({"replay_dir": self.tmp_dir.name})
+
+        with self.assertRaises(FileNotFoundError):
+            stream.get_records(self.params)
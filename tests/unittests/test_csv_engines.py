@@ -0,0 +1,99 @@
+import unittest
+from unittest import mock
+
+from tap_appsflyer.csv_engines import ArrowCsvEngine, StdlibCsvEngine, get_csv_engine
+from tap_appsflyer.streams.abstracts import fieldnames
+from tap_appsflyer.streams.installs import Installs
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+
+def make_response(body, chunk_size=7):
+    response = mock.MagicMock()
+    response.iter_content.return_value = [
+        body[offset:offset + chunk_size] for offset in range(0, len(body), chunk_size)
+    ]
+    return response
+
+
+def make_csv(rows):
+    lines = [",".join(fieldnames)]
+    for values in rows:
+        lines.append(",".join(values.get(field, "") for field in fieldnames))
+    return ("\r\n".join(lines) + "\r\n").encode("utf-8")
+
+
+def make_stream(**config):
+    return Installs(mock.MagicMock(config=config))
+
+
+class TestCsvEngines(unittest.TestCase):
+
+    def test_stdlib_on_request(self):
+        """Verify `csv_engine: stdlib` keeps the csv module parser."""
+        self.assertIsInstance(
+            get_csv_engine({"csv_engine": "stdlib"}, make_stream()), StdlibCsvEngine
+        )
+        with self.assertRaises(ValueError):
+            get_csv_engine({"csv_engine": "pandas"}, make_stream())
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_pyarrow_on_request(self):
+        """Verify pyarrow is only used when asked for, even if installed."""
+        self.assertIsInstance(get_csv_engine({}, make_stream()), StdlibCsvEngine)
+        self.assertIsInstance(
+            get_csv_engine({"csv_engine": "pyarrow"}, make_stream()), ArrowCsvEngine
+        )
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_engines_agree_after_xform(self):
+        """Verify both engines produce the same rows once converted."""
+        body = make_csv(
+            [
+                {"event_time": "2024-01-01 00:00:00", "wifi": "TRUE", "city": '"New York, NY"'},
+                {"event_time": "2024-01-01 00:00:01", "wifi": "false", "is_retargeting": " true"},
+                {"event_time": "2024-01-01 00:00:02", "wifi": "0"},
+            ]
+        )
+
+        results = []
+        for engine in (StdlibCsvEngine, ArrowCsvEngine):
+            stream = make_stream(csv_block_size=4096)
+            rows = engine(stream).read_rows(make_response(body))
+            results.append([stream.xform(dict(row)) for row in rows])
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual([row["wifi"] for row in results[1]], [True, False, False])
+        self.assertEqual(results[1][0]["city"], "New York, NY")
+        self.assertIsNone(results[1][0]["is_retargeting"])
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_empty_response(self):
+        """Verify an empty body yields no rows."""
+        for body in (b"", make_csv([])):
+            rows = ArrowCsvEngine(make_stream()).read_rows(make_response(body))
+            self.assertEqual(list(rows), [])
+
+    @unittest.skipUnless(pyarrow, "pyarrow is not installed")
+    def test_engines_differ_on_malformed_rows(self):
+        """Verify the rows the engines do not parse alike: the extra columns
+        stdlib keeps and pyarrow refuses, and the quoted newlines stdlib
+        drops and pyarrow keeps."""
+        extra_columns = make_csv([{"event_time": "2024-01-01 00:00:00"}]) + (
+            ",".join(["x"] * (len(fieldnames) + 1)) + "\r\n"
+        ).encode("utf-8")
+        rows = list(StdlibCsvEngine(make_stream()).read_rows(make_response(extra_columns)))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][None], ["x"])
+        with self.assertRaises(pyarrow.ArrowInvalid):
+            list(ArrowCsvEngine(make_stream()).read_rows(make_response(extra_columns)))
+
+        quoted_newline = make_csv([{"event_time": "2024-01-01 00:00:00", "city": '"New\nYork"'}])
+        cities = [
+            [row["city"] for row in engine(make_stream()).read_rows(make_response(quoted_newline))]
+            for engine in (StdlibCsvEngine, ArrowCsvEngine)
+        ]
+        self.assertEqual(cities, [["NewYork"], ["New\nYork"]])
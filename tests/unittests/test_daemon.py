@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from requests.exceptions import ConnectionError
+from singer import metadata
+
+from tap_appsflyer.daemon import run_daemon, write_state_file
+from tap_appsflyer.discover import discover
+from tap_appsflyer.exceptions import appsflyerServiceUnavailableError
+
+
+def make_catalog(*stream_names):
+    catalog = discover()
+    for catalog_entry in catalog.streams:
+        mdata = metadata.to_map(catalog_entry.metadata)
+        if catalog_entry.tap_stream_id in stream_names:
+            mdata = metadata.write(mdata, (), "selected", True)
+        catalog_entry.metadata = metadata.to_list(mdata)
+    return catalog
+
+
+class TestDaemon(unittest.TestCase):
+
+    def test_write_state_file(self):
+        """Verify the state file is replaced without leaving a temp file."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "state.json")
+            write_state_file(path, {"bookmarks": {}})
+            write_state_file(path, {"bookmarks": {"installs": {}}})
+
+            with open(path) as state_file:
+                self.assertEqual(json.load(state_file), {"bookmarks": {"installs": {}}})
+            self.assertEqual(os.listdir(tmp_dir), ["state.json"])
+
+    @mock.patch("tap_appsflyer.daemon.singer.write_state")
+    @mock.patch("tap_appsflyer.daemon.sync_stream")
+    def test_polls_streams_in_turn(self, mocked_sync_stream, mocked_write_state):
+        """Verify every stream is polled with the same warm instance, and the
+        state is flushed after each poll."""
+        polled = []
+
+        def sync_stream(stream, stream_catalog, state, transformer):
+            polled.append((stream_catalog.stream, id(stream)))
+            state.setdefault("polls", 0)
+            state["polls"] += 1
+
+        mocked_sync_stream.side_effect = sync_stream
+        config = {"app_id": "app", "poll_interval_minutes": 0}
+        client = mock.MagicMock(config=config)
+        with tempfile.TemporaryDirectory() as tmp_dir, mock.patch(
+            "tap_appsflyer.streams.abstracts.write_schema"
+        ):
+            state_path = os.path.join(tmp_dir, "state.json")
+            state = run_daemon(
+                client,
+                config,
+                make_catalog("installs", "in_app_events"),
+                {},
+                state_path=state_path,
+                stop_event=threading.Event(),
+                max_polls=4,
+            )
+            with open(state_path) as state_file:
+                self.assertEqual(json.load(state_file), {"polls": 4})
+
+        self.assertEqual(state, {"polls": 4})
+        self.assertEqual(
+            sorted({name for name, _ in polled}), ["in_app_events", "installs"]
+        )
+        self.assertEqual(len(set(polled)), 2)
+        self.assertEqual(mocked_write_state.call_count, 4)
+        self.assertEqual(client.retry_engine.budget.reset.call_count, 4)
+
+    def run_failing_polls(self, exc):
+        """Runs 4 polls of installs and in_app_events, the polls of installs
+        raising `exc`. Returns the streams polled and the states emitted."""
+        polled = []
+
+        def sync_stream(stream, stream_catalog, state, transformer):
+            polled.append(stream_catalog.stream)
+            if stream_catalog.stream == "installs":
+                raise exc
+
+        with mock.patch("tap_appsflyer.daemon.sync_stream", side_effect=sync_stream), \
+                mock.patch("tap_appsflyer.daemon.singer.write_state") as mocked_write_state, \
+                mock.patch("tap_appsflyer.streams.abstracts.write_schema"):
+            config = {"app_id": "app", "poll_interval_minutes": 0}
+            run_daemon(
+                mock.MagicMock(config=config),
+                config,
+                make_catalog("installs", "in_app_events"),
+                {},
+                stop_event=threading.Event(),
+                max_polls=4,
+            )
+        return polled, mocked_write_state.call_count
+
+    def test_failed_poll_is_retried_later(self):
+        """Verify an API error ends the poll of its stream only: the stream is
+        rescheduled with a backoff and the others keep being polled."""
+        polled, states = self.run_failing_polls(appsflyerServiceUnavailableError("HTTP-error-code: 503"))
+
+        self.assertEqual(polled.count("installs"), 1)
+        self.assertEqual(polled.count("in_app_events"), 3)
+        self.assertEqual(states, 4)
+
+    def test_network_error_ends_the_poll_only(self):
+        """Verify errors other than API ones, a connection error past its
+        retries here, do not stop the daemon either."""
+        polled, _ = self.run_failing_polls(ConnectionError("Connection aborted"))
+
+        self.assertEqual(polled.count("installs"), 1)
+        self.assertEqual(polled.count("in_app_events"), 3)
+
+    def test_interrupt_stops_the_daemon(self):
+        with self.assertRaises(KeyboardInterrupt):
+            self.run_failing_polls(KeyboardInterrupt())
+
+    def test_stops_on_event(self):
+        """Verify a set stop event ends the daemon before the next poll."""
+        stop_event = threading.Event()
+        stop_event.set()
+        config = {"app_id": "app"}
+        with mock.patch("tap_appsflyer.daemon.sync_stream") as mocked_sync_stream, \
+                mock.patch("tap_appsflyer.streams.abstracts.write_schema"):
+            run_daemon(
+                mock.MagicMock(config=config),
+                config,
+                make_catalog("installs"),
+                {},
+                stop_event=stop_event,
+            )
+
+        mocked_sync_stream.assert_not_called()
@@ -0,0 +1,71 @@
+import datetime
+import unittest
+
+import pytz
+
+from tap_appsflyer.dedupe import DedupeIndex
+
+KEY_PROPERTIES = ["event_time", "event_name", "appsflyer_id"]
+TIMESTAMP = datetime.datetime(2024, 1, 1, 10, 30, tzinfo=pytz.utc)
+
+
+def make_record(**overrides):
+    record = {
+        "event_time": "2024-01-01T10:30:00.000000Z",
+        "event_name": "install",
+        "appsflyer_id": "1",
+        "media_source": "organic",
+    }
+    record.update(overrides)
+    return record
+
+
+class TestDedupeIndex(unittest.TestCase):
+
+    def test_new_unchanged_and_changed_records(self):
+        """Verify only new or changed records are reported for emission."""
+        index = DedupeIndex(KEY_PROPERTIES)
+
+        self.assertTrue(index.update(make_record(), TIMESTAMP))
+        self.assertFalse(index.update(make_record(), TIMESTAMP))
+        self.assertTrue(index.update(make_record(media_source="facebook"), TIMESTAMP))
+        self.assertTrue(index.update(make_record(appsflyer_id="2"), TIMESTAMP))
+
+    def test_state_round_trip(self):
+        """Verify the index is carried over to the next run through state."""
+        state = {}
+        index = DedupeIndex(KEY_PROPERTIES)
+        index.update(make_record(), TIMESTAMP)
+        index.write_state(state, "installs")
+
+        next_index = DedupeIndex.from_state(state, "installs", KEY_PROPERTIES)
+
+        self.assertFalse(next_index.update(make_record(), TIMESTAMP))
+
+    def test_buckets_are_capped(self):
+        """Verify a full bucket stops indexing new keys, while the keys it
+        holds are still updated."""
+        index = DedupeIndex(KEY_PROPERTIES, max_keys_per_bucket=2)
+        for appsflyer_id in ("1", "2", "3"):
+            self.assertTrue(index.update(make_record(appsflyer_id=appsflyer_id), TIMESTAMP))
+
+        self.assertEqual(len(index.buckets["2024-01-01T10"]), 2)
+        self.assertEqual(index.unindexed, 1)
+        self.assertTrue(index.update(make_record(appsflyer_id="3"), TIMESTAMP))
+        self.assertTrue(index.update(make_record(media_source="facebook"), TIMESTAMP))
+        self.assertFalse(index.update(make_record(media_source="facebook"), TIMESTAMP))
+        self.assertEqual(
+            DedupeIndex.from_state({}, "installs", KEY_PROPERTIES, {"dedupe_max_keys_per_hour": 5}).max_keys_per_bucket,
+            5,
+        )
+
+    def test_prune(self):
+        """Verify buckets older than the lookback window are dropped."""
+        index = DedupeIndex(KEY_PROPERTIES)
+        index.update(make_record(), TIMESTAMP)
+        later = TIMESTAMP + datetime.timedelta(hours=2)
+        index.update(make_record(appsflyer_id="2"), later)
+
+        index.prune(later)
+
+        self.assertEqual(list(index.buckets), ["2024-01-01T12"])
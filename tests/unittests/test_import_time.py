@@ -0,0 +1,58 @@
+import subprocess
+import sys
+import unittest
+
+# Budget for the tap's own share of the startup of a sync or discover run,
+# i.e. on top of singer-python and requests
+IMPORT_TIME_BUDGET_US = 60000
+
+
+def get_cumulative_import_times(statement):
+    """Run the statement in a fresh interpreter with `-X importtime` and return
+    the cumulative import time of every module, in microseconds."""
+    output = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+
+    cumulative_times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, module = line.split("|")
+        if cumulative.strip().isdigit():
+            cumulative_times[module.strip()] = int(cumulative)
+    return cumulative_times
+
+
+class TestImportTime(unittest.TestCase):
+
+    def test_package_import_is_lazy(self):
+        """Verify importing the entry point does not load the sync or discover
+        code paths."""
+        statement = (
+            "import sys, tap_appsflyer; "
+            "print(sorted(m for m in sys.modules if m.startswith('tap_appsflyer')))"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", statement], capture_output=True, text=True, check=True
+        ).stdout
+
+        self.assertEqual(output.strip(), "['tap_appsflyer']")
+
+    def test_import_time_budget(self):
+        """Verify the sync and discover code paths add less than the budget to
+        the startup time of every run."""
+        for module in ("tap_appsflyer.sync", "tap_appsflyer.discover"):
+            with self.subTest(module=module):
+                own_import_times = []
+                # The best of a few runs, the timings of a single one are noisy
+                for _ in range(3):
+                    # The dependencies every run loads are imported first, so
+                    # the tap's modules only count their own share
+                    cumulative_times = get_cumulative_import_times(f"import singer, requests; import {module}")
+                    own_import_times.append(cumulative_times["tap_appsflyer"] + cumulative_times[module])
+
+                self.assertLess(min(own_import_times), IMPORT_TIME_BUDGET_US)
@@ -0,0 +1,689 @@
+import datetime
+import unittest
+from unittest import mock
+
+import pytz
+import singer
+from singer import metadata
+
+from tap_appsflyer.discover import discover
+from tap_appsflyer.exceptions import appsflyerBadRequestError
+from tap_appsflyer.schema import build_schemas
+from tap_appsflyer.streams.abstracts import aggregate_fieldnames, fieldnames
+from tap_appsflyer.streams.daily_report import DailyReport
+from tap_appsflyer.streams.in_app_events import InAppEvents
+from tap_appsflyer.streams.installs import Installs
+from tap_appsflyer.sync import sync
+
+SCHEMAS, FIELD_METADATA = build_schemas()
+
+
+def make_response(rows):
+    """Build a fake export response carrying the header and given rows."""
+    lines = [",".join(fieldnames)]
+    for row in rows:
+        lines.append(",".join(row.get(field, "") for field in fieldnames))
+    response = mock.MagicMock(status_code=200)
+    response.iter_content.return_value = iter(
+        [("\r\n".join(lines) + "\r\n").encode("utf-8")]
+    )
+    return response
+
+
+def make_row(touch_time, appsflyer_id="1", **fields):
+    row = {
+        "attributed_touch_time": touch_time.strftime("%Y-%m-%d %H:%M:%S"),
+        "event_time": touch_time.strftime("%Y-%m-%d %H:%M:%S"),
+        "event_name": "install",
+        "appsflyer_id": appsflyer_id,
+    }
+    row.update(fields)
+    return row
+
+
+class TestIncrementalSync(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime.datetime.now(pytz.utc).replace(microsecond=0)
+        self.bookmark = self.now - datetime.timedelta(hours=1)
+        self.state = {
+            "bookmarks": {"installs": {"attributed_touch_time": singer.utils.strftime(self.bookmark)}}
+        }
+
+    def run_sync(self, config, rows):
+        client = mock.MagicMock(config={"app_id": "app", **config}, base_url="https://hq1.appsflyer.com")
+        stream = Installs(client)
+        with mock.patch.object(stream, "get_records", return_value=make_response(rows)), \
+                mock.patch("tap_appsflyer.streams.abstracts.write_record") as mocked_write_record, \
+                singer.Transformer() as transformer:
+            stream.sync(
+                state=self.state,
+                schema=SCHEMAS["installs"],
+                stream_metadata=metadata.to_map(FIELD_METADATA["installs"]),
+                transformer=transformer,
+            )
+        return stream, [call.args[1]["appsflyer_id"] for call in mocked_write_record.call_args_list]
+
+    def test_filters_rows_before_bookmark(self):
+        """Verify rows older than the bookmark are not emitted."""
+        rows = [
+            make_row(self.bookmark - datetime.timedelta(minutes=30), "old"),
+            make_row(self.bookmark + datetime.timedelta(minutes=30), "new"),
+        ]
+
+        _, emitted = self.run_sync({}, rows)
+
+        self.assertEqual(emitted, ["new"])
+
+    def test_lookback_emits_only_new_or_changed_rows(self):
+        """Verify the lookback re-fetches late rows and skips rows already
+        emitted by the previous run."""
+        late = make_row(self.bookmark - datetime.timedelta(minutes=30), "late")
+        first = make_row(self.bookmark + datetime.timedelta(minutes=10), "first")
+        config = {"lookback_hours": 6}
+
+        stream, emitted = self.run_sync(config, [first])
+        self.assertEqual(emitted, ["first"])
+        self.assertEqual(
+            stream.params["from"],
+            (self.bookmark - datetime.timedelta(hours=6)).strftime("%Y-%m-%d %H:%M"),
+        )
+
+        _, emitted = self.run_sync(config, [late, first])
+        self.assertEqual(emitted, ["late"])
+
+        changed = dict(first, media_source="facebook")
+        _, emitted = self.run_sync(config, [late, changed])
+        self.assertEqual(emitted, ["first"])
+
+    def test_lookback_rows_are_emitted_once(self):
+        """Verify an unchanged row early in the lookback, far behind now, is
+        only emitted by the first of several runs."""
+        old = make_row(self.bookmark - datetime.timedelta(hours=5, minutes=30), "old")
+        config = {"lookback_hours": 6}
+
+        emitted_by_run = [self.run_sync(config, [old])[1] for _ in range(3)]
+
+        self.assertEqual(emitted_by_run, [["old"], [], []])
+
+    def test_rows_before_bookmark_skip_the_conversions(self):
+        """Verify rows before the bookmark are filtered on the raw value,
+        before being converted."""
+        rows = [
+            make_row(self.bookmark - datetime.timedelta(minutes=30), "old"),
+            make_row(self.bookmark + datetime.timedelta(minutes=30), "new"),
+        ]
+
+        with mock.patch.object(Installs, "xform", side_effect=lambda row: row) as mocked_xform:
+            _, emitted = self.run_sync({}, rows)
+
+        self.assertEqual(emitted, ["new"])
+        self.assertEqual(
+            [call.args[0]["appsflyer_id"] for call in mocked_xform.call_args_list], ["new"]
+        )
+
+    def test_unexpected_raw_format_falls_back_to_exact_check(self):
+        """Verify raw values in another format are compared after the
+        transform."""
+        old = make_row(self.bookmark, "old")
+        old["attributed_touch_time"] = (
+            self.bookmark - datetime.timedelta(minutes=30)
+        ).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+        new = make_row(self.bookmark, "new")
+        new["attributed_touch_time"] = (
+            self.bookmark + datetime.timedelta(minutes=30)
+        ).strftime("%Y-%m-%dT%H:%M:%S+00:00")
+
+        _, emitted = self.run_sync({}, [old, new])
+
+        self.assertEqual(emitted, ["new"])
+
+
+class TestInAppEventsFilters(unittest.TestCase):
+
+    def get_stream(self, filters):
+        client = mock.MagicMock(config={"app_id": "app", "filters": filters})
+        return InAppEvents(client)
+
+    def test_filters_become_request_params(self):
+        """Verify the configured filters are pushed down as request params."""
+        stream = self.get_stream(
+            {"in_app_events": {"event_name": ["af_purchase", "af_registration"], "media_source": "facebook"}}
+        )
+
+        self.assertEqual(
+            stream.get_filters(),
+            {"event_name": "af_purchase,af_registration", "media_source": "facebook"},
+        )
+
+    def test_bookmark_is_scoped_to_filters(self):
+        """Verify a filter change does not resume from another filter's
+        bookmark."""
+        state = {}
+        purchases = self.get_stream({"in_app_events": {"event_name": ["af_purchase"]}})
+        purchases.write_bookmark(state, value="2024-01-01T00:00:00.000000Z")
+
+        self.assertEqual(purchases.get_bookmark_key(), "event_time|event_name=af_purchase")
+        self.assertEqual(self.get_stream({}).get_bookmark_key(), "event_time")
+        self.assertNotIn("event_time", state["bookmarks"]["in_app_events"])
+
+    def test_unsupported_filter(self):
+        """Verify filters the report does not support are rejected."""
+        stream = self.get_stream({"in_app_events": {"country_code": "US"}})
+
+        with self.assertRaises(ValueError):
+            stream.get_filters()
+
+
+class TestInAppEventsPartitions(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime.datetime.now(pytz.utc).replace(microsecond=0)
+        self.start = self.now - datetime.timedelta(hours=1)
+        self.state = {
+            "bookmarks": {"in_app_events": {"event_time": singer.utils.strftime(self.start)}}
+        }
+        self.rows = {
+            "af_purchase": [self.make_event(1, "af_purchase"), self.make_event(4, "af_purchase")],
+            "af_login": [self.make_event(2, "af_login")],
+            None: [
+                self.make_event(1, "af_purchase"),
+                self.make_event(3, "af_share"),
+                self.make_event(2, "af_login"),
+            ],
+        }
+
+    def make_event(self, minutes, event_name):
+        return make_row(
+            self.start + datetime.timedelta(minutes=minutes),
+            f"{event_name}-{minutes}",
+            event_name=event_name,
+        )
+
+    def run_sync(self, config):
+        client = mock.MagicMock(config={"app_id": "app", "partition_by_event_name": True, **config})
+        stream = InAppEvents(client)
+
+        def get_records(params=None):
+            return make_response(self.rows[(params or {}).get("event_name")])
+
+        with mock.patch.object(stream, "get_records", side_effect=get_records), \
+                mock.patch("tap_appsflyer.streams.abstracts.write_record") as mocked_write_record, \
+                singer.Transformer() as transformer:
+            stream.sync(
+                state=self.state,
+                schema=SCHEMAS["in_app_events"],
+                stream_metadata=metadata.to_map(FIELD_METADATA["in_app_events"]),
+                transformer=transformer,
+            )
+        return [call.args[1]["appsflyer_id"] for call in mocked_write_record.call_args_list]
+
+    def test_partitions_are_merged_in_order(self):
+        """Verify sorted partitions and the catch-all are merged into one
+        ordered stream, without the partitioned events of the catch-all."""
+        emitted = self.run_sync(
+            {"event_name_partitions": ["af_purchase", "af_login"], "event_name_partitions_catch_all": True}
+        )
+
+        self.assertEqual(
+            emitted, ["af_purchase-1", "af_login-2", "af_share-3", "af_purchase-4"]
+        )
+        self.assertEqual(self.state["bookmarks"]["in_app_events"]["event_time"][:16],
+                         singer.utils.strftime(self.start + datetime.timedelta(minutes=4))[:16])
+
+    def test_unsorted_partitions_need_the_sort(self):
+        """Verify unsorted exports are only emitted in order with
+        sort_by_replication_key."""
+        self.rows["af_purchase"].reverse()
+        config = {"event_name_partitions": ["af_purchase", "af_login"], "event_name_partitions_catch_all": True}
+
+        self.assertNotEqual(self.run_sync(dict(config))[0], "af_purchase-1")
+        self.state["bookmarks"]["in_app_events"]["event_time"] = singer.utils.strftime(self.start)
+        self.assertEqual(
+            self.run_sync({**config, "sort_by_replication_key": True}),
+            ["af_purchase-1", "af_login-2", "af_share-3", "af_purchase-4"],
+        )
+
+    def test_listed_partitions_skip_the_catch_all(self):
+        """Verify the full export is not downloaded by default when the
+        partitions are listed."""
+        emitted = self.run_sync({"event_name_partitions": ["af_purchase", "af_login"]})
+
+        self.assertEqual(emitted, ["af_purchase-1", "af_login-2", "af_purchase-4"])
+
+    def test_observed_event_names_become_partitions(self):
+        """Verify the next run partitions on the event names observed by the
+        previous one."""
+        self.run_sync({})
+
+        self.assertEqual(
+            sorted(self.state["bookmarks"]["in_app_events"]["observed_event_names"]),
+            ["af_login", "af_purchase", "af_share"],
+        )
+
+
+class TestTimeBudget(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime.datetime.now(pytz.utc).replace(microsecond=0)
+        self.bookmark = self.now - datetime.timedelta(hours=3)
+        self.state = {
+            "bookmarks": {"installs": {"attributed_touch_time": singer.utils.strftime(self.bookmark)}}
+        }
+
+    def run_sync(self, expired, responses):
+        client = mock.MagicMock(config={"app_id": "app", "window_hours": 1})
+        stream = Installs(client)
+        stream.deadline = mock.MagicMock()
+        stream.deadline.expired.side_effect = expired
+        with mock.patch.object(stream, "get_records", side_effect=responses), \
+                mock.patch("tap_appsflyer.streams.abstracts.write_record") as mocked_write_record, \
+                mock.patch("tap_appsflyer.streams.abstracts.write_state"), \
+                singer.Transformer() as transformer:
+            stream.sync(
+                state=self.state,
+                schema=SCHEMAS["installs"],
+                stream_metadata=metadata.to_map(FIELD_METADATA["installs"]),
+                transformer=transformer,
+            )
+        return stream, mocked_write_record.call_count
+
+    def get_bookmark(self):
+        return singer.utils.strptime_to_utc(
+            self.state["bookmarks"]["installs"]["attributed_touch_time"]
+        )
+
+    def test_completed_windows_advance_the_bookmark(self):
+        """Verify the windows done before the deadline are checkpointed."""
+        first = self.bookmark + datetime.timedelta(minutes=30)
+        # Before the first window, its row, then before the second window
+        stream, emitted = self.run_sync(
+            [False, False, True], [make_response([make_row(first)])]
+        )
+
+        self.assertTrue(stream.interrupted)
+        self.assertEqual(emitted, 1)
+        self.assertEqual(self.get_bookmark(), first)
+
+    def test_window_cut_short_keeps_the_bookmark(self):
+        """Verify a window stopped in the middle does not move the bookmark."""
+        rows = [
+            make_row(self.bookmark + datetime.timedelta(minutes=minutes))
+            for minutes in (10, 20)
+        ]
+        stream, emitted = self.run_sync([False, False, True], [make_response(rows)])
+
+        self.assertTrue(stream.interrupted)
+        self.assertEqual(emitted, 1)
+        self.assertEqual(self.get_bookmark(), self.bookmark)
+
+    def test_budgeted_runs_default_to_bounded_windows(self):
+        """Verify a time budgeted run without window_hours still checkpoints
+        a long backfill day by day."""
+        start = self.now - datetime.timedelta(days=30)
+        unbounded = Installs(mock.MagicMock(config={"app_id": "app"}))
+        budgeted = Installs(mock.MagicMock(config={"app_id": "app", "max_runtime": 600}))
+
+        self.assertEqual(len(unbounded.get_windows(start, self.now)), 1)
+        windows = budgeted.get_windows(start, self.now)
+        self.assertEqual(len(windows), 30)
+        self.assertEqual(windows[0], (start, start + datetime.timedelta(days=1)))
+        self.assertEqual(windows[-1][1], self.now)
+
+
+class TestSyncResume(unittest.TestCase):
+
+    def get_catalog(self):
+        catalog = discover()
+        for catalog_entry in catalog.streams:
+            mdata = metadata.write(metadata.to_map(catalog_entry.metadata), (), "selected", True)
+            catalog_entry.metadata = metadata.to_list(mdata)
+        return catalog
+
+    @mock.patch("tap_appsflyer.sync.singer.write_state")
+    @mock.patch("tap_appsflyer.streams.abstracts.write_schema")
+    @mock.patch("tap_appsflyer.sync.sync_stream")
+    def test_resumes_with_currently_syncing(self, mocked_sync_stream, *_):
+        """Verify the interrupted stream is synced first."""
+        catalog = self.get_catalog()
+        selected = [entry.stream for entry in catalog.get_selected_streams({})]
+        state = {"currently_syncing": selected[1]}
+
+        sync(mock.MagicMock(config={"app_id": "app"}), {"app_id": "app"}, catalog, state)
+
+        self.assertEqual(
+            [call.args[1].stream for call in mocked_sync_stream.call_args_list],
+            selected[1:] + selected[:1],
+        )
+
+    @mock.patch("tap_appsflyer.sync.singer.write_state")
+    @mock.patch("tap_appsflyer.streams.abstracts.write_schema")
+    @mock.patch("tap_appsflyer.sync.sync_stream")
+    @mock.patch("tap_appsflyer.sync.Deadline.from_config")
+    def test_deadline_between_streams(self, mocked_deadline, mocked_sync_stream, *_):
+        """Verify the run stops at the deadline with the next stream as the
+        one currently syncing."""
+        mocked_deadline.return_value.expired.side_effect = [False, True]
+        catalog = self.get_catalog()
+        selected = [entry.stream for entry in catalog.get_selected_streams({})]
+        state = {}
+
+        sync(mock.MagicMock(config={"app_id": "app"}), {"app_id": "app"}, catalog, state)
+
+        self.assertEqual(mocked_sync_stream.call_count, 1)
+        self.assertEqual(state["currently_syncing"], selected[1])
+
+
+class TestEventValueDecoding(unittest.TestCase):
+
+    def setUp(self):
+        self.start = datetime.datetime.now(pytz.utc).replace(microsecond=0) - datetime.timedelta(hours=1)
+        self.state = {
+            "bookmarks": {"in_app_events": {"event_time": singer.utils.strftime(self.start)}}
+        }
+
+    def run_sync(self, config, event_values, stream_metadata=None):
+        # CSV quoted JSON payloads
+        rows = [
+            make_row(
+                self.start + datetime.timedelta(minutes=index + 1),
+                str(index),
+                event_value='"' + event_value.replace('"', '""') + '"',
+            )
+            for index, event_value in enumerate(event_values)
+        ]
+        stream = InAppEvents(mock.MagicMock(config={"app_id": "app", **config}))
+        with mock.patch.object(stream, "get_records", return_value=make_response(rows)), \
+                mock.patch("tap_appsflyer.streams.abstracts.write_record") as mocked_write_record, \
+                singer.Transformer() as transformer:
+            stream.sync(
+                state=self.state,
+                schema=SCHEMAS["in_app_events"],
+                stream_metadata=stream_metadata or metadata.to_map(FIELD_METADATA["in_app_events"]),
+                transformer=transformer,
+            )
+        return stream, [call.args[1].get("event_value") for call in mocked_write_record.call_args_list]
+
+    def test_decodes_and_memoizes_payloads(self):
+        """Verify payloads are decoded once per distinct raw value, and
+        malformed ones are kept as strings."""
+        payload = '{"af_revenue": "9.99", "af_currency": "USD"}'
+        stream, event_values = self.run_sync(
+            {"decode_event_value": True}, [payload, payload, "{not json", payload]
+        )
+
+        self.assertEqual(event_values[0], {"af_revenue": "9.99", "af_currency": "USD"})
+        self.assertEqual(event_values[1:], [event_values[0], "{not json", event_values[0]])
+        self.assertEqual(stream.event_value_decoder.cache_info().hits, 2)
+
+    def test_off_by_default(self):
+        """Verify payloads stay strings unless decoding is enabled."""
+        payload = '{"af_revenue": "9.99"}'
+        stream, event_values = self.run_sync({}, [payload])
+
+        self.assertEqual(event_values, [payload])
+        self.assertIsNone(stream.event_value_decoder)
+
+    def test_skipped_when_not_selected(self):
+        """Verify nothing is decoded for a deselected event_value."""
+        stream_metadata = metadata.write(
+            metadata.to_map(FIELD_METADATA["in_app_events"]),
+            ("properties", "event_value"),
+            "selected",
+            False,
+        )
+        stream, _ = self.run_sync({"decode_event_value": True}, ["{}"], stream_metadata)
+
+        self.assertIsNone(stream.event_value_decoder)
+
+    @mock.patch("tap_appsflyer.streams.abstracts.write_schema")
+    def test_schema_allows_objects(self, mocked_write_schema):
+        """Verify the emitted schema accepts the decoded objects."""
+        stream = InAppEvents(mock.MagicMock(config={"decode_event_value": True}))
+        stream.write_schema(SCHEMAS["in_app_events"], "in_app_events")
+
+        schema = mocked_write_schema.call_args.args[1]
+        self.assertIn("object", schema["properties"]["event_value"]["type"])
+        self.assertNotIn("object", SCHEMAS["in_app_events"]["properties"]["event_value"]["type"])
+
+
+class TestAggregateReports(unittest.TestCase):
+
+    def setUp(self):
+        self.today = datetime.datetime.now(pytz.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+        self.yesterday = self.today - datetime.timedelta(days=1)
+        # A bookmark within the day is synced from the start of that day
+        self.state = {
+            "bookmarks": {
+                "daily_report": {
+                    "date": singer.utils.strftime(self.yesterday + datetime.timedelta(hours=5))
+                }
+            }
+        }
+
+    def make_response(self, rows):
+        """An aggregate report, with a column of an in-app event past the
+        known ones."""
+        lines = [",".join(aggregate_fieldnames) + ",af_purchase (Unique users)"]
+        for date, media_source, installs in rows:
+            row = {"date": date.strftime("%Y-%m-%d"), "media_source": media_source, "installs": installs, "total_cost": "N/A"}
+            lines.append(",".join(row.get(field, "") for field in aggregate_fieldnames) + ",3")
+        response = mock.MagicMock(status_code=200)
+        response.iter_content.return_value = iter([("\r\n".join(lines) + "\r\n").encode("utf-8")])
+        return response
+
+    def run_sync(self, rows):
+        client = mock.MagicMock(config={"app_id": "app"}, base_url="https://hq1.appsflyer.com")
+        stream = DailyReport(client)
+        with mock.patch.object(stream, "get_records", return_value=self.make_response(rows)), \
+                mock.patch("tap_appsflyer.streams.abstracts.write_record") as mocked_write_record, \
+                singer.Transformer() as transformer:
+            stream.sync(
+                state=self.state,
+                schema=SCHEMAS["daily_report"],
+                stream_metadata=metadata.to_map(FIELD_METADATA["daily_report"]),
+                transformer=transformer,
+            )
+        return stream, [call.args[1] for call in mocked_write_record.call_args_list]
+
+    def test_syncs_by_day(self):
+        """Verify the report is requested by day from the bookmarked day on,
+        which is fetched again."""
+        rows = [
+            (self.yesterday - datetime.timedelta(days=1), "old", "1"),
+            (self.yesterday, "googleadwords_int", "10"),
+            (self.today, "Facebook Ads", "5"),
+        ]
+        stream, records = self.run_sync(rows)
+
+        self.assertEqual(stream.params["from"], self.yesterday.strftime("%Y-%m-%d"))
+        self.assertEqual(stream.params["to"], self.today.strftime("%Y-%m-%d"))
+        self.assertEqual([record["media_source"] for record in records], ["googleadwords_int", "Facebook Ads"])
+        self.assertEqual(self.state["bookmarks"]["daily_report"]["date"], singer.utils.strftime(self.today))
+
+    def test_records_are_typed(self):
+        """Verify the figures are numbers, unavailable ones stay strings and
+        the in-app event columns are left out."""
+        _, records = self.run_sync([(self.yesterday, "googleadwords_int", "10")])
+
+        self.assertEqual(records[0]["installs"], 10)
+        self.assertEqual(records[0]["total_cost"], "N/A")
+        self.assertNotIn(None, records[0])
+
+    def test_window_ending_at_midnight(self):
+        """Verify the inclusive `to` date of a window ending at midnight is
+        the day before, and the window is cached once that day is over."""
+        client = mock.MagicMock(config={"app_id": "app"}, base_url="https://hq1.appsflyer.com")
+        stream = DailyReport(client)
+        params = stream.get_window_params(self.yesterday - datetime.timedelta(days=1), self.yesterday)
+
+        self.assertEqual(params["to"], (self.yesterday - datetime.timedelta(days=1)).strftime("%Y-%m-%d"))
+        self.assertEqual(stream.get_window_end(params), self.yesterday)
+
+    def test_windows_are_whole_days(self):
+        """Verify window_hours shorter than a day does not request the same
+        day once per sub-day window."""
+        client = mock.MagicMock(config={"app_id": "app", "window_hours": 6})
+        stream = DailyReport(client)
+        start = self.yesterday - datetime.timedelta(days=2)
+
+        windows = stream.get_windows(start, self.yesterday + datetime.timedelta(hours=5))
+        requested = [stream.get_window_params(*window)["from"] for window in windows]
+
+        self.assertEqual(len(windows), 3)
+        self.assertEqual(windows[0], (start, start + datetime.timedelta(days=1)))
+        self.assertEqual(len(set(requested)), 3)
+        client.config["window_hours"] = 36
+        self.assertEqual(stream.get_windows(start, self.yesterday)[0][1] - start, datetime.timedelta(days=2))
+
+
+class TestSortedSync(unittest.TestCase):
+
+    def setUp(self):
+        self.bookmark = datetime.datetime.now(pytz.utc).replace(microsecond=0) - datetime.timedelta(hours=3)
+        self.state = {
+            "bookmarks": {"installs": {"attributed_touch_time": singer.utils.strftime(self.bookmark)}}
+        }
+        self.rows = [
+            make_row(self.bookmark + datetime.timedelta(minutes=minutes), str(minutes))
+            for minutes in (30, 10, 50, 20, 40)
+        ]
+
+    def run_sync(self, config, expired=None):
+        client = mock.MagicMock(config={
+            "app_id": "app",
+            "sort_by_replication_key": True,
+            "sort_run_size": 2,
+            "sort_checkpoint_interval": 2,
+            **config,
+        })
+        stream = Installs(client)
+        if expired:
+            stream.deadline = mock.MagicMock()
+            stream.deadline.expired.side_effect = expired
+        # The state is modified in place, keep the bookmark of every STATE
+        checkpoints = []
+
+        def write_state(state):
+            checkpoints.append(state["bookmarks"]["installs"]["attributed_touch_time"])
+
+        with mock.patch.object(stream, "get_records", return_value=make_response(self.rows)), \
+                mock.patch("tap_appsflyer.streams.abstracts.write_record") as mocked_write_record, \
+                mock.patch("tap_appsflyer.streams.abstracts.write_state", side_effect=write_state), \
+                singer.Transformer() as transformer:
+            stream.sync(
+                state=self.state,
+                schema=SCHEMAS["installs"],
+                stream_metadata=metadata.to_map(FIELD_METADATA["installs"]),
+                transformer=transformer,
+            )
+        emitted = [call.args[1]["appsflyer_id"] for call in mocked_write_record.call_args_list]
+        return stream, emitted, checkpoints
+
+    def get_bookmark(self, minutes):
+        return singer.utils.strftime(self.bookmark + datetime.timedelta(minutes=minutes))
+
+    def test_records_are_emitted_in_order(self):
+        """Verify records come out sorted, with a STATE checkpoint every
+        sort_checkpoint_interval records."""
+        _, emitted, checkpoints = self.run_sync({})
+
+        self.assertEqual(emitted, ["10", "20", "30", "40", "50"])
+        self.assertEqual(checkpoints, [self.get_bookmark(20), self.get_bookmark(40)])
+        self.assertEqual(
+            self.state["bookmarks"]["installs"]["attributed_touch_time"], self.get_bookmark(50)
+        )
+
+    def test_window_cut_short_resumes_from_last_record(self):
+        """Verify a sorted window stopped by the deadline bookmarks the
+        records emitted so far."""
+        # Before the window, while reading each row into the sort, then
+        # before emitting each row
+        stream, emitted, _ = self.run_sync({}, expired=[False] * 6 + [False, False, False, True])
+
+        self.assertTrue(stream.interrupted)
+        self.assertEqual(emitted, ["10", "20", "30"])
+        self.assertEqual(
+            self.state["bookmarks"]["installs"]["attributed_touch_time"], self.get_bookmark(30)
+        )
+
+    def test_deadline_while_spilling(self):
+        """Verify the deadline stops a sorted window while its rows are read,
+        before any is emitted."""
+        stream, emitted, checkpoints = self.run_sync({}, expired=[False, False, False, True])
+
+        self.assertTrue(stream.interrupted)
+        self.assertEqual(emitted, [])
+        self.assertEqual(checkpoints, [])
+        self.assertEqual(
+            self.state["bookmarks"]["installs"]["attributed_touch_time"], singer.utils.strftime(self.bookmark)
+        )
+
+    def test_sort_key_of_other_formats(self):
+        stream = Installs(mock.MagicMock(config={}))
+
+        self.assertEqual(
+            stream.get_sort_key({"attributed_touch_time": "2024-01-01T10:00:00+02:00"}),
+            "2024-01-01 08:00:00",
+        )
+        self.assertEqual(stream.get_sort_key({"attributed_touch_time": "n/a"}), "")
+
+
+class TestWindowLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.bookmark = datetime.datetime.now(pytz.utc).replace(microsecond=0) - datetime.timedelta(hours=3)
+        self.state = {
+            "bookmarks": {"installs": {"attributed_touch_time": singer.utils.strftime(self.bookmark)}}
+        }
+
+    def run_sync(self, responses):
+        stream = Installs(mock.MagicMock(config={"app_id": "app", "window_hours": 1}))
+        requested = []
+
+        def get_records(params=None):
+            requested.append(stream.params["from"])
+            # The last window ends at the time of the sync, just after setUp
+            response = responses.pop(0) if responses else make_response([])
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        with mock.patch.object(stream, "get_records", side_effect=get_records), \
+                mock.patch("tap_appsflyer.streams.abstracts.write_record"), \
+                mock.patch("tap_appsflyer.streams.abstracts.write_state"), \
+                singer.Transformer() as transformer:
+            stream.sync(
+                state=self.state,
+                schema=SCHEMAS["installs"],
+                stream_metadata=metadata.to_map(FIELD_METADATA["installs"]),
+                transformer=transformer,
+            )
+        return requested
+
+    def hours_after(self, hours):
+        return self.bookmark + datetime.timedelta(hours=hours)
+
+    def test_failed_window_is_refetched_alone(self):
+        """Verify windows after a failed one are kept in the ledger, and the
+        next run only fetches the failed window."""
+        with self.assertRaises(appsflyerBadRequestError):
+            self.run_sync([
+                appsflyerBadRequestError("boom"),
+                make_response([make_row(self.hours_after(1.5))]),
+                make_response([make_row(self.hours_after(2.5))]),
+            ])
+
+        bookmarks = self.state["bookmarks"]["installs"]
+        self.assertEqual(bookmarks["attributed_touch_time"], singer.utils.strftime(self.bookmark))
+        self.assertEqual(len(bookmarks["completed_windows"]["attributed_touch_time"]), 1)
+
+        requested = self.run_sync([make_response([make_row(self.hours_after(0.5))])])
+
+        self.assertEqual(requested[0], self.bookmark.strftime("%Y-%m-%d %H:%M"))
+        for hours in (1, 2):
+            self.assertNotIn(self.hours_after(hours).strftime("%Y-%m-%d %H:%M"), requested)
+        self.assertEqual(
+            bookmarks["attributed_touch_time"], singer.utils.strftime(self.hours_after(2.5))
+        )
+        self.assertNotIn("completed_windows", bookmarks)
@@ -0,0 +1,29 @@
+import unittest
+
+from tap_appsflyer.interning import StringInterner
+
+
+class TestStringInterner(unittest.TestCase):
+
+    def test_repeated_values_are_shared(self):
+        """Verify equal values of a column are handed out as one object."""
+        interner = StringInterner()
+        first = interner.intern_row({"media_source": "".join(["face", "book"])}, ["media_source"])
+        second = interner.intern_row({"media_source": "".join(["face", "book"])}, ["media_source"])
+
+        self.assertIs(first["media_source"], second["media_source"])
+        self.assertEqual((interner.hits, interner.misses), (1, 1))
+        self.assertEqual(interner.hit_rate, 0.5)
+
+    def test_cache_is_bounded(self):
+        """Verify values past `max_size` pass through without being cached."""
+        interner = StringInterner(max_size=2)
+        for value in ["a", "b", "c", "c"]:
+            self.assertEqual(interner.intern(value), value)
+
+        self.assertEqual(set(interner.values), {"a", "b"})
+
+    def test_disabled_by_config(self):
+        """Verify `intern_max_size: 0` disables the interning."""
+        self.assertIsNone(StringInterner.from_config({"intern_max_size": 0}))
+        self.assertEqual(StringInterner.from_config({}).max_size, 10000)
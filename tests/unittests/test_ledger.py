@@ -0,0 +1,62 @@
+import datetime
+import unittest
+
+import pytz
+
+from tap_appsflyer.ledger import WindowLedger
+
+START = datetime.datetime(2024, 1, 1, tzinfo=pytz.utc)
+
+
+def hours(count):
+    return START + datetime.timedelta(hours=count)
+
+
+class TestWindowLedger(unittest.TestCase):
+
+    def test_adjacent_windows_are_run_length_encoded(self):
+        """Verify touching windows merge into a single range, keeping the
+        greatest bookmark."""
+        ledger = WindowLedger()
+        ledger.add(hours(4), hours(5), hours(4.5))
+        ledger.add(hours(2), hours(3), None)
+        ledger.add(hours(3), hours(4), hours(3.5))
+
+        self.assertEqual(ledger.ranges, [(hours(2), hours(5), hours(4.5))])
+
+    def test_gaps(self):
+        """Verify only the windows missing from the ledger are left."""
+        ledger = WindowLedger([(hours(2), hours(3), None), (hours(5), hours(6), None)])
+
+        self.assertEqual(
+            ledger.get_gaps(hours(0), hours(8)),
+            [(hours(0), hours(2)), (hours(3), hours(5)), (hours(6), hours(8))],
+        )
+        self.assertEqual(ledger.get_gaps(hours(2.5), hours(5.5)), [(hours(3), hours(5))])
+
+    def test_compacts_contiguous_ranges_only(self):
+        """Verify the bookmark advances over the ranges contiguous with the
+        completed range, and not past a gap."""
+        ledger = WindowLedger([(hours(1), hours(2), hours(1.5)), (hours(3), hours(4), hours(3.5))])
+
+        bookmark, covered = ledger.compact(hours(0.5), hours(1))
+
+        self.assertEqual((bookmark, covered), (hours(1.5), hours(2)))
+        self.assertEqual(ledger.ranges, [(hours(3), hours(4), hours(3.5))])
+
+    def test_state_round_trip(self):
+        """Verify ledgers are scoped to the bookmark key, and dropped from
+        the state once empty."""
+        state = {"bookmarks": {"installs": {"attributed_touch_time": "2024-01-01T00:00:00Z"}}}
+        ledger = WindowLedger([(hours(2), hours(3), None)])
+        ledger.write_state(state, "installs", "attributed_touch_time")
+
+        loaded = WindowLedger.from_state(state, "installs", "attributed_touch_time")
+        self.assertEqual(loaded.ranges, ledger.ranges)
+        self.assertEqual(WindowLedger.from_state(state, "installs", "other").ranges, [])
+
+        loaded.compact(hours(0), hours(3))
+        loaded.write_state(state, "installs", "attributed_touch_time")
+        self.assertEqual(
+            state, {"bookmarks": {"installs": {"attributed_touch_time": "2024-01-01T00:00:00Z"}}}
+        )
@@ -0,0 +1,156 @@
+import gzip
+import json
+import os
+import sys
+import tempfile
+import threading
+import unittest
+import zlib
+from unittest import mock
+
+import singer
+
+from tap_appsflyer import load_last_state
+from tap_appsflyer.output import configure_stdout
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+RECORD = singer.RecordMessage(stream="installs", record={"appsflyer_id": "1"})
+STATE = singer.StateMessage(value={"bookmarks": {"installs": {"attributed_touch_time": "2024-01-01T00:00:00Z"}}})
+
+
+class TestCompressedOutput(unittest.TestCase):
+
+    def setUp(self):
+        self.output_file = tempfile.NamedTemporaryFile(mode="w+", suffix=".out")
+        self.output_path = self.output_file.name
+
+    def tearDown(self):
+        self.output_file.close()
+
+    def read_output(self):
+        with open(self.output_path, "rb") as output_file:
+            return output_file.read()
+
+    def test_gzip_flushes_on_state(self):
+        """Verify the messages up to a STATE can be decompressed while the
+        stream is still open, and the closed stream is valid gzip."""
+        with mock.patch.object(sys, "stdout", self.output_file), \
+                configure_stdout({"output_compression": "gzip"}):
+            singer.write_message(RECORD)
+            self.assertEqual(self.read_output(), b"")
+
+            singer.write_message(STATE)
+            partial = zlib.decompressobj(wbits=31).decompress(self.read_output())
+            singer.write_message(RECORD)
+
+        expected = [singer.format_message(message) for message in (RECORD, STATE, RECORD)]
+        self.assertEqual(partial.decode("utf-8").splitlines(), expected[:2])
+        self.assertEqual(gzip.decompress(self.read_output()).decode("utf-8").splitlines(), expected)
+
+    @unittest.skipIf(zstandard is None, "zstandard is not installed")
+    def test_zstd(self):
+        """Verify the zstd output decompresses to the messages, up to a
+        STATE before the stream is closed."""
+        with mock.patch.object(sys, "stdout", self.output_file), \
+                configure_stdout({"output_compression": "zstd"}):
+            singer.write_message(RECORD)
+            singer.write_message(STATE)
+            partial = zstandard.ZstdDecompressor().decompressobj().decompress(self.read_output())
+
+        expected = [singer.format_message(message) for message in (RECORD, STATE)]
+        self.assertEqual(partial.decode("utf-8").splitlines(), expected)
+        with zstandard.ZstdDecompressor().stream_reader(open(self.output_path, "rb")) as reader:
+            self.assertEqual(reader.read().decode("utf-8").splitlines(), expected)
+
+    def test_last_state_of_compressed_output(self):
+        """Verify the states of compressed shard runs can be merged."""
+        with mock.patch.object(sys, "stdout", self.output_file), \
+                configure_stdout({"output_compression": "gzip"}):
+            singer.write_message(RECORD)
+            singer.write_message(STATE)
+
+        self.assertEqual(load_last_state(self.output_path), json.loads(json.dumps(STATE.value)))
+
+    def test_last_state_of_interrupted_output(self):
+        """Verify the last STATE is found behind the messages of a shard run
+        stopped by its deadline, and in the state lines of a target."""
+        self.output_file.write("\n".join(singer.format_message(message) for message in (STATE, RECORD, RECORD)))
+        self.output_file.flush()
+        self.assertEqual(load_last_state(self.output_path), json.loads(json.dumps(STATE.value)))
+
+        self.output_file.seek(0)
+        self.output_file.truncate()
+        self.output_file.write('{"bookmarks": {}}\n{"bookmarks": {"installs": {}}}\n')
+        self.output_file.flush()
+        self.assertEqual(load_last_state(self.output_path), {"bookmarks": {"installs": {}}})
+
+        self.output_file.seek(0)
+        self.output_file.truncate()
+        self.output_file.write(singer.format_message(RECORD) + "\n")
+        self.output_file.flush()
+        with self.assertRaises(ValueError):
+            load_last_state(self.output_path)
+
+    def test_unsupported_compression(self):
+        with mock.patch.object(sys, "stdout", self.output_file), self.assertRaises(ValueError):
+            with configure_stdout({"output_compression": "brotli"}):
+                pass
+
+
+class TestStreamFanout(unittest.TestCase):
+
+    def setUp(self):
+        self.output_file = tempfile.NamedTemporaryFile(mode="w+", suffix=".out")
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.config = {"stream_output_dir": self.tmp_dir.name}
+
+    def tearDown(self):
+        self.output_file.close()
+        self.tmp_dir.cleanup()
+
+    def read_lines(self, path):
+        with open(path) as output_file:
+            return output_file.read().splitlines()
+
+    def test_streams_are_written_apart(self):
+        """Verify every stream gets its SCHEMA and RECORD messages, and the
+        STATE messages stay on stdout after the streams are flushed."""
+        schema = singer.SchemaMessage(stream="installs", schema={}, key_properties=[])
+        other_record = singer.RecordMessage(stream="in_app_events", record={"appsflyer_id": "2"})
+        installs_path = os.path.join(self.tmp_dir.name, "installs.jsonl")
+
+        with mock.patch.object(sys, "stdout", self.output_file), configure_stdout(self.config):
+            for message in (schema, RECORD, other_record):
+                singer.write_message(message)
+            singer.write_message(STATE)
+            self.assertEqual(len(self.read_lines(installs_path)), 2)
+
+        self.assertEqual(
+            self.read_lines(installs_path),
+            [singer.format_message(schema), singer.format_message(RECORD)],
+        )
+        self.assertEqual(
+            self.read_lines(os.path.join(self.tmp_dir.name, "in_app_events.jsonl")),
+            [singer.format_message(other_record)],
+        )
+        self.assertEqual(self.read_lines(self.output_file.name), [singer.format_message(STATE)])
+
+    def test_named_pipe(self):
+        """Verify a stream is written to its named pipe when there is one."""
+        fifo_path = os.path.join(self.tmp_dir.name, "installs")
+        os.mkfifo(fifo_path)
+        received = []
+        reader = threading.Thread(target=lambda: received.extend(self.read_lines(fifo_path)))
+        reader.start()
+
+        with mock.patch.object(sys, "stdout", self.output_file), configure_stdout(self.config):
+            singer.write_message(RECORD)
+            singer.write_message(STATE)
+        reader.join(timeout=5)
+
+        self.assertEqual(received, [singer.format_message(RECORD)])
+        self.assertFalse(os.path.exists(fifo_path + ".jsonl"))
@@ -0,0 +1,32 @@
+import unittest
+
+from tap_appsflyer.parallel import BackgroundIterator
+
+
+class TestBackgroundIterator(unittest.TestCase):
+
+    def test_yields_every_item(self):
+        """Verify all items are handed over, across several chunks."""
+        items = list(BackgroundIterator(lambda: range(1000), max_queue_size=200))
+
+        self.assertEqual(items, list(range(1000)))
+
+    def test_producer_errors_are_raised(self):
+        """Verify an error of the background fetch reaches the consumer."""
+
+        def failing():
+            yield 1
+            raise ConnectionError("reset")
+
+        with self.assertRaises(ConnectionError):
+            list(BackgroundIterator(failing))
+
+    def test_stop_releases_the_producer(self):
+        """Verify a producer blocked on a full queue exits once stopped."""
+        iterator = BackgroundIterator(lambda: range(100000), max_queue_size=100)
+        next(iter(iterator))
+
+        iterator.stop()
+        iterator.thread.join(timeout=5)
+
+        self.assertFalse(iterator.thread.is_alive())
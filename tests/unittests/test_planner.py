@@ -0,0 +1,218 @@
+import datetime
+import unittest
+from unittest import mock
+
+import pytz
+from singer import metadata
+
+from tap_appsflyer.discover import discover
+from tap_appsflyer.planner import build_plan, fit_windows, merge_states, plan_windows, select_shards
+from tap_appsflyer.quota import get_day
+
+START = datetime.datetime(2024, 1, 1, tzinfo=pytz.utc)
+
+
+def make_shard(stream, from_day, to_day, bookmark_day=None, plan_from_day=1):
+    shard = {
+        "stream": stream,
+        "bookmark_key": "event_time",
+        "from": f"2024-01-{from_day:02d}T00:00:00.000000Z",
+        "to": f"2024-01-{to_day:02d}T00:00:00.000000Z",
+        "plan_from": f"2024-01-{plan_from_day:02d}T00:00:00.000000Z",
+        "bookmark": None,
+    }
+    if bookmark_day:
+        shard["bookmark"] = f"2024-01-{bookmark_day:02d}T12:00:00.000000Z"
+    return shard
+
+
+class TestPlanner(unittest.TestCase):
+
+    def test_plan_windows(self):
+        """Verify the range is split into consecutive windows."""
+        windows = plan_windows(
+            START, START + datetime.timedelta(hours=30), datetime.timedelta(hours=12)
+        )
+
+        self.assertEqual(
+            [(start.hour, end.hour) for start, end in windows], [(0, 12), (12, 0), (0, 6)]
+        )
+
+    def test_plan_aligned_windows(self):
+        """Verify aligned windows end on the grid of their size, whatever the
+        start."""
+        start = START + datetime.timedelta(hours=5, minutes=7)
+        windows = plan_windows(
+            start, START + datetime.timedelta(hours=30), datetime.timedelta(hours=12), aligned=True
+        )
+
+        self.assertEqual(windows[0], (start, START + datetime.timedelta(hours=12)))
+        self.assertEqual(
+            [(start.hour, end.hour) for start, end in windows[1:]], [(12, 0), (0, 6)]
+        )
+
+    def test_fit_windows(self):
+        """Verify the shortest contiguous windows are merged first, and
+        windows apart are never merged."""
+        hours = [(0, 1), (1, 2), (2, 6), (8, 9), (9, 10)]
+        windows = [
+            (START + datetime.timedelta(hours=start), START + datetime.timedelta(hours=end))
+            for start, end in hours
+        ]
+
+        def fitted_hours(max_windows):
+            return [(start.hour, end.hour) for start, end in fit_windows(windows, max_windows)]
+
+        self.assertEqual(fitted_hours(5), hours)
+        self.assertEqual(fitted_hours(4), [(0, 2), (2, 6), (8, 9), (9, 10)])
+        self.assertEqual(fitted_hours(2), [(0, 6), (8, 10)])
+        self.assertEqual(fitted_hours(1), [(0, 6)])
+        self.assertEqual(fitted_hours(0), [])
+
+    @mock.patch("tap_appsflyer.streams.abstracts.utils.now")
+    def test_build_plan_fits_quota(self, mocked_now):
+        """Verify the shards of a stream are merged down to the calls left
+        in the daily quota of its report."""
+        now = datetime.datetime.now(pytz.utc)
+        mocked_now.return_value = now
+        catalog = discover()
+        for catalog_entry in catalog.streams:
+            mdata = metadata.to_map(catalog_entry.metadata)
+            if catalog_entry.tap_stream_id == "installs":
+                mdata = metadata.write(mdata, (), "selected", True)
+            catalog_entry.metadata = metadata.to_list(mdata)
+        config = {"app_id": "app", "shard_hours": 6, "daily_api_quota": 5}
+        state = {
+            "bookmarks": {
+                "installs": {
+                    "attributed_touch_time": (now - datetime.timedelta(hours=36)).isoformat()
+                }
+            },
+            "api_calls": {"app": {"installs_report": {get_day(): 3}}},
+        }
+
+        plan = build_plan(mock.MagicMock(config=config), config, catalog, state)
+
+        self.assertEqual(len(plan["shards"]), 2)
+        self.assertEqual(plan["shards"][0]["to"], plan["shards"][1]["from"])
+
+    def test_merge_adds_up_calls(self):
+        """Verify the calls counted by every shard run are added to the
+        ones counted before the runs."""
+        today = get_day()
+        state = {"api_calls": {"app": {"installs_report": {today: 2, "2000-01-01": 9}}}}
+        partial_states = [
+            {"api_calls": {"app": {"installs_report": {today: 5}}}},
+            {"api_calls": {"app": {"installs_report": {today: 4}, "daily_report": {today: 1}}}},
+        ]
+
+        state = merge_states(state, partial_states)
+
+        self.assertEqual(
+            state["api_calls"],
+            {"app": {"installs_report": {today: 7}, "daily_report": {today: 1}}},
+        )
+
+    @mock.patch("tap_appsflyer.streams.abstracts.utils.now")
+    def test_build_plan(self, mocked_now):
+        """Verify shards cover the next sync window of the selected streams."""
+        now = datetime.datetime.now(pytz.utc)
+        mocked_now.return_value = now
+        catalog = discover()
+        for catalog_entry in catalog.streams:
+            mdata = metadata.to_map(catalog_entry.metadata)
+            if catalog_entry.tap_stream_id == "installs":
+                mdata = metadata.write(mdata, (), "selected", True)
+            catalog_entry.metadata = metadata.to_list(mdata)
+        config = {"app_id": "app", "shard_hours": 24}
+        state = {
+            "bookmarks": {
+                "installs": {
+                    "attributed_touch_time": (now - datetime.timedelta(hours=36)).isoformat()
+                }
+            }
+        }
+
+        plan = build_plan(mock.MagicMock(config=config), config, catalog, state)
+
+        self.assertEqual(len(plan["shards"]), 2)
+        self.assertEqual({shard["stream"] for shard in plan["shards"]}, {"installs"})
+        self.assertEqual(plan["shards"][0]["to"], plan["shards"][1]["from"])
+        self.assertEqual(plan["shards"][0]["plan_from"], plan["shards"][1]["plan_from"])
+        self.assertEqual(
+            [shard["id"] for shard in select_shards(plan, 1, 2)], [1]
+        )
+
+    def test_merge_contiguous_shards(self):
+        """Verify contiguous shards fold into a single bookmark."""
+        state = {"bookmarks": {"in_app_events": {"event_time": "2024-01-01T00:00:00Z"}}}
+        partial_states = [
+            {"completed_shards": [make_shard("in_app_events", 2, 3, bookmark_day=2)]},
+            {"completed_shards": [make_shard("in_app_events", 1, 2, bookmark_day=1)]},
+        ]
+
+        state = merge_states(state, partial_states)
+
+        self.assertEqual(
+            state,
+            {"bookmarks": {"in_app_events": {"event_time": "2024-01-02T12:00:00.000000Z"}}},
+        )
+
+    def test_merge_keeps_shards_until_contiguous(self):
+        """Verify a gap keeps the bookmark and the completed shards in the
+        window ledger, until the missing shard is merged."""
+        state = {"bookmarks": {"in_app_events": {"event_time": "2024-01-01T00:00:00Z"}}}
+
+        state = merge_states(
+            state, [{"completed_shards": [make_shard("in_app_events", 2, 3, bookmark_day=2)]}]
+        )
+        self.assertEqual(
+            state["bookmarks"]["in_app_events"]["event_time"], "2024-01-01T00:00:00Z"
+        )
+        self.assertNotIn("completed_shards", state)
+        self.assertEqual(
+            state["bookmarks"]["in_app_events"]["completed_windows"],
+            {
+                "event_time": [
+                    [
+                        "2024-01-02T00:00:00.000000Z",
+                        "2024-01-03T00:00:00.000000Z",
+                        "2024-01-02T12:00:00.000000Z",
+                    ]
+                ]
+            },
+        )
+
+        state = merge_states(
+            state, [{"completed_shards": [make_shard("in_app_events", 1, 2)]}]
+        )
+        self.assertEqual(
+            state["bookmarks"]["in_app_events"]["event_time"], "2024-01-02T12:00:00.000000Z"
+        )
+        self.assertNotIn("completed_shards", state)
+        self.assertNotIn("completed_windows", state["bookmarks"]["in_app_events"])
+
+    def test_merge_without_bookmark_waits_for_first_shard(self):
+        """Verify a first backfill only advances the bookmark once the shards
+        from the start of the plan are merged, not from the first merged."""
+        state = merge_states(
+            {},
+            [
+                {"completed_shards": [make_shard("in_app_events", 3, 4, bookmark_day=3)]},
+                {"completed_shards": [make_shard("in_app_events", 4, 5, bookmark_day=4)]},
+            ],
+        )
+        self.assertNotIn("event_time", state["bookmarks"]["in_app_events"])
+        self.assertEqual(len(state["bookmarks"]["in_app_events"]["completed_windows"]["event_time"]), 1)
+
+        state = merge_states(
+            state,
+            [
+                {"completed_shards": [make_shard("in_app_events", 1, 2, bookmark_day=1)]},
+                {"completed_shards": [make_shard("in_app_events", 2, 3, bookmark_day=2)]},
+            ],
+        )
+        self.assertEqual(
+            state["bookmarks"]["in_app_events"]["event_time"], "2024-01-04T12:00:00.000000Z"
+        )
+        self.assertNotIn("completed_windows", state["bookmarks"]["in_app_events"])
@@ -0,0 +1,144 @@
+import datetime
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import pytz
+import singer
+from singer import metadata
+
+from tap_appsflyer.client import Client
+from tap_appsflyer.quota import QuotaLedger, get_day, parse_report_path
+from tap_appsflyer.schema import build_schemas
+from tap_appsflyer.streams.abstracts import fieldnames
+from tap_appsflyer.streams.in_app_events import InAppEvents
+from tap_appsflyer.streams.installs import Installs
+
+SCHEMAS, FIELD_METADATA = build_schemas()
+EXPORT_URL = "https://hq1.appsflyer.com/api/raw-data/export/app/app/installs_report/v5?from=x"
+
+
+def make_response():
+    response = mock.MagicMock(status_code=200)
+    response.iter_content.return_value = iter([(",".join(fieldnames) + "\r\n").encode("utf-8")])
+    return response
+
+
+class TestQuotaLedger(unittest.TestCase):
+
+    def test_parse_report_path(self):
+        self.assertEqual(parse_report_path(EXPORT_URL), ("app", "installs_report"))
+        self.assertEqual(
+            parse_report_path("api/agg-data/export/app/app/daily_report/v5"), ("app", "daily_report")
+        )
+        self.assertIsNone(parse_report_path("https://hq1.appsflyer.com/api/other"))
+
+    def test_calls_are_counted_in_state(self):
+        """Verify the calls of the day are counted per app and report in
+        the state, and the ones of the previous days dropped."""
+        state = {"api_calls": {"app": {"installs_report": {"2000-01-01": 4}}}}
+        quota = QuotaLedger.from_config({"daily_api_quota": 3}, state)
+
+        quota.record_request(EXPORT_URL)
+        quota.record_request(EXPORT_URL)
+        quota.record_request("https://hq1.appsflyer.com/api/other")
+
+        self.assertEqual(state["api_calls"], {"app": {"installs_report": {get_day(): 2}}})
+        self.assertEqual(quota.get_remaining("app", "installs_report"), 1)
+        quota.record_request(EXPORT_URL)
+        quota.record_request(EXPORT_URL)
+        self.assertEqual(quota.get_remaining("app", "installs_report"), 0)
+        self.assertEqual(quota.get_remaining("app", "daily_report"), 3)
+
+    def test_sidecar_file_is_shared(self):
+        """Verify ledgers sharing a file count the calls of each other."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            config = {"daily_api_quota": 10, "quota_ledger_path": os.path.join(tmp_dir, "quota.json")}
+            state = {}
+            first = QuotaLedger.from_config(config, state)
+            second = QuotaLedger.from_config(config, state)
+
+            first.record_request(EXPORT_URL)
+            second.record_request(EXPORT_URL)
+
+            self.assertEqual(first.get_remaining("app", "installs_report"), 8)
+            self.assertEqual(state, {})
+
+    def test_off_by_default(self):
+        self.assertIsNone(QuotaLedger.from_config({}, {}))
+
+    def test_client_counts_every_request(self):
+        client = Client({"api_token": "token"})
+        client.quota = QuotaLedger(5)
+        client._session = mock.MagicMock()
+        client._session.send.return_value = mock.MagicMock(status_code=200)
+        request = client.get(EXPORT_URL, {}, {})
+
+        client._send(request)
+
+        self.assertEqual(client.quota.get_remaining("app", "installs_report"), 4)
+
+
+class TestQuotaSync(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime.datetime.now(pytz.utc).replace(microsecond=0)
+        self.state = {
+            "bookmarks": {
+                "installs": {"attributed_touch_time": singer.utils.strftime(self.now - datetime.timedelta(hours=6))}
+            },
+            "api_calls": {"app": {"installs_report": {get_day(): 7}}},
+        }
+
+    def run_sync(self, stream):
+        stream.quota = QuotaLedger.from_config(stream.client.config, self.state)
+        windows = []
+
+        def get_records(*_):
+            windows.append((stream.params["from"], stream.params["to"]))
+            return make_response()
+
+        with mock.patch.object(stream, "get_records", side_effect=get_records), \
+                mock.patch("tap_appsflyer.streams.abstracts.write_record"), \
+                singer.Transformer() as transformer:
+            stream.sync(
+                state=self.state,
+                schema=SCHEMAS[stream.tap_stream_id],
+                stream_metadata=metadata.to_map(FIELD_METADATA[stream.tap_stream_id]),
+                transformer=transformer,
+            )
+        return windows
+
+    def make_client(self, **config):
+        return mock.MagicMock(
+            config={"app_id": "app", "window_hours": 1, "daily_api_quota": 10, **config},
+            base_url="https://hq1.appsflyer.com",
+        )
+
+    def test_windows_are_merged_to_fit(self):
+        """Verify the windows of the sync are merged into the calls left
+        today, still covering the whole range."""
+        windows = self.run_sync(Installs(self.make_client()))
+
+        self.assertEqual(len(windows), 3)
+        self.assertEqual(windows[0][0], (self.now - datetime.timedelta(hours=6)).strftime("%Y-%m-%d %H:%M"))
+        self.assertEqual(windows[0][1], windows[1][0])
+        self.assertEqual(windows[1][1], windows[2][0])
+        self.assertGreaterEqual(windows[2][1], self.now.strftime("%Y-%m-%d %H:%M"))
+
+    def test_spent_quota_skips_the_stream(self):
+        self.state["api_calls"]["app"]["installs_report"][get_day()] = 10
+
+        self.assertEqual(self.run_sync(Installs(self.make_client())), [])
+
+    def test_partitions_count_per_window(self):
+        """Verify every event_name partition of a window counts as a call."""
+        stream = InAppEvents(
+            self.make_client(partition_by_event_name=True, event_name_partitions=["af_purchase", "af_login"])
+        )
+
+        self.assertEqual(stream.get_requests_per_window({}), 2)
+        stream.client.config["event_name_partitions_catch_all"] = True
+        self.assertEqual(stream.get_requests_per_window({}), 3)
+        self.assertEqual(InAppEvents(self.make_client()).get_requests_per_window({}), 1)
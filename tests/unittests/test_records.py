@@ -0,0 +1,43 @@
+import sys
+import unittest
+
+from singer import metadata
+
+from tap_appsflyer.records import get_record_type
+
+
+class TestCompactRecord(unittest.TestCase):
+
+    def setUp(self):
+        stream_metadata = metadata.write({}, ("properties", "ip"), "selected", False)
+        self.record_type = get_record_type(
+            ["event_time", "media_source", "ip", "city"], stream_metadata
+        )
+
+    def test_round_trip(self):
+        """Verify selected fields survive, with None for empty ones."""
+        record = self.record_type.from_row(
+            {"event_time": "2024-01-01 00:00:00", "media_source": "", "ip": "10.0.0.1", "city": "Paris"}
+        )
+
+        self.assertEqual(
+            record.to_dict(),
+            {"event_time": "2024-01-01 00:00:00", "media_source": None, "city": "Paris"},
+        )
+        self.assertEqual(record["city"], "Paris")
+        self.assertIsNone(record.get("media_source"))
+
+    def test_falsy_values_are_kept(self):
+        """Verify only empty cells are left unset, not False or 0."""
+        record = self.record_type.from_row({"event_time": 0, "media_source": False, "city": None})
+
+        self.assertEqual(record.to_dict(), {"event_time": 0, "media_source": False, "city": None})
+
+    def test_smaller_than_dict(self):
+        """Verify the record holds no per-field dict."""
+        row = {"event_time": "2024-01-01 00:00:00", "media_source": "", "ip": "", "city": ""}
+        record = self.record_type.from_row(row)
+
+        self.assertFalse(hasattr(record, "__dict__"))
+        self.assertLess(sys.getsizeof(record), sys.getsizeof(row))
+        self.assertIs(get_record_type(["event_time"], {}), get_record_type(["event_time"], {}))
@@ -0,0 +1,130 @@
+import datetime
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import pytz
+import singer
+from singer import metadata
+
+from tap_appsflyer.cache import ResponseCache
+from tap_appsflyer.schema import build_schemas
+from tap_appsflyer.streams.abstracts import fieldnames
+from tap_appsflyer.streams.installs import Installs
+
+SCHEMAS, FIELD_METADATA = build_schemas()
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(self.tmp_dir.name, finalization_hours=24)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def _response(self, body):
+        response = mock.MagicMock(status_code=200)
+        response.iter_content.return_value = [body]
+        return response
+
+    def test_put_and_get_round_trip(self):
+        """Verify a cached export is replayed as it was received."""
+        key = ResponseCache.key("app", "installs", {"from": "a", "to": "b"})
+        self.cache.put(key, self._response(b"h1,h2\r\nv1,v2\r\n"), {})
+
+        cached = self.cache.get(key)
+
+        self.assertEqual(b"".join(cached.iter_content()), b"h1,h2\r\nv1,v2\r\n")
+
+    def test_key_depends_on_window(self):
+        """Verify different windows of the same report get different keys."""
+        first = ResponseCache.key("app", "installs", {"from": "a", "to": "b"})
+        second = ResponseCache.key("app", "installs", {"from": "a", "to": "c"})
+
+        self.assertNotEqual(first, second)
+
+    def test_is_closed(self):
+        """Verify windows inside the finalization delay are not closed."""
+        now = datetime.datetime.now(pytz.utc)
+
+        self.assertTrue(self.cache.is_closed(now - datetime.timedelta(days=2)))
+        self.assertFalse(self.cache.is_closed(now - datetime.timedelta(hours=1)))
+
+    def test_evicts_least_recently_used(self):
+        """Verify the oldest entries are evicted once the cache is full."""
+        old_key = ResponseCache.key("app", "installs", {"to": "old"})
+        self.cache.put(old_key, self._response(b"old"), {})
+        old_path = os.path.join(self.tmp_dir.name, old_key + ResponseCache.data_suffix)
+        self.cache.max_bytes = os.path.getsize(old_path)
+        os.utime(old_path, (time.time() - 60, time.time() - 60))
+
+        new_key = ResponseCache.key("app", "installs", {"to": "new"})
+        self.cache.put(new_key, self._response(b"new"), {})
+
+        self.assertIsNone(self.cache.get(old_key))
+        self.assertIsNotNone(self.cache.get(new_key))
+
+
+class TestCachedSync(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.now = datetime.datetime.now(pytz.utc).replace(second=0, microsecond=0)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def run_sync(self, start):
+        """Syncs installs from `start`, returns the `from` of every window
+        requested from the API."""
+        client = mock.MagicMock(
+            config={"app_id": "app", "cache_dir": self.tmp_dir.name},
+            base_url="https://hq1.appsflyer.com",
+        )
+        requested = []
+
+        def get(endpoint, params, headers):
+            requested.append(params["from"])
+            return mock.MagicMock()
+
+        def send(request):
+            response = mock.MagicMock(status_code=200)
+            response.iter_content.return_value = iter([(",".join(fieldnames) + "\r\n").encode("utf-8")])
+            return response
+
+        client.get.side_effect = get
+        client.send.side_effect = send
+        stream = Installs(client)
+        state = {"bookmarks": {"installs": {"attributed_touch_time": singer.utils.strftime(start)}}}
+        with mock.patch("tap_appsflyer.streams.abstracts.write_record"), \
+                mock.patch("tap_appsflyer.streams.abstracts.write_state"), \
+                singer.Transformer() as transformer:
+            stream.sync(
+                state=state,
+                schema=SCHEMAS["installs"],
+                stream_metadata=metadata.to_map(FIELD_METADATA["installs"]),
+                transformer=transformer,
+            )
+        return requested
+
+    def test_moving_start_hits_the_cache(self):
+        """Verify a run starting a few minutes later than the previous one
+        is served the closed windows of the day grid from disk."""
+        midnight = self.now.replace(hour=0, minute=0)
+        start = midnight - datetime.timedelta(days=5) + datetime.timedelta(hours=6, minutes=13)
+        first_run = self.run_sync(start)
+        second_run = self.run_sync(start + datetime.timedelta(minutes=7))
+
+        # The partial first day, then the days not closed yet
+        open_days = [
+            day for day in first_run[1:]
+            if datetime.datetime.strptime(day, "%Y-%m-%d %H:%M").replace(tzinfo=pytz.utc)
+            > self.now - datetime.timedelta(days=2)
+        ]
+        self.assertEqual(len(first_run), 6)
+        self.assertTrue(all(day.endswith("00:00") for day in first_run[1:]))
+        self.assertEqual(second_run, [(start + datetime.timedelta(minutes=7)).strftime("%Y-%m-%d %H:%M")] + open_days)
@@ -0,0 +1,160 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from requests.exceptions import ConnectionError
+
+from tap_appsflyer.client import Client
+from tap_appsflyer.exceptions import (
+    appsflyerBadRequestError,
+    appsflyerCircuitOpenError,
+    appsflyerRateLimitError,
+    appsflyerServiceUnavailableError,
+    appsflyerUnprocessableEntityError,
+)
+from tap_appsflyer.retry import (
+    DEFAULT_POLICIES,
+    CircuitBreaker,
+    RetryBudget,
+    RetryEngine,
+    RetryPolicy,
+    get_retry_after,
+)
+
+
+def make_engine(budget=50, threshold=100, cooldown=60):
+    sleep = mock.MagicMock()
+    engine = RetryEngine(
+        DEFAULT_POLICIES, RetryBudget(budget), CircuitBreaker(threshold, cooldown), sleep=sleep
+    )
+    return engine, sleep
+
+
+def make_response(status_code, headers=None):
+    response = mock.MagicMock(status_code=status_code, headers=headers or {})
+    response.json.return_value = {}
+    return response
+
+
+class TestRetryEngine(unittest.TestCase):
+
+    def test_retries_server_errors_until_success(self):
+        """Verify retryable errors are retried with jittered waits."""
+        engine, sleep = make_engine()
+        func = mock.MagicMock(
+            side_effect=[ConnectionError(), appsflyerServiceUnavailableError(), "ok"]
+        )
+
+        self.assertEqual(engine.call(func), "ok")
+        self.assertEqual(sleep.call_count, 2)
+        self.assertLessEqual(sleep.call_args_list[1].args[0], 4)
+
+    def test_client_errors_are_not_retried(self):
+        """Verify 4xx errors, and the ones a retry cannot fix, fail at once."""
+        for exc in (appsflyerBadRequestError(), appsflyerUnprocessableEntityError()):
+            engine, sleep = make_engine()
+            with self.assertRaises(type(exc)):
+                engine.call(mock.MagicMock(side_effect=exc))
+            sleep.assert_not_called()
+
+    def test_gives_up_after_max_tries(self):
+        """Verify a policy stops after its number of tries."""
+        engine, sleep = make_engine()
+        func = mock.MagicMock(side_effect=ConnectionError())
+
+        with self.assertRaises(ConnectionError):
+            engine.call(func)
+        self.assertEqual(func.call_count, 5)
+
+    def test_retry_after_is_honored(self):
+        """Verify the wait asked by the server is used instead of the jitter."""
+        engine, sleep = make_engine()
+        exc = appsflyerRateLimitError("slow down", make_response(429, {"Retry-After": "7"}))
+
+        engine.call(mock.MagicMock(side_effect=[exc, "ok"]))
+
+        sleep.assert_called_once_with(7.0)
+        self.assertIsNone(get_retry_after(appsflyerRateLimitError("slow down")))
+
+    def test_budget_is_shared(self):
+        """Verify the retries of the run stop once the budget is spent."""
+        engine, sleep = make_engine(budget=3)
+
+        engine.call(mock.MagicMock(side_effect=[ConnectionError(), ConnectionError(), "ok"]))
+        with self.assertRaises(ConnectionError):
+            engine.call(mock.MagicMock(side_effect=[ConnectionError(), ConnectionError(), "ok"]))
+        self.assertEqual(sleep.call_count, 3)
+
+    def test_budget_reset(self):
+        """Verify a reset budget gives every retry back, for the next run."""
+        engine, sleep = make_engine(budget=1)
+        engine.call(mock.MagicMock(side_effect=[ConnectionError(), "ok"]))
+
+        engine.budget.reset()
+
+        self.assertEqual(engine.call(mock.MagicMock(side_effect=[ConnectionError(), "ok"])), "ok")
+
+    @mock.patch("tap_appsflyer.retry.asyncio.sleep", new_callable=mock.AsyncMock)
+    def test_call_async_shares_the_budget(self, mocked_sleep):
+        """Verify coroutines are retried under the same policies and budget,
+        and policies added for them keep both shared."""
+        engine, sleep = make_engine(budget=2)
+        async_engine = engine.with_policies((((KeyError,), RetryPolicy(max_tries=5, base_delay=1)),))
+        func = mock.AsyncMock(side_effect=[appsflyerServiceUnavailableError(), KeyError(), "ok"])
+
+        self.assertEqual(asyncio.run(async_engine.call_async(func)), "ok")
+        self.assertEqual(mocked_sleep.await_count, 2)
+        sleep.assert_not_called()
+        with self.assertRaises(ConnectionError):
+            engine.call(mock.MagicMock(side_effect=[ConnectionError(), "ok"]))
+
+    def test_full_jitter(self):
+        """Verify waits are drawn up to the exponential cap."""
+        policy = RetryPolicy(max_tries=5, base_delay=2, max_delay=10)
+        delays = [policy.get_delay(4) for _ in range(200)]
+
+        self.assertTrue(all(0 <= delay <= 10 for delay in delays))
+        self.assertGreater(len(set(delays)), 100)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+
+    @mock.patch("tap_appsflyer.retry.time.monotonic")
+    def test_opens_then_half_opens(self, mocked_monotonic):
+        """Verify calls fail fast while open, and a successful trial closes
+        the circuit after the cooldown."""
+        mocked_monotonic.return_value = 0
+        engine, _ = make_engine(threshold=2, cooldown=30)
+        failing = mock.MagicMock(side_effect=ConnectionError())
+        with self.assertRaises(appsflyerCircuitOpenError):
+            engine.call(failing)
+        self.assertEqual(failing.call_count, 2)
+
+        func = mock.MagicMock(return_value="ok")
+        with self.assertRaises(appsflyerCircuitOpenError):
+            engine.call(func)
+        func.assert_not_called()
+
+        mocked_monotonic.return_value = 31
+        self.assertEqual(engine.call(func), "ok")
+        self.assertEqual(engine.breaker.failures, 0)
+
+
+class TestClientSend(unittest.TestCase):
+
+    def test_send_retries_then_streams(self):
+        """Verify stream requests go through the retry policies and raise
+        the mapped exception once they give up."""
+        client = Client({"api_token": "token"})
+        client.retry_engine.sleep = mock.MagicMock()
+        ok = make_response(200)
+        with mock.patch.object(
+            client._session, "send", side_effect=[make_response(503), ok]
+        ) as mocked_send:
+            self.assertIs(client.send(mock.MagicMock()), ok)
+        self.assertTrue(mocked_send.call_args.kwargs["stream"])
+
+        with mock.patch.object(client._session, "send", return_value=make_response(403)):
+            with self.assertRaises(Exception) as context:
+                client.send(mock.MagicMock())
+        self.assertIn("403", str(context.exception))
@@ -0,0 +1,65 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from tap_appsflyer import schema
+
+
+class TestGetSchemas(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.artifact_path = os.path.join(self.tmp_dir.name, "catalog.json")
+        schema._SCHEMAS_CACHE = None
+
+    def tearDown(self):
+        schema._SCHEMAS_CACHE = None
+        self.tmp_dir.cleanup()
+
+    def test_artifact_is_built_once(self):
+        """Verify the schemas are built once, then served from the serialized
+        artifact."""
+        with mock.patch.object(schema, "get_artifact_path", return_value=self.artifact_path):
+            schemas, field_metadata = schema.get_schemas()
+            schema._SCHEMAS_CACHE = None
+
+            with mock.patch.object(schema, "build_schemas") as mocked_build:
+                cached_schemas, cached_metadata = schema.get_schemas()
+
+        mocked_build.assert_not_called()
+        self.assertEqual(cached_schemas, schemas)
+        # Breadcrumb tuples come back as lists from the artifact
+        self.assertEqual(json.dumps(cached_metadata), json.dumps(field_metadata))
+
+    def test_artifact_is_private(self):
+        """Verify the artifact lives in the cache directory of the user and
+        is only loaded when no one else can have written it."""
+        with mock.patch.dict(os.environ, {"XDG_CACHE_HOME": self.tmp_dir.name}):
+            artifact_path = schema.get_artifact_path()
+        self.assertEqual(os.path.dirname(artifact_path), os.path.join(self.tmp_dir.name, "tap_appsflyer"))
+
+        schema.dump_artifact(artifact_path, {"installs": {}}, {})
+        self.assertEqual(os.stat(artifact_path).st_mode & 0o777, 0o600)
+        self.assertEqual(schema.load_artifact(artifact_path), ({"installs": {}}, {}))
+
+        os.chmod(artifact_path, 0o666)
+        self.assertIsNone(schema.load_artifact(artifact_path))
+        os.chmod(artifact_path, 0o600)
+        with mock.patch.object(schema.os, "getuid", return_value=os.getuid() + 1):
+            self.assertIsNone(schema.load_artifact(artifact_path))
+
+    def test_artifact_path_changes_with_sources(self):
+        """Verify touching a schema file invalidates the artifact."""
+        schema_path = schema.get_abs_path("schemas/installs.json")
+        stat = os.stat(schema_path)
+        before = schema.get_artifact_path()
+
+        try:
+            os.utime(schema_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+            after = schema.get_artifact_path()
+        finally:
+            os.utime(schema_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        self.assertNotEqual(before, after)
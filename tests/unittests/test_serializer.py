@@ -0,0 +1,119 @@
+import datetime
+import decimal
+import io
+import unittest
+from unittest import mock
+
+import pytz
+import singer
+from singer import metadata
+
+from tap_appsflyer.schema import build_schemas
+from tap_appsflyer.serializer import RecordSerializer
+from tap_appsflyer.streams.abstracts import fieldnames
+from tap_appsflyer.streams.installs import Installs
+
+SCHEMAS, FIELD_METADATA = build_schemas()
+STREAM_METADATA = metadata.to_map(FIELD_METADATA["installs"])
+
+RECORD = {
+    "appsflyer_id": "1700000000000-1234567",
+    "city": "São Paulo \"centro\"\\\n\t\x01   \U0001F600",
+    "wifi": True,
+    "is_retargeting": False,
+    "event_revenue": None,
+    "unknown_field": 12,
+    "event_value": {"af_revenue": 1.5, "items": ["a", None, 2, 1e100]},
+    "event_revenue_usd": 0.1,
+    "event_revenue_preferred": -2.5e-07,
+    "app_version": decimal.Decimal("1.10"),
+    "été": 10 ** 30,
+    "os_version": "",
+}
+
+
+def singer_message(record):
+    return singer.format_message(singer.RecordMessage(stream="installs", record=record))
+
+
+class TestRecordSerializer(unittest.TestCase):
+
+    def setUp(self):
+        self.serializer = RecordSerializer("installs", SCHEMAS["installs"], STREAM_METADATA)
+
+    def test_same_bytes_as_singer(self):
+        """Verify the messages are the ones singer formats, whatever the
+        values and keys, and in the order of the record."""
+        self.assertEqual(self.serializer.format_record(RECORD), singer_message(RECORD))
+        reversed_record = dict(reversed(list(RECORD.items())))
+        self.assertEqual(self.serializer.format_record(reversed_record), singer_message(reversed_record))
+        self.assertEqual(self.serializer.format_record({}), singer_message({}))
+
+    def test_non_finite_floats_are_refused(self):
+        for value in (float("nan"), float("inf"), float("-inf")):
+            with self.assertRaises(ValueError):
+                singer_message({"cost_value": value})
+            with self.assertRaises(ValueError):
+                self.serializer.format_record({"cost_value": value})
+
+    def test_int_subclass_falls_back(self):
+        class Flag(int):
+            pass
+
+        record = {"wifi": Flag(1), 3: "non string key"}
+        self.assertEqual(self.serializer.format_record(record), singer_message(record))
+
+    def test_skip_none(self):
+        serializer = RecordSerializer("installs", SCHEMAS["installs"], STREAM_METADATA, skip_none=True)
+
+        self.assertEqual(
+            serializer.format_record(RECORD),
+            singer_message({key: value for key, value in RECORD.items() if value is not None}),
+        )
+
+    def test_from_config(self):
+        self.assertIsNone(RecordSerializer.from_config({}, "installs", SCHEMAS["installs"], STREAM_METADATA))
+        self.assertIsNotNone(
+            RecordSerializer.from_config(
+                {"record_serializer": "compiled"}, "installs", SCHEMAS["installs"], STREAM_METADATA
+            )
+        )
+        self.assertTrue(
+            RecordSerializer.from_config(
+                {"skip_null_fields": True}, "installs", SCHEMAS["installs"], STREAM_METADATA
+            ).skip_none
+        )
+        with self.assertRaises(ValueError):
+            RecordSerializer.from_config({"record_serializer": "orjson"}, "installs", {}, {})
+
+
+class TestCompiledSync(unittest.TestCase):
+
+    def setUp(self):
+        self.now = datetime.datetime.now(pytz.utc)
+
+    def run_sync(self, config):
+        now = self.now
+        touch_time = (now - datetime.timedelta(minutes=30)).strftime("%Y-%m-%d %H:%M:%S")
+        values = {"attributed_touch_time": touch_time, "event_time": touch_time,
+                  "appsflyer_id": "1", "wifi": "true", "city": "Zürich"}
+        body = ",".join(fieldnames) + "\r\n" + ",".join(values.get(field, "") for field in fieldnames)
+        response = mock.MagicMock(status_code=200)
+        response.iter_content.return_value = iter([body.encode("utf-8")])
+        client = mock.MagicMock(config={"app_id": "app", **config}, base_url="https://hq1.appsflyer.com")
+        stream = Installs(client)
+        output = io.StringIO()
+        with mock.patch.object(stream, "get_records", return_value=response), \
+                mock.patch("sys.stdout", output), \
+                singer.Transformer() as transformer:
+            stream.sync_window(
+                SCHEMAS["installs"], STREAM_METADATA, transformer,
+                now - datetime.timedelta(hours=1), now,
+            )
+        return output.getvalue()
+
+    def test_sync_output_unchanged(self):
+        output = self.run_sync({})
+
+        self.assertIn('"city": "Z\\u00fcrich"', output)
+        self.assertEqual(self.run_sync({"record_serializer": "compiled"}), output)
@@ -0,0 +1,44 @@
+import unittest
+from unittest import mock
+
+from tap_appsflyer.records import get_record_type
+from tap_appsflyer.sorting import ExternalSorter
+from tap_appsflyer.streams.abstracts import fieldnames
+
+
+class TestExternalSorter(unittest.TestCase):
+
+    def test_spilled_runs_are_merged(self):
+        """Verify rows are sorted across spilled runs, equal keys keeping
+        their order."""
+        rows = [{"key": key, "index": index} for index, key in enumerate([5, 3, 5, 1, 4, 3, 2, 5, 0])]
+        sorter = ExternalSorter(key=lambda row: row["key"], run_size=2)
+
+        sorted_rows = list(sorter.sort(rows))
+
+        self.assertEqual(sorter.spilled_runs, 4)
+        self.assertEqual(
+            [(row["key"], row["index"]) for row in sorted_rows],
+            sorted(((row["key"], row["index"]) for row in rows)),
+        )
+
+    def test_compact_records_are_spilled_as_dicts(self):
+        record_type = get_record_type(fieldnames, {})
+        rows = [record_type.from_row({"event_time": value}) for value in ("b", "a", "c")]
+        sorter = ExternalSorter(key=lambda row: row.get("event_time"), run_size=2)
+
+        self.assertEqual([row.get("event_time") for row in sorter.sort(rows)], ["a", "b", "c"])
+
+    def test_deadline_stops_the_spilling(self):
+        """Verify a sort past its deadline stops reading and yields nothing."""
+        deadline = mock.MagicMock()
+        deadline.expired.side_effect = [False, False, False, True]
+        rows = iter([{"key": key} for key in range(10)])
+        sorter = ExternalSorter(key=lambda row: row["key"], run_size=2)
+
+        self.assertEqual(list(sorter.sort(rows, deadline)), [])
+        self.assertTrue(sorter.interrupted)
+        self.assertEqual(len(list(rows)), 6)
+
+    def test_off_by_default(self):
+        self.assertIsNone(ExternalSorter.from_config({}, key=str))